@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+"""Micro-benchmark of loading an authenticated prefix tree with random keys
+the size of serialized outpoints, comparing repeated `__setitem__` against
+the bottom-up `from_sorted_items()` builder, including the computation of
+the root hash; and of connecting a block-sized set of changes (half of them
+spending existing entries, half creating new ones) one at a time against
+`apply()`; and the prefix operations of the trie with `Bits` against the
+`BitPrefix` that replaced it, then lookups and insertions into a tree; the
+latency of lookups in a disk-backed tree for a range of cache sizes; and
+the root hash of a composable tree, with the link hash computed bit by bit
+as it was originally against the precomputed bit digests and memo. Run
+with `python -m bench.authtree`."""
+
+import os
+import random
+import shutil
+import tempfile
+import time
+import timeit
+
+from bitcoin.authtree import (
+    BaseComposableAuthTree, ComposableAuthTreeLink, DiskPatriciaAuthTree,
+    MemoryComposableAuthTree, MemoryPatriciaAuthTree)
+from bitcoin.serialize import BufferReader
+from bitcoin.tools import Bits, BitPrefix
+
+# ===----------------------------------------------------------------------===
+
+def _items(count, key_size=33):
+    return sorted((os.urandom(key_size), os.urandom(8)) for _ in range(count))
+
+def _time(func):
+    "Wall-clock time of a single call, in seconds, and its result."
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def load_setitem(items):
+    tree = MemoryPatriciaAuthTree()
+    for key, value in items:
+        tree[key] = value
+    tree.hash
+    return tree
+
+def load_sorted(items):
+    tree = MemoryPatriciaAuthTree.from_sorted_items(items)
+    tree.hash
+    return tree
+
+def run(counts=(1000, 4000)):
+    print('%-8s %14s %14s %9s' % ('items', '__setitem__', 'from_sorted', 'speedup'))
+    for count in counts:
+        items = _items(count)
+        slow, tree = _time(lambda:load_setitem(items))
+        fast, tree2 = _time(lambda:load_sorted(items))
+        assert tree.hash == tree2.hash
+        print('%-8d %13.2fs %13.2fs %8.1fx' % (count, slow, fast, slow / fast))
+
+def run_batch(count=4000, changes=(100, 1000)):
+    random.seed(0)
+    items = _items(count)
+    print('%d items' % count)
+    print('%-8s %14s %14s %9s' % ('changes', 'one at a time', 'apply()', 'speedup'))
+    for number in changes:
+        spent = random.sample(items, number // 2)
+        created = _items(number - number // 2)
+        batch = [(key, None) for key, value in spent] + created
+        tree = MemoryPatriciaAuthTree.from_sorted_items(items)
+        tree.hash
+        def sequential():
+            for key, value in batch:
+                if value is None:
+                    del tree[key]
+                else:
+                    tree[key] = value
+            return tree.hash
+        slow, hash_ = _time(sequential)
+        tree2 = MemoryPatriciaAuthTree.from_sorted_items(items)
+        tree2.hash
+        fast, hash2 = _time(lambda:(tree2.apply(batch), tree2.hash)[1])
+        assert hash_ == hash2
+        print('%-8d %13.2fs %13.2fs %8.1fx' % (number, slow, fast, slow / fast))
+
+def _per_call(func, number=2000):
+    "Best-of-five time per call, in microseconds."
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+def run_prefix(count=4000, queries=2000):
+    random.seed(0)
+    a, b = os.urandom(33), os.urandom(33)
+    b = a[:20] + b[20:]
+    operations = [
+        ('compare',       lambda x,y:x < y),
+        ('startswith',    lambda x,y:x.startswith(y[:100])),
+        ('slice',         lambda x,y:x[37:200]),
+        ('concatenate',   lambda x,y:x + y),
+        ('common prefix', None),
+    ]
+    print('%-16s %12s %14s' % ('operation', 'Bits (us)', 'BitPrefix (us)'))
+    bits = (Bits(bytes=a), Bits(bytes=b))
+    prefixes = (BitPrefix.from_bytes(a), BitPrefix.from_bytes(b))
+    def bits_common(x, y):
+        len_ = min(len(x), len(y))
+        found = (x[:len_] ^ y[:len_]).find('0b1')
+        return found[0] if found else len_
+    for name, func in operations:
+        times = [_per_call(lambda:(func or bits_common)(*bits)),
+                 _per_call(lambda:(func or BitPrefix.common_length)(*prefixes))]
+        print('%-16s %12.2f %14.2f' % ((name,) + tuple(times)))
+
+    items = _items(count)
+    tree = MemoryPatriciaAuthTree.from_sorted_items(items)
+    keys = [key for key, value in random.sample(items, queries)]
+    lookup, _ = _time(lambda:[tree[key] for key in keys])
+    inserted = _items(queries // 2)
+    def insert():
+        for key, value in inserted:
+            tree[key] = value
+    insert, _ = _time(insert)
+    print('')
+    print('%d items' % count)
+    print('%-16s %12.1f' % ('lookup (us)', lookup / len(keys) * 1e6))
+    print('%-16s %12.1f' % ('insert (us)', insert / len(inserted) * 1e6))
+
+def run_disk(count=20000, queries=2000, cache_sizes=(64, 4096, 65536)):
+    random.seed(0)
+    items = _items(count)
+    keys = [key for key, value in random.sample(items, queries)]
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'authtree.db')
+        tree = DiskPatriciaAuthTree.open(filename)
+        build, _ = _time(lambda:[(tree.apply(items[idx:idx+1000]), tree.commit())
+                                 for idx in range(0, count, 1000)])
+        hash_ = tree.hash
+        tree.close()
+        print('%d items, committed in batches of 1000 in %.2fs (%.1f KiB on disk)'
+              % (count, build, os.path.getsize(filename) / 1024.))
+        print('%-12s %14s %14s %12s' % ('cache', 'mean (us)', 'p99 (us)', 'cached'))
+        for cache_size in cache_sizes:
+            tree = DiskPatriciaAuthTree.open(filename, cache_size=cache_size)
+            assert tree.hash == hash_
+            for pass_ in ('cold', 'warm'):
+                times = []
+                for key in keys:
+                    start = time.perf_counter()
+                    tree[key]
+                    times.append(time.perf_counter() - start)
+                times.sort()
+                print('%-12s %14.1f %14.1f %12d' % ('%d %s' % (cache_size, pass_),
+                    sum(times) / len(times) * 1e6, times[len(times) * 99 // 100] * 1e6,
+                    len(tree.store._cache)))
+            tree.close()
+        tree = MemoryPatriciaAuthTree.from_sorted_items(items)
+        memory, _ = _time(lambda:[tree[key] for key in keys])
+        print('%-12s %14.1f' % ('in memory', memory / len(keys) * 1e6))
+    finally:
+        shutil.rmtree(directory)
+
+class _ReferenceLink(ComposableAuthTreeLink):
+    "The original link hash, hashing both bit digests for every bit."
+    def _compute_hash(self):
+        hash_ = getattr(self.node, 'hash', None)
+        if hash_ is not None:
+            digest_of = self.compressor.digest_of
+            hash_ = self.compressor.serialize(hash_)
+            prefix = self.prefix
+            for bit in (prefix[idx] for idx in range(len(prefix)-1, 0, -1)):
+                hash_ = digest_of(b''.join([
+                    digest_of(bit and b'\x04\x00' or b'\x01\x00'),
+                    hash_]))
+            hash_ = int.from_bytes(hash_, 'little')
+        return hash_
+
+class _ReferenceTree(BaseComposableAuthTree):
+    link_class = _ReferenceLink
+
+def run_composable(count=10000, changes=200):
+    random.seed(0)
+    items = _items(count)
+    spent = random.sample(items, changes // 2)
+    created = _items(changes - changes // 2)
+    block = [(key, None) for key, value in spent] + created
+    undo = spent + [(key, None) for key, value in created]
+    print('%d items' % count)
+    print('%-24s %14s %14s %9s' % ('root hash', 'reference', 'memoized', 'speedup'))
+    MemoryComposableAuthTree.link_class.get_memo().clear()
+    trees = [cls.from_sorted_items(items)
+             for cls in (_ReferenceTree, MemoryComposableAuthTree)]
+    hashes = []
+    for name, func in (
+            ('new tree',          lambda tree:tree),
+            ('block connected',   lambda tree:tree.apply(block)),
+            ('block disconnected', lambda tree:tree.apply(undo)),
+            ('reloaded',          lambda tree:tree.__class__.deserialize(
+                                      BufferReader(tree.serialize())))):
+        times = []
+        for idx, tree in enumerate(trees):
+            tree = func(tree) or tree
+            trees[idx] = tree
+            elapsed, hash_ = _time(lambda:tree.hash)
+            times.append(elapsed)
+            hashes.append(hash_)
+        assert hashes[-1] == hashes[-2]
+        print('%-24s %13.2fs %13.2fs %8.1fx' % ((name,) + tuple(times) +
+                                               (times[0] / times[1],)))
+
+if __name__ == '__main__':
+    run()
+    print('')
+    run_batch()
+    print('')
+    run_prefix()
+    print('')
+    run_disk()
+    print('')
+    run_composable()
+
+# End of File
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+"""Benchmark of `HeaderChain` on a synthetic chain of a million headers (or as
+many as given on the command line), with a side branch forking off halfway.
+Reports the cost of appending headers, and of ancestor and last common
+ancestor queries from the tip of the side branch, which cannot be answered
+from the best chain's height index, using the skip pointers as compared to
+walking back through parent links. Also compares checking the proof-of-work
+of a 2000-header `headers` message with `check_proof_of_work` to doing so
+one `Block` at a time. Run with `python -m bench.chain [count]`."""
+
+import hashlib
+import os
+import random
+import sys
+import time
+from struct import pack
+
+import bitcoin.chain
+from bitcoin.blockfile import BlockFile
+from bitcoin.chain import HeaderChain, check_proof_of_work
+from bitcoin.core import Block
+from bitcoin.serialize import BufferReader
+from bitcoin.tools import target_from_compact
+
+BLOCK_FILE = os.path.join(os.path.dirname(__file__),
+                          os.pardir, 'xunit', 'data', 'blk0001.dat')
+
+# ===----------------------------------------------------------------------===
+
+def headers(parent, count, nonce=0):
+    "Yields count serialized headers extending the header with digest parent."
+    for idx in range(count):
+        raw = pack('<I32s32sIII', 1, parent, b'\x00'*32, idx, 0x207fffff, nonce)
+        parent = hashlib.sha256(hashlib.sha256(raw).digest()).digest()
+        yield raw
+
+def walk(chain, index, height):
+    "Finds an ancestor by following parent links."
+    while chain.height(index) > height:
+        index = chain.parent(index)
+    return index
+
+def walk_common(chain, first, second):
+    "Finds the last common ancestor by following parent links."
+    height = min(chain.height(first), chain.height(second))
+    first, second = walk(chain, first, height), walk(chain, second, height)
+    while first != second:
+        first, second = chain.parent(first), chain.parent(second)
+    return first
+
+def _time(func, args):
+    "Seconds per call of func over each tuple of args."
+    start = time.time()
+    for arg in args:
+        func(*arg)
+    return (time.time() - start) / len(args)
+
+def run(count=1000000, queries=200):
+    random.seed(0)
+    chain, fork = HeaderChain(), count // 2
+    start = time.time()
+    chain.extend(headers(b'\x00'*32, count))
+    elapsed = time.time() - start
+    parent = chain.hash(fork).to_bytes(32, 'little')
+    chain.extend(headers(parent, 1000, nonce=1))
+    tip, side = chain.tip, len(chain) - 1
+    print('%d headers appended in %.1fs (%.1f us/header)' % (
+        count, elapsed, elapsed / count * 1e6))
+
+    ancestors = [(chain, side, random.randrange(fork)) for _ in range(queries)]
+    commons = [(chain, side, chain.at_height(random.randrange(fork + 1, count)))
+               for _ in range(queries)]
+    rows = [
+        ('ancestor', _time(walk, ancestors),
+            _time(lambda c, i, h: c.ancestor(i, h), ancestors)),
+        ('last common ancestor', _time(walk_common, commons),
+            _time(lambda c, a, b: c.last_common_ancestor(a, b), commons)),
+    ]
+    print('%-22s %12s %12s %9s' % ('query', 'walk (us)', 'skip (us)', 'speedup'))
+    for name, old, new in rows:
+        print('%-22s %12.1f %12.1f %8.0fx' % (name, old*1e6, new*1e6, old/new))
+
+# ===----------------------------------------------------------------------===
+
+def run_pow(count=2000, number=20):
+    "Compares batch and per-`Block` proof-of-work checks of count headers."
+    with BlockFile(BLOCK_FILE, magic=bytes.fromhex('fabfb5da')) as file_:
+        raws = [header.serialize() for _, header in file_.headers()]
+    data = b''.join((raws * (count // len(raws) + 1))[:count])
+    def per_block():
+        reader = BufferReader(data)
+        for _ in range(count):
+            block = Block.deserialize(reader)
+            assert block.hash <= target_from_compact(block.bits)
+    def batch():
+        mask, work = check_proof_of_work(data)
+        assert all(mask)
+    numpy = bitcoin.chain.numpy
+    rows = [('Block', _time(per_block, [()] * number) / count)]
+    try:
+        for backend in numpy is None and (None,) or (None, numpy):
+            bitcoin.chain.numpy = backend
+            rows.append(('check_proof_of_work() [%s]' % (
+                backend is None and 'python' or 'numpy'),
+                _time(batch, [()] * number) / count))
+    finally:
+        bitcoin.chain.numpy = numpy
+    print('%-34s %10s' % ('proof-of-work check', 'us/header'))
+    for name, seconds in rows:
+        print('%-34s %10.2f' % (name, seconds*1e6))
+
+if __name__ == '__main__':
+    run_pow()
+    print('')
+    run(*map(int, sys.argv[1:]))
+
+# End of File
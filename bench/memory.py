@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+"""Reports the memory held per deserialized object, as measured by
+`tracemalloc`, for the transactions and block headers of the testnet sample
+block file in `xunit/data`. A transaction's figure includes its inputs,
+outputs and scripts. Run with `python -m bench.memory`."""
+
+import gc
+import os
+import sys
+import tracemalloc
+
+from bitcoin.core import Block, Transaction
+from bitcoin.serialize import BufferReader
+
+BLOCK_FILE = os.path.join(os.path.dirname(__file__),
+                          os.pardir, 'xunit', 'data', 'blk0001.dat')
+
+# ===----------------------------------------------------------------------===
+
+def load(path=BLOCK_FILE):
+    "Returns the serialized headers and transactions of a block file."
+    with open(path, 'rb') as file_:
+        data = file_.read()
+    reader, headers, transactions = BufferReader(data), [], []
+    while reader.remaining:
+        reader.skip(8) # network magic and record length
+        headers.append(reader.read(80))
+        for _ in range(reader.read_compact_size()):
+            start = reader.tell()
+            Transaction.deserialize(reader)
+            transactions.append(data[start:reader.tell()])
+    return headers, transactions
+
+def measure(cls, raws):
+    "Average number of bytes allocated per object deserialized from raws."
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [cls.deserialize(BufferReader(raw)) for raw in raws]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before - sys.getsizeof(objects)) / len(objects)
+
+def run():
+    headers, transactions = load()
+    inputs = sum(len(Transaction.deserialize(BufferReader(raw)).inputs)
+                 for raw in transactions)
+    print('%d transactions (%d inputs), %d headers' % (
+        len(transactions), inputs, len(headers)))
+    print('%-12s %14s' % ('class', 'bytes/object'))
+    for cls, raws in ((Transaction, transactions), (Block, headers)):
+        print('%-12s %14.0f' % (cls.__name__, measure(cls, raws)))
+
+if __name__ == '__main__':
+    run()
+
+# End of File
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+"""Micro-benchmark of Merkle root computation over a block of 4000
+transactions, comparing the flat-buffer `merkle_digest` engine against the
+pairwise integer compressor that `merkle()` formerly used and against
+building a `MerkleList`; then the throughput of the hashlib and multi-lane
+NumPy backends for hashing interior nodes, over a range of pair counts to
+find where (if anywhere) the NumPy kernel overtakes hashlib; and the cost of
+tracking the root of a block template as transactions are added one by one
+with a `MerkleAccumulator`, against recomputing it each time; and the size,
+build time and verification rate of `MerkleProof`s of 1, 10 and 1000 of the
+transactions of a block; and the memory and access times of a `MerkleList`
+against a `FlatMerkleList`. Run with
+`python -m bench.merkle`."""
+
+import os
+import random
+import timeit
+import tracemalloc
+
+from bitcoin.hash import hash256_int
+from bitcoin.merkle import (
+    FlatMerkleList, MerkleAccumulator, MerkleList, MerkleProof, merkle, merkle_digest,
+    merkle_root, _BACKENDS)
+
+# ===----------------------------------------------------------------------===
+
+def pairwise(*args):
+    "The compressor merkle() used by default before the flat-buffer engine."
+    if not args:
+        return 0
+    if len(args) == 1:
+        return args[0]
+    return hash256_int(b''.join([h.to_bytes(32, 'little') for h in args]))
+
+def _time(func, number):
+    "Best-of-five time per call, in milliseconds."
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e3
+
+def run(count=4000, number=20):
+    random.seed(0)
+    hashes = [random.getrandbits(256) for _ in range(count)]
+    digests = b''.join(h.to_bytes(32, 'little') for h in hashes)
+    assert merkle(hashes, func=pairwise) == merkle_root(hashes)
+    rows = [
+        ('merkle() [pairwise ints]', _time(lambda:merkle(hashes, func=pairwise), number)),
+        ('MerkleList().hash', _time(lambda:MerkleList(hashes).hash, number)),
+        ('merkle_root()', _time(lambda:merkle_root(hashes), number)),
+        ('merkle_digest()', _time(lambda:merkle_digest(digests), number)),
+    ]
+    print('%d transactions' % count)
+    print('%-28s %10s' % ('method', 'ms/root'))
+    for name, ms in rows:
+        print('%-28s %10.2f' % (name, ms))
+
+def run_crossover(counts=(16, 256, 4096, 65536), number=3):
+    backends = [name for name in ('hashlib', 'numpy') if _BACKENDS[name]]
+    print('%-10s' % 'pairs' + ''.join('%14s' % ('%s (us)' % name)
+                                      for name in backends))
+    for count in counts:
+        buffer = os.urandom(64 * count)
+        times = [_time(lambda:_BACKENDS[name](buffer), number) * 1e3 / count
+                 for name in backends]
+        print('%-10d' % count + ''.join('%14.3f' % us for us in times))
+
+def run_template(count=2000, number=1):
+    random.seed(0)
+    hashes = [random.getrandbits(256) for _ in range(count)]
+    def recompute():
+        for idx in range(1, count+1):
+            merkle_root(hashes[:idx])
+    def accumulate(cache=False):
+        accumulator = MerkleAccumulator(cache=cache)
+        for hash_ in hashes:
+            accumulator.append(hash_)
+            accumulator.root()
+    rows = [
+        ('merkle_root() per addition', _time(recompute, number)),
+        ('MerkleAccumulator', _time(accumulate, number)),
+        ('MerkleAccumulator(cache)', _time(lambda:accumulate(True), number)),
+    ]
+    print('%d transactions added one at a time' % count)
+    print('%-28s %10s' % ('method', 'ms total'))
+    for name, ms in rows:
+        print('%-28s %10.2f' % (name, ms))
+
+def run_proofs(count=4000, matches=(1, 10, 1000), number=20):
+    random.seed(0)
+    hashes = [random.getrandbits(256) for _ in range(count)]
+    root = merkle_root(hashes)
+    print('%d transactions' % count)
+    print('%-8s %10s %12s %12s' % ('matches', 'bytes', 'build (ms)', 'verify/s'))
+    for matched in matches:
+        indices = random.sample(range(count), matched)
+        proof = MerkleProof.from_hashes(hashes, indices)
+        serialized = proof.serialize()
+        assert len(proof.verify(root)) == matched
+        build = _time(lambda:MerkleProof.from_hashes(hashes, indices), number)
+        verify = _time(lambda:proof.verify(root), number)
+        print('%-8d %10d %12.2f %12.0f' % (
+            matched, len(serialized), build, 1e3 / verify))
+
+def _memory(func):
+    "Bytes allocated by func() which are still held by its result."
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+def run_storage(count=4000, number=20):
+    random.seed(0)
+    hashes = [random.getrandbits(256) for _ in range(count)]
+    # MerkleNode indexing does not handle the duplicated last node of an odd
+    # level, so the indices are drawn from the complete left subtree.
+    indices = random.sample(range(1 << ((count-1).bit_length() - 1)), 100)
+    print('%d transactions' % count)
+    print('%-16s %10s %10s %12s %12s %12s' % ('storage', 'bytes/leaf',
+        'build (ms)', 'index (ms)', 'iter (ms)', 'proof (ms)'))
+    for cls in (MerkleList, FlatMerkleList):
+        list_ = cls(hashes)
+        # MerkleList does not itself support indexing; its root node does.
+        getitem = getattr(list_, '_root', list_).__getitem__
+        print('%-16s %10.1f %10.2f %12.3f %12.3f %12.2f' % (
+            cls.__name__, _memory(lambda:cls(hashes)) / count,
+            _time(lambda:cls(hashes), number),
+            _time(lambda:[getitem(idx) for idx in indices], number),
+            _time(lambda:list(list_), number),
+            _time(lambda:list_.proof(indices), number)))
+
+if __name__ == '__main__':
+    run()
+    print('')
+    run_crossover()
+    print('')
+    run_template()
+    print('')
+    run_proofs()
+    print('')
+    run_storage()
+
+# End of File
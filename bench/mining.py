@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+"""Reports the rate at which nonces are tried by `bitcoin.mining.grind`, which
+rehashes only the tail of the header from a precomputed midstate, as compared
+to incrementing `Block.nonce` and rehashing the whole header. Also reports
+the time taken to mine a chain of regtest-difficulty blocks. Run with
+`python -m bench.mining`."""
+
+import time
+
+from bitcoin.core import Block
+from bitcoin.defaults import CHAIN_PARAMETERS
+from bitcoin.mining import grind, mine
+from bitcoin.serialize import BufferReader
+
+GENESIS = CHAIN_PARAMETERS['bitcoin.org'].genesis
+
+# ===----------------------------------------------------------------------===
+
+def per_block(block, count):
+    "Tries count nonces by modifying and rehashing the block."
+    for nonce in range(count):
+        block.nonce = nonce
+        if block.hash <= 0:
+            return nonce
+
+def _rate(func, count):
+    start = time.time()
+    func(count)
+    return count / (time.time() - start)
+
+def run(count=200000, blocks=1000):
+    block = Block.deserialize(BufferReader(GENESIS[:80]))
+    old = _rate(lambda n: per_block(block, n), count)
+    new = _rate(lambda n: grind(block, 0, range(n)), count)
+    print('%-12s %12s' % ('method', 'hashes/s'))
+    print('%-12s %12.0f' % ('Block.hash', old))
+    print('%-12s %12.0f' % ('grind()', new))
+
+    start, parent = time.time(), Block(bits=0x207fffff)
+    for _ in range(blocks):
+        parent = mine(Block(parent_hash=parent.hash, bits=0x207fffff))
+    print('%d regtest blocks mined in %.2fs' % (blocks, time.time() - start))
+
+if __name__ == '__main__':
+    run()
+
+# End of File
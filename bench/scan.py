@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+"""Reports the rate at which `BlockScanner` hashes the blocks and transactions
+of block files, and totals their outputs, for various numbers of worker
+processes. Run with `python -m bench.scan [blk*.dat ...]`; the testnet sample
+block file in `xunit/data` is used if no files are given (the reference
+client's magic is assumed for any that are)."""
+
+import os
+import sys
+
+from bitcoin.blockfile import BlockScanner
+
+BLOCK_FILE = os.path.join(os.path.dirname(__file__),
+                          os.pardir, 'xunit', 'data', 'blk0001.dat')
+TESTNET_MAGIC = bytes.fromhex('fabfb5da')
+
+# ===----------------------------------------------------------------------===
+
+def output_value(tx):
+    return sum(output.amount for output in tx.outputs)
+
+def run(paths=None, chunk_size=1<<20):
+    magic = None
+    if not paths:
+        paths, magic, chunk_size = [BLOCK_FILE], TESTNET_MAGIC, 1<<14
+    counts = sorted(set((0, 1, 2, os.cpu_count() or 1)))
+    print('%-8s %8s %12s %10s' % ('workers', 'blocks', 'transactions', 'blocks/s'))
+    for workers in counts:
+        scanner = BlockScanner(paths, function=output_value, workers=workers,
+                               chunk_size=chunk_size, magic=magic)
+        for record in scanner:
+            pass
+        print('%-8d %8d %12d %10.0f' % (workers, scanner.blocks,
+            scanner.transactions, scanner.blocks_per_second))
+
+if __name__ == '__main__':
+    run(sys.argv[1:])
+
+# End of File
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+"""Micro-benchmark of the integer codecs in `bitcoin.serialize`, comparing the
+precompiled `struct.Struct` / `int.from_bytes` fast paths against the limb
+loops they replaced. Run with `python -m bench.serialize`."""
+
+import timeit
+from struct import pack, unpack_from
+
+from bitcoin.hash import hash256
+import bitcoin.serialize
+from bitcoin.serialize import (
+    BufferReader, BigInteger, LittleInteger, VarInt, deserialize_varints)
+
+# ===----------------------------------------------------------------------===
+
+# The previous implementations, kept here as the baseline for comparison.
+
+def limb_serialize_little(value, len_):
+    result = []
+    while value:
+        result.append(pack("<Q", value & 0xffffffffffffffff))
+        value >>= 64
+    result = b''.join(result).rstrip(b'\x00')
+    return result + b'\x00' * (len_ - len(result))
+
+def limb_deserialize_little(file_, len_):
+    data = file_.read_slice(len_)
+    result = 0
+    for idx in range(len_//8):
+        limb = unpack_from("<Q", data, idx * 8)[0]
+        result += limb << (idx * 64)
+    if len_ & 4:
+        limb = unpack_from("<I", data, len_ & ~7)[0]
+        result += limb << ((len_ & ~7) * 8)
+    if len_ & 2:
+        limb = unpack_from("<H", data, len_ & ~3)[0]
+        result += limb << ((len_ & ~3) * 8)
+    if len_ & 1:
+        limb = unpack_from("<B", data, len_ & ~1)[0]
+        result += limb << ((len_ & ~1) * 8)
+    return result
+
+def limb_deserialize_big(file_, len_):
+    data = file_.read_slice(len_)
+    result, offset = 0, 0
+    for idx in range(len_//8):
+        result = (result << 64) + unpack_from(">Q", data, offset)[0]
+        offset += 8
+    if len_ & 4:
+        result = (result << 32) + unpack_from(">I", data, offset)[0]
+        offset += 4
+    if len_ & 2:
+        result = (result << 16) + unpack_from(">H", data, offset)[0]
+        offset += 2
+    if len_ & 1:
+        result = (result << 8) + unpack_from(">B", data, offset)[0]
+    return result
+
+# ===----------------------------------------------------------------------===
+
+def _time(func, count, number):
+    "Best-of-five time per item, in nanoseconds."
+    return min(timeit.repeat(func, number=number, repeat=5)) / (count*number) * 1e9
+
+def run(count=1000, number=50):
+    rows = []
+    for len_ in (4, 8, 20, 32):
+        value = ((1 << (8*len_ - 1)) | 0x0123456789abcdef) & ((1 << 8*len_) - 1)
+        data = LittleInteger(value).serialize(len_) * count
+        def decode(deserializer):
+            def func():
+                reader = BufferReader(data)
+                for idx in range(count):
+                    deserializer(reader, len_)
+            return func
+        def encode(serializer):
+            def func():
+                for idx in range(count):
+                    serializer(value, len_)
+            return func
+        rows.append(('LittleInteger.deserialize', len_,
+            _time(decode(limb_deserialize_little), count, number),
+            _time(decode(LittleInteger.deserialize), count, number)))
+        rows.append(('BigInteger.deserialize', len_,
+            _time(decode(limb_deserialize_big), count, number),
+            _time(decode(BigInteger.deserialize), count, number)))
+        rows.append(('LittleInteger.serialize', len_,
+            _time(encode(limb_serialize_little), count, number),
+            _time(encode(lambda v,l:LittleInteger(v).serialize(l)), count, number)))
+
+    # hash256.serialize/deserialize formerly also instantiated the hash
+    # algorithm on every call in order to look up its digest size.
+    value = hash256(b'').intdigest()
+    data = hash256.serialize(value) * count
+    def old_decode():
+        reader = BufferReader(data)
+        for idx in range(count):
+            limb_deserialize_little(reader, hash256.new().digest_size)
+    def new_decode():
+        reader = BufferReader(data)
+        for idx in range(count):
+            hash256.deserialize(reader)
+    def old_encode():
+        for idx in range(count):
+            limb_serialize_little(value, hash256.new().digest_size)
+    def new_encode():
+        for idx in range(count):
+            hash256.serialize(value)
+    rows.append(('hash256.deserialize', 32,
+        _time(old_decode, count, number), _time(new_decode, count, number)))
+    rows.append(('hash256.serialize', 32,
+        _time(old_encode, count, number), _time(new_encode, count, number)))
+
+    print('%-28s %5s %10s %10s %8s' % ('codec', 'bytes', 'limb (ns)', 'fast (ns)', 'speedup'))
+    for name, len_, old, new in rows:
+        print('%-28s %5d %10.0f %10.0f %7.1fx' % (name, len_, old, new, old/new))
+
+# ===----------------------------------------------------------------------===
+
+def run_batch(count=100000, number=5):
+    "Compares batch VarInt decoding to one `read_varint()` call per value."
+    import random
+    random.seed(0)
+    data = b''.join(VarInt(random.randrange(1 << 20)).serialize()
+                    for _ in range(count))
+    def per_value():
+        reader = BufferReader(data)
+        for _ in range(count):
+            reader.read_varint()
+    numpy = bitcoin.serialize.numpy
+    results = [('read_varint()', _time(per_value, count, number))]
+    backends = numpy is None and (None,) or (None, numpy)
+    try:
+        for backend in backends:
+            bitcoin.serialize.numpy = backend
+            results.append(('deserialize_varints() [%s]' % (
+                backend is None and 'python' or 'numpy'),
+                _time(lambda:deserialize_varints(data), count, number)))
+    finally:
+        bitcoin.serialize.numpy = numpy
+
+    print('%-34s %10s' % ('varint decoder', 'ns/value'))
+    for name, ns in results:
+        print('%-34s %10.0f' % (name, ns))
+
+if __name__ == '__main__':
+    run()
+    print('')
+    run_batch()
+
+# End of File
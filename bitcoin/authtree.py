@@ -7,19 +7,25 @@
 import six
 
 from .mixins import HashableMixin, SerializableMixin
-from .serialize import FlatData, VarInt
+from .serialize import FlatData, VarInt, as_reader
 
-from .tools import Bits, BytesIO, icmp, lookahead, list, tuple
+from .tools import Bits, BitPrefix, BytesIO, icmp, lookahead, list, tuple
 
 __all__ = (
     'BaseAuthTreeLink',
     'ComposableAuthTreeLink',
     'PatriciaAuthTreeLink',
+    'StoredComposableAuthTreeLink',
+    'StoredPatriciaAuthTreeLink',
     'BaseAuthTreeNode',
+    'AuthTreeBatch',
     'BaseComposableAuthTree',
     'MemoryComposableAuthTree',
     'BasePatriciaAuthTree',
     'MemoryPatriciaAuthTree',
+    'AuthTreeNodeStore',
+    'DiskComposableAuthTree',
+    'DiskPatriciaAuthTree',
 )
 
 SENTINAL = object()
@@ -27,19 +33,20 @@ SENTINAL = object()
 # ===----------------------------------------------------------------------===
 
 import numbers
+from collections import OrderedDict
 
 class BaseAuthTreeLink(HashableMixin):
     __slots__ = 'prefix node _hash _count _size'.split()
 
     def __init__(self, prefix, node=None, hash=None, count=None, size=None, *args, **kwargs):
-        # Coerce the prefix from whatever type it is into a Bits
-        # field. This allows passing binary strings or any type
-        # understood by the Bits constructor.
-        if not isinstance(prefix, Bits):
+        # Coerce the prefix from whatever type it is into a BitPrefix.
+        # This allows passing binary strings or any type understood by
+        # the Bits constructor.
+        if not isinstance(prefix, BitPrefix):
             if isinstance(prefix, six.binary_type):
-                prefix = Bits(bytes=prefix)
+                prefix = BitPrefix.from_bytes(prefix)
             else:
-                prefix = Bits(prefix)
+                prefix = BitPrefix.from_bits(Bits(prefix))
         # It is permissible to provide just a node or its hash as the
         # 2nd positional argument.
         if isinstance(node, numbers.Integral):
@@ -78,6 +85,10 @@ class BaseAuthTreeLink(HashableMixin):
             return 0
         return self.node.length
 
+    def _get_node_hash(self):
+        "The hash of the node the link points to, or None if it is pruned."
+        return getattr(self.node, 'hash', None)
+
     from .hash import hash256 as compressor
     def hash__getter(self):
         if getattr(self, '_hash', None) is not None:
@@ -114,31 +125,127 @@ class BaseAuthTreeLink(HashableMixin):
         return '%s(%s)' % (self.__class__.__name__, ', '.join(parts))
 
 class ComposableAuthTreeLink(BaseAuthTreeLink):
+    # The digests standing for a 0 and a 1 bit of the prefix, which are
+    # constant, so need only be computed once.
+    _bit_digests = (BaseAuthTreeLink.compressor.digest_of(b'\x01\x00'),
+                    BaseAuthTreeLink.compressor.digest_of(b'\x04\x00'))
+
+    # Links are recreated whenever the path to them is rebuilt or the tree
+    # is reloaded, so the hashes of links are memoized by the bits of the
+    # prefix which are hashed and the hash of the node, keeping the most
+    # recently used memo_size of them. Each class has a memo of its own.
+    memo_size = 65536
+
+    @classmethod
+    def get_memo(cls):
+        "The memo of link hashes of this class, created on first use."
+        memo = cls.__dict__.get('_memo')
+        if memo is None:
+            memo = OrderedDict()
+            setattr(cls, '_memo', memo)
+        return memo
+
     def _compute_hash(self):
-        hash_ = getattr(self.node, 'hash', None)
-        if hash_ is not None:
-            hash_ = self.compressor.serialize(hash_)
-            for bit in self.prefix[:-len(self.prefix):-1]:
-                hash_ = self.compressor(b''.join([
-                    self.compressor(bit and b'\x04\x00' or b'\x01\x00').digest(),
-                    hash_])).digest()
-            hash_ = self.compressor.deserialize(BytesIO(hash_))
-        return hash_
+        hash_ = self._get_node_hash()
+        if hash_ is None or len(self.prefix) < 2:
+            return hash_
+        # Every bit of the prefix but the first, last to first
+        suffix = self.prefix[1:]
+        memo, key = self.get_memo(), (suffix, hash_)
+        result = memo.get(key)
+        if result is not None:
+            memo.move_to_end(key)
+            return result
+        digest_of, bit_digests = self.compressor.digest_of, self._bit_digests
+        value, digest = suffix.value, self.compressor.serialize(hash_)
+        for _ in range(len(suffix)):
+            digest = digest_of(bit_digests[value & 1] + digest)
+            value >>= 1
+        result = int.from_bytes(digest, 'little')
+        memo[key] = result
+        while len(memo) > self.memo_size:
+            memo.popitem(last=False)
+        return result
 
 class PatriciaAuthTreeLink(BaseAuthTreeLink):
     def _compute_hash(self):
-        return getattr(self.node, 'hash', None)
+        return self._get_node_hash()
+
+class _StoredAuthTreeLinkMixin(object):
+    """A link whose node may be held in an `AuthTreeNodeStore` rather than in
+    memory. Once written out by the store the link keeps only the hash of the
+    node, which is loaded (through the store's cache) each time it is
+    followed. Such a link is not pruned, and knows the hash and length of its
+    branch without loading it. A link given a node which was loaded from or
+    written out by a store keeps only its hash likewise, so that following
+    a stored link to build a new one does not hold the node in memory."""
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        self._store, self._node_hash, self._length = None, None, None
+        super(_StoredAuthTreeLinkMixin, self).__init__(*args, **kwargs)
+
+    @property
+    def node(self):
+        node = self._node
+        if node is None and self._store is not None:
+            node = self._store.get(self._node_hash)
+        return node
+    @node.setter
+    def node(self, node):
+        store = getattr(node, '_store', None)
+        if store is not None:
+            self._store, self._node_hash, self._length, self._node = (
+                store, node.hash, node.length, None)
+        else:
+            self._node = node
+
+    @property
+    def pruned(self):
+        "Returns True if the link points to neither a node object nor a stored node."
+        return self._node is None and self._store is None
+
+    @property
+    def length(self):
+        "The number of non-pruned items in this branch."
+        if self._node is None and self._store is not None:
+            return self._length
+        return super(_StoredAuthTreeLinkMixin, self).length
+
+    def _get_node_hash(self):
+        if self._node is None and self._store is not None:
+            return self._node_hash
+        return super(_StoredAuthTreeLinkMixin, self)._get_node_hash()
+
+class StoredComposableAuthTreeLink(_StoredAuthTreeLinkMixin, ComposableAuthTreeLink):
+    __slots__ = '_node _store _node_hash _length'.split()
+
+class StoredPatriciaAuthTreeLink(_StoredAuthTreeLinkMixin, PatriciaAuthTreeLink):
+    __slots__ = '_node _store _node_hash _length'.split()
 
 # ===----------------------------------------------------------------------===
 
 import operator
 from bisect import bisect_left
-from os.path import commonprefix
+from functools import reduce
 from struct import pack, unpack
+
+def commonprefix(m):
+    """Given a list of bit prefixes, returns the longest leading prefix they
+    have in common, as `os.path.commonprefix()` does for strings."""
+    if not m:
+        return BitPrefix()
+    s1, s2 = min(m), max(m)
+    return s1[:s1.common_length(s2)]
+
+def _reverse(value, length):
+    "The integer of the length bits of value in reverse order."
+    return int(bin(value)[2:].zfill(length)[::-1] or '0', 2)
+
 class BaseAuthTreeNode(SerializableMixin, HashableMixin):
     """An ordered dictionary implemented with a hybrid
     level- and node-compressed prefix tree."""
-    __slots__ = 'value children extra prune_value _hash size length'.split()
+    __slots__ = 'value children extra prune_value _hash count size length'.split()
 
     OFFSET_LEFT  = 0
     OFFSET_RIGHT = 2
@@ -168,7 +275,9 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
     def _prepare_key(cls, elem):
         elem = cls._prepare(elem, 'key')
         if isinstance(elem, six.binary_type):
-            elem = Bits(bytes=elem)
+            elem = BitPrefix.from_bytes(elem)
+        elif isinstance(elem, Bits):
+            elem = BitPrefix.from_bits(elem)
         return elem
     _prepare_value = classmethod(lambda cls,elem:cls._prepare(elem, 'value'))
 
@@ -268,17 +377,16 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
 
     def serialize(self, digest=False):
         def _serialize_branch(link):
-            # Prefix
+            # Prefix, all but the implicit first bit of which is written in
+            # reverse order, following a marker bit if it fits in a byte
             len_ = len(link.prefix)
             if 2 <= len_ <= 8:
-                parts.append(
-                    six.int2byte(
-                        (Bits((False,)*(8-len_)+(True,)) +
-                         link.prefix[:0:-1]).uint))
+                parts.append(six.int2byte((1 << (len_-1)) |
+                    _reverse(link.prefix[1:].value, len_-1)))
             elif 9 <= len_:
-                skiplist = link.prefix[1:] + Bits((False,) * ((1-len_)%8))
                 parts.append(VarInt(len_-9).serialize())
-                parts.append(skiplist[::-1].tobytes()[::-1])
+                parts.append(_reverse(link.prefix[1:].value, len_-1)
+                             .to_bytes((len_ + 6) // 8, 'little'))
             # Branch
             if not digest:
                 if link.pruned:
@@ -307,13 +415,14 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
     def deserialize(cls, file_):
         link_class = getattr(cls, 'get_link_class',
             lambda: getattr(cls, 'link_class'))()
+        file_ = as_reader(file_)
         initargs = {}
-        flags = VarInt.deserialize(file_)
+        flags = file_.read_u8()
         initargs['children'] = list()
-        len_ = VarInt.deserialize(file_)
+        len_ = file_.read_varint()
         initargs['extra'] = FlatData.deserialize(file_, len_)
         if flags & (1 << cls.HAS_VALUE):
-            len_ = VarInt.deserialize(file_)
+            len_ = file_.read_varint()
             initargs['value'] = FlatData.deserialize(file_, len_)
             initargs['prune_value'] = bool(flags & (1 << cls.PRUNE_VALUE))
         def _deserialize_branch(attr, prefix, bitlength, prune):
@@ -323,37 +432,41 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
                 skiplist = file_.read(1)
                 assert len(skiplist) == 1
                 bitlength = ord(skiplist).bit_length()
-                prefix += Bits(bytes=skiplist)[:-bitlength:-1]
+                prefix += BitPrefix(_reverse(
+                    ord(skiplist) & ((1 << (bitlength-1)) - 1), bitlength-1),
+                    bitlength-1)
             elif bitlength == 3:
-                bitlength = VarInt.deserialize(file_) + 9
+                bitlength = file_.read_varint() + 9
                 bytelength = (bitlength + 6) // 8
                 bytes_ = file_.read(bytelength)
                 assert len(bytes_) == bytelength
-                prefix += Bits(bytes=bytes_[::-1])[:-bitlength:-1]
+                prefix += BitPrefix(_reverse(
+                    int.from_bytes(bytes_, 'little') & ((1 << (bitlength-1)) - 1),
+                    bitlength-1), bitlength-1)
             if prune:
                 initargs['children'].append(link_class(prefix,
-                    hash  = self.compressor.deserialize(file_),
-                    count = VarInt.deserialize(file_),
-                    size  = VarInt.deserialize(file_)))
+                    hash  = cls.compressor.deserialize(file_),
+                    count = file_.read_varint(),
+                    size  = file_.read_varint()))
             else:
                 initargs['children'].append(link_class(prefix,
                     node  = cls.deserialize(file_)))
-        _deserialize_branch('left', Bits('0b0'),
+        _deserialize_branch('left', BitPrefix(0, 1),
             (flags >> cls.OFFSET_LEFT)  & 3, bool(flags & (1 << cls.PRUNE_LEFT)),)
-        _deserialize_branch('right', Bits('0b1'),
+        _deserialize_branch('right', BitPrefix(1, 1),
             (flags >> cls.OFFSET_RIGHT) & 3, bool(flags & (1 << cls.PRUNE_RIGHT)),)
         return cls(**initargs)
 
     from .hash import hash256 as compressor
     def __bytes__(self):
         parts = []
-        parts.append(self.compressor.new(self.serialize(digest=True)).digest())
+        parts.append(self.compressor.digest_of(self.serialize(digest=True)))
         left_hash  = getattr(self.left,  'hash', 0)
         right_hash = getattr(self.right, 'hash', 0)
         if 0 not in (left_hash, right_hash):
-            parts.append(self.compressor.new(
+            parts.append(self.compressor.digest_of(
                 self.compressor.serialize(left_hash) +
-                self.compressor.serialize(right_hash)).digest())
+                self.compressor.serialize(right_hash)))
         else:
             parts.append(
                 self.compressor.serialize(left_hash or right_hash))
@@ -428,7 +541,7 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
 
     def _forward_iterator(self):
         "Returns a forward iterator over the trie"
-        path = [(self, 0, Bits())]
+        path = [(self, 0, BitPrefix())]
         while path:
             node, idx, prefix = path.pop()
             if idx==0 and node.value is not None and not node.prune_value:
@@ -441,7 +554,7 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
 
     def _reverse_iterator(self):
         "Returns a reverse/backwards iterator over the trie"
-        path = [(self, len(self.children)-1, Bits())]
+        path = [(self, len(self.children)-1, BitPrefix())]
         while path:
             node, idx, prefix = path.pop()
             if idx<0 and node.value is not None and not node.prune_value:
@@ -506,7 +619,7 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
         corresponding to the key, or is the most specific prefix on the path which
         would contain the key if it were there. The key was found if prefix==key
         and the node.value is not None."""
-        prefix, subkey, node = Bits(), key, self
+        prefix, subkey, node = BitPrefix(), key, self
         while prefix != key:
             for idx,link in enumerate(node.children):
                 if subkey.startswith(link.prefix):
@@ -577,7 +690,7 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
             lambda: getattr(self, 'node_class', self.__class__))()
 
         # TODO: Maybe remove this and rely on duck typing?
-        if not (isinstance(key, Bits) and
+        if not (isinstance(key, BitPrefix) and
                 isinstance(value, six.binary_type)):
             raise TypeError(u"%s can only map bitstring -> binary type"
                 % self.__class__.__name__)
@@ -603,7 +716,7 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
             if idx in range(len(old_node.children)):
                 common_prefix = commonprefix([old_node.children[idx].prefix, remaining_key])
             else:
-                common_prefix = Bits()
+                common_prefix = BitPrefix()
 
             if common_prefix == remaining_key:
                 inner_node = node_class(
@@ -611,7 +724,7 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
                     children = (link_class(
                         prefix = old_node.children[idx].prefix[len(common_prefix):],
                         node   = old_node.children[idx].node,
-                        hash   = old_node.children[idx]._hash,
+                        hash   = old_node.children[idx].pruned and old_node.children[idx]._hash or None,
                         count  = old_node.children[idx].count,
                         size   = old_node.children[idx].size),))
                 new_node = node_class(
@@ -634,7 +747,7 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
                         link_class(
                             prefix = old_node.children[idx].prefix[len(common_prefix):],
                             node   = old_node.children[idx].node,
-                            hash   = old_node.children[idx]._hash,
+                            hash   = old_node.children[idx].pruned and old_node.children[idx]._hash or None,
                             count  = old_node.children[idx].count,
                             size   = old_node.children[idx].size),))
                 new_node = node_class(
@@ -657,6 +770,78 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
 
         self._propogate(new_node, path=path)
 
+    @classmethod
+    def from_sorted_items(cls, items):
+        """Returns a new tree of the (key, value) pairs of items, which must
+        be in strictly increasing order of serialized key, as iteritems()
+        would return them. The tree is built bottom-up in a single pass, each
+        node being constructed just once when all the keys beneath it have
+        been seen, rather than the path to the root being rebuilt for every
+        insertion as with update(). Raises ValueError if the keys are out of
+        order."""
+        def _prepared():
+            for key, value in items:
+                _key, value = cls._prepare_key(key), cls._prepare_value(value)
+                if not (isinstance(_key, BitPrefix) and
+                        isinstance(value, six.binary_type)):
+                    raise TypeError(u"%s can only map bitstring -> binary type"
+                        % cls.__name__)
+                yield (_key, value, key)
+        value, children = cls._build_sorted(_prepared())
+        return cls(value=value, children=children)
+
+    @classmethod
+    def _build_sorted(cls, items):
+        """Builds the subtrees of the (key, value, original key) triples of
+        items, with keys prepared and strictly increasing, returning the
+        value and list of child links of their root. See from_sorted_items()."""
+        link_class = getattr(cls, 'get_link_class',
+            lambda: getattr(cls, 'link_class'))()
+        node_class = getattr(cls, 'get_node_class',
+            lambda: getattr(cls, 'node_class', cls))()
+
+        # The open nodes along the path to the last key, each a list of its
+        # depth, a key beneath it, its value and its children.
+        stack = [[0, BitPrefix(), None, []]]
+
+        def _close(depth):
+            # Completes the nodes deeper than depth, linking each into its
+            # parent, and returns the deepest remaining open node, which is
+            # at depth.
+            while stack[-1][0] > depth:
+                node_depth, key, value, children = stack.pop()
+                node = node_class(value=value, children=children)
+                if stack[-1][0] < depth:
+                    # The new key branches off part-way along the link to
+                    # this node, where a new inner node is needed.
+                    stack.append([depth, key, None, []])
+                parent_depth = stack[-1][0]
+                stack[-1][3].append(link_class(
+                    prefix = key[parent_depth:node_depth],
+                    node   = node))
+            return stack[-1]
+
+        last = None
+        for key, value, _key in items:
+            if last is None:
+                depth = 0
+            else:
+                depth = last.common_length(key)
+                if depth == len(key) or (depth < len(last) and not key[depth]):
+                    raise ValueError(u"keys are not in strictly increasing "
+                                     u"order at %r" % (_key,))
+            parent = _close(depth)
+            if len(key) == parent[0]:
+                # Only the empty key can end at an open node: the root.
+                parent[2] = value
+            else:
+                stack.append([len(key), key, value, []])
+            last = key
+
+        _close(0)
+        depth, key, value, children = stack.pop()
+        return (value, children)
+
     def update(self, other=None, **kwargs):
         """x.update(E, **F) -> None. update x from trie/dict/iterable E or F.
         If E has a .keys() method, does:     for k in E: x[k] = E[k]
@@ -784,7 +969,7 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
 
         new_node = node_class(value=None, children=old_node.children)
 
-        if path and not new_node.size:
+        if path and not new_node.count:
             # Remove from parent
             parent, idx, prefix = path.pop()
             new_node = node_class(
@@ -802,7 +987,7 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
                                list((link_class(
                                    prefix = prefix + new_node.children[0].prefix,
                                    node   = new_node.children[0].node,
-                                   hash   = new_node.children[0]._hash,
+                                   hash   = new_node.children[0].pruned and new_node.children[0]._hash or None,
                                    count  = new_node.children[0].count,
                                    size   = new_node.children[0].size),)) +
                                list(x for x in parent.children[idx+1:])),
@@ -819,6 +1004,165 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
         "x.__delitem__(y) <==> del x[y]"
         self.delete([key])
 
+    def _apply(self, value, prune_value, children, changes):
+        """Applies changes, a sorted list of (key, value, original key)
+        triples with keys relative to a node whose value, prune_value and
+        list of child links are given, a value of None meaning a deletion
+        and SENTINAL a deletion of the key only if present.
+        Returns the resulting (value, prune_value, children), or None if the
+        node is left empty. The nodes of changed children are constructed
+        here, but that of the node itself is left to the caller, which may
+        instead squash it into its parent link."""
+        link_class = getattr(self, 'get_link_class',
+            lambda: getattr(self, 'link_class'))()
+        node_class = getattr(self, 'get_node_class',
+            lambda: getattr(self, 'node_class', self.__class__))()
+
+        start = 0
+        if changes and not len(changes[0][0]):
+            key, new_value, key_ = changes[0]
+            if new_value is None or new_value is SENTINAL:
+                if value is None and new_value is None:
+                    raise KeyError(key_)
+                value, prune_value = None, None
+            elif new_value != value:
+                value, prune_value = new_value, False
+            start = 1
+
+        # The keys are sorted, so those beginning with a 0 bit come first.
+        lo, hi = start, len(changes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if changes[mid][0][0]:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        links = dict((link.prefix[0], link) for link in children)
+        for bit, group in ((False, changes[start:lo]), (True, changes[lo:])):
+            if not group:
+                continue
+            link = links.pop(bit, None)
+            if link is None:
+                # Nothing to merge with: the new keys are built into a
+                # subtree directly, whose root has just the one link.
+                inserts = []
+                for key, new_value, key_ in group:
+                    if new_value is None:
+                        raise KeyError(key_)
+                    if new_value is not SENTINAL:
+                        inserts.append((key, new_value, key_))
+                if inserts:
+                    links[bit] = self._build_sorted(inserts)[1][0]
+                continue
+            len_ = min(link.prefix.common_length(group[0][0]),
+                       link.prefix.common_length(group[-1][0]))
+            if len_ == len(link.prefix):
+                if link.pruned:
+                    raise KeyError(group[0][2])
+                node = link.node
+                result = self._apply(node.value, node.prune_value,
+                                     list(node.children),
+                    [(key[len_:], new_value, key_) for key, new_value, key_ in group])
+            else:
+                # Some keys leave the link part-way along, where it is
+                # split by a new inner node.
+                result = self._apply(None, None, [link_class(
+                        prefix = link.prefix[len_:],
+                        node   = link.node,
+                        hash   = link.pruned and link._hash or None,
+                        count  = link.count,
+                        size   = link.size)],
+                    [(key[len_:], new_value, key_) for key, new_value, key_ in group])
+            prefix = link.prefix[:len_]
+            if result is None:
+                continue
+            child_value, child_prune_value, child_children = result
+            if child_value is None and len(child_children) == 1:
+                # Squash with the only child of a valueless node
+                child = child_children[0]
+                links[bit] = link_class(
+                    prefix = prefix + child.prefix,
+                    node   = child.node,
+                    hash   = child.pruned and child._hash or None,
+                    count  = child.count,
+                    size   = child.size)
+                continue
+            node = node_class(
+                value       = child_value,
+                children    = child_children,
+                prune_value = child_prune_value)
+            if node.length:
+                links[bit] = link_class(prefix=prefix, node=node)
+            else:
+                links[bit] = link_class(prefix=prefix, hash=node.hash,
+                                        count=node.count, size=node.size)
+
+        children = [links[bit] for bit in (False, True) if bit in links]
+        if value is None and not children:
+            return None
+        return (value, prune_value, children)
+
+    def apply(self, changes):
+        """x.apply(E) -> None. Updates x with the (key, value) pairs of the
+        mapping or iterable E in turn, a value of None deleting the key.
+        Raises KeyError, leaving x unchanged, if a key to be deleted is
+        absent.
+
+        The changes are sorted and merged into the tree in a single
+        traversal, each affected node being rebuilt just once however many
+        of the changed keys are beneath it, rather than the path to the
+        root being rebuilt for every change as with update() and delete().
+        Hashes are recomputed only as they are read."""
+        if hasattr(changes, 'keys'):
+            changes = [(key, changes[key]) for key in changes]
+        # The last change to each key is the one made, but a deletion is
+        # checked against the tree only if it is the first change to that
+        # key, and is otherwise made only if a value has since been set (as
+        # signalled by a value of SENTINAL).
+        prepared = {}
+        for key, value in changes:
+            _key = self._prepare_key(key)
+            if value is not None:
+                value = self._prepare_value(value)
+                if not (isinstance(_key, BitPrefix) and
+                        isinstance(value, six.binary_type)):
+                    raise TypeError(u"%s can only map bitstring -> binary type"
+                        % self.__class__.__name__)
+            elif _key in prepared:
+                if prepared[_key][1] in (None, SENTINAL):
+                    raise KeyError(key)
+                value = SENTINAL
+            prepared[_key] = (_key, value, key)
+        changes = sorted(six.itervalues(prepared), key=lambda change:change[0])
+        if not changes:
+            return
+
+        node_class = getattr(self, 'get_node_class',
+            lambda: getattr(self, 'node_class', self.__class__))()
+        result = self._apply(self.value, self.prune_value,
+                             list(self.children), changes)
+        if result is None:
+            node = node_class()
+        else:
+            value, prune_value, children = result
+            node = node_class(value=value, children=children,
+                              prune_value=prune_value)
+        for attr in self.__slots__:
+            setattr(self, attr, getattr(node, attr, None))
+
+    def batch(self):
+        """Returns a context manager which collects assignments and deletions
+        made through it, and applies them together with apply() when the
+        block exits without an exception:
+
+            with tree.batch() as batch:
+                batch[key] = value
+                del batch[other]
+
+        The tree itself is unchanged until then."""
+        return AuthTreeBatch(self)
+
     def copy(self, node_class=None):
         if node_class is None:
             node_class = getattr(self, 'get_node_class',
@@ -828,6 +1172,40 @@ class BaseAuthTreeNode(SerializableMixin, HashableMixin):
             children    = self.children,
             prune_value = self.prune_value)
 
+class AuthTreeBatch(object):
+    "Changes to be made to an authenticated tree. See BaseAuthTreeNode.batch()."
+    def __init__(self, tree):
+        self.tree, self.changes = tree, list()
+
+    def __setitem__(self, key, value):
+        "x.__setitem__(i, y) <==> x[i]=y"
+        self.changes.append((key, value))
+
+    def __delitem__(self, key):
+        "x.__delitem__(y) <==> del x[y]"
+        self.changes.append((key, None))
+
+    def update(self, other=None, **kwargs):
+        "x.update(E, **F) -> None. As for the tree, but deferred."
+        if other is None:
+            other = ()
+        if hasattr(other, 'keys'):
+            other = [(key, other[key]) for key in other]
+        self.changes.extend(other)
+        self.changes.extend(six.iteritems(kwargs))
+
+    def delete(self, keys):
+        "x.delete(E) -> None. Same as `for k in E: del x[k]`"
+        self.changes.extend((key, None) for key in keys)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.tree.apply(self.changes)
+        self.changes = list()
+
 class BaseComposableAuthTree(BaseAuthTreeNode):
     link_class = ComposableAuthTreeLink
 class MemoryComposableAuthTree(BaseComposableAuthTree):
@@ -838,4 +1216,191 @@ class BasePatriciaAuthTree(BaseAuthTreeNode):
 class MemoryPatriciaAuthTree(BasePatriciaAuthTree):
     pass
 
+# ===----------------------------------------------------------------------===
+
+import sqlite3
+
+from .serialize import BufferReader
+
+class AuthTreeNodeStore(object):
+    """Content-addressed storage for the nodes of an authenticated prefix
+    tree, in an SQLite database. Each node is stored once, under its hash, as
+    a record holding its serialization with every branch pruned, followed by
+    the hash of the node and the (non-pruned) length of each branch:
+
+        node.serialize() || (node hash || VarInt(length)) per branch
+
+    A branch which was actually pruned is recorded with a node hash of zero.
+    Records are only ever added, so the nodes of every committed version of
+    the tree remain available.
+
+    Nodes are read back as they are needed and kept in a cache of the
+    cache_size most recently used. Nodes created in memory are written out
+    by `flush()`, which releases them to the cache, and made durable along
+    with the hash of the root by `commit()`. Every node read back or written
+    out, but the root, is marked with the store as its `_store`, and is not
+    modified thereafter."""
+    DEFAULT_CACHE_SIZE = 65536
+
+    def __init__(self, filename, node_class, cache_size=DEFAULT_CACHE_SIZE):
+        if cache_size < 1:
+            raise ValueError(u"cache size must be positive")
+        self.node_class, self.cache_size = node_class, cache_size
+        self._cache = OrderedDict()
+        self._db = sqlite3.connect(filename)
+        self._db.execute('CREATE TABLE IF NOT EXISTS node '
+                         '(hash BLOB PRIMARY KEY, record BLOB NOT NULL)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS root '
+                         '(id INTEGER PRIMARY KEY CHECK (id = 0), hash BLOB NOT NULL)')
+        self._db.commit()
+
+    compressor = BaseAuthTreeNode.compressor
+
+    def _cache_put(self, hash_, node):
+        cache = self._cache
+        cache[hash_] = node
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def get(self, hash_):
+        """Returns the node with hash hash_, from the cache if present or else
+        from the database. Raises KeyError if there is no such node."""
+        cache = self._cache
+        node = cache.get(hash_)
+        if node is not None:
+            cache.move_to_end(hash_)
+            return node
+        row = self._db.execute('SELECT record FROM node WHERE hash = ?',
+            (self.compressor.serialize(hash_),)).fetchone()
+        if row is None:
+            raise KeyError(hash_)
+        file_ = BufferReader(row[0])
+        node = self.node_class.deserialize(file_)
+        for link in node.children:
+            node_hash = self.compressor.deserialize(file_)
+            length = file_.read_varint()
+            if node_hash:
+                link._store, link._node_hash, link._length = (
+                    self, node_hash, length)
+        # The length was computed with every branch pruned.
+        node.length = (int(node.value is not None) -
+                       int(node.prune_value is True) +
+                       sum(link.length for link in node.children))
+        node._hash, node._store = hash_, self
+        self._cache_put(hash_, node)
+        return node
+
+    def _record(self, node):
+        link_class = getattr(node, 'get_link_class',
+            lambda: getattr(node, 'link_class'))()
+        parts = [self.node_class(
+            value       = node.value,
+            children    = [link_class(prefix=link.prefix, hash=link.hash,
+                                      count=link.count, size=link.size)
+                           for link in node.children],
+            extra       = node.extra,
+            prune_value = node.prune_value).serialize()]
+        for link in node.children:
+            parts.append(self.compressor.serialize(link._node_hash or 0))
+            parts.append(VarInt(link._length or 0).serialize())
+        return b''.join(parts)
+
+    def flush(self, root):
+        """Writes out every node of the tree root which is held in memory,
+        including root itself, and returns the hash of root. The links to
+        these nodes then keep only their hashes, so that the nodes may be
+        evicted from the cache. The writes are not durable until the next
+        call to `commit()`."""
+        records = []
+        def _flush(node):
+            for link in node.children:
+                child = link._node
+                if child is not None:
+                    _flush(child)
+                    # The hash of the link is computed from the node, so
+                    # must be before the node is released.
+                    link.hash
+                    link._store, link._node_hash, link._length, link._node = (
+                        self, child.hash, child.length, None)
+            records.append((self.compressor.serialize(node.hash),
+                            self._record(node)))
+            if node is not root:
+                node._store = self
+                self._cache_put(node.hash, node)
+        _flush(root)
+        self._db.executemany('INSERT OR IGNORE INTO node (hash, record) '
+                             'VALUES (?, ?)', records)
+        return root.hash
+
+    def commit(self, root):
+        """Flushes the tree root, then records it as the current root and
+        commits the database."""
+        hash_ = self.flush(root)
+        self._db.execute('INSERT OR REPLACE INTO root (id, hash) VALUES (0, ?)',
+            (self.compressor.serialize(hash_),))
+        self._db.commit()
+        return hash_
+
+    def load(self):
+        """Returns a new tree of node_class with the contents of the last
+        committed root, or an empty tree if nothing has been committed."""
+        row = self._db.execute('SELECT hash FROM root WHERE id = 0').fetchone()
+        if row is None:
+            tree = self.node_class()
+        else:
+            # The cached node is not used directly, as the root of the tree
+            # is modified in place.
+            node = self.get(self.compressor.deserialize(BufferReader(row[0])))
+            tree = self.node_class(
+                value       = node.value,
+                children    = node.children,
+                extra       = node.extra,
+                prune_value = node.prune_value)
+        tree.store = self
+        return tree
+
+    def close(self):
+        """Closes the database, discarding anything written since the last
+        commit."""
+        self._cache.clear()
+        self._db.close()
+
+class _DiskAuthTreeMixin(object):
+    """An authenticated prefix tree backed by an `AuthTreeNodeStore`, for
+    trees too large to be held in memory:
+
+        tree = DiskPatriciaAuthTree.open('utxo.db')
+        tree[key] = value
+        tree.commit()
+
+    Only the root, the nodes created since the last flush, and the cache of
+    recently used nodes are kept in memory. The store belongs to the root;
+    the nodes within the tree have none."""
+    @classmethod
+    def open(cls, filename, cache_size=AuthTreeNodeStore.DEFAULT_CACHE_SIZE):
+        """Opens or creates the store filename, returning the tree it last
+        committed."""
+        return AuthTreeNodeStore(filename, cls, cache_size=cache_size).load()
+
+    def flush(self):
+        """x.flush() -> hash. Writes out the nodes of x held in memory. See
+        AuthTreeNodeStore.flush()."""
+        return self.store.flush(self)
+
+    def commit(self):
+        """x.commit() -> hash. Flushes x and durably records it as the tree
+        of the store."""
+        return self.store.commit(self)
+
+    def close(self):
+        """x.close() -> None. Closes the store, discarding changes made since
+        the last commit."""
+        self.store.close()
+
+class DiskComposableAuthTree(_DiskAuthTreeMixin, BaseComposableAuthTree):
+    link_class = StoredComposableAuthTreeLink
+
+class DiskPatriciaAuthTree(_DiskAuthTreeMixin, BasePatriciaAuthTree):
+    link_class = StoredPatriciaAuthTreeLink
+
 # End of File
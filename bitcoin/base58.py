@@ -85,7 +85,7 @@ class HashCheckedData(six.binary_type):
         # If add_hash is set then we need to create and append a checksum to
         # the data string passed in. We also do this
         if add_hash:
-            checksum = hash256(data).digest()[:4]
+            checksum = hash256_bytes(data)[:4]
             bytes_ = b''.join([data, checksum])
         # Otherwise we assume that the data has a checksum already, which we
         # extract out and verify.
@@ -99,9 +99,10 @@ class HashCheckedData(six.binary_type):
             # Extract the checksum:
             data, checksum, bytes_ = data[:-4], data[-4:], data
             # Verify that the stored checksum matches the actual value:
-            if checksum != hash256(data).digest()[:4]:
+            expected = hash256_bytes(data)[:4]
+            if checksum != expected:
                 raise HashChecksumError(u"checksum doesn't match: %s != %s" % (
-                    hash256(data).hexdigest()[:8], checksum.encode('hex')))
+                    expected.hex(), checksum.hex()))
         # We're little more than a wrapper around Python's native binary type.
         # Use that constructor to create the instance:
         return super(HashCheckedData, cls).__new__(cls, bytes_, *args, **kwargs)
@@ -156,6 +157,6 @@ class VersionedPayload(HashCheckedData):
 # Placed at the bottom of the file so as to avoid a circular import
 # dependency that would otherwise occur (the Secret class within the crypto
 # module derives from VersionedPayload).
-from .hash import hash256
+from .hash import hash256_bytes
 
 # End of File
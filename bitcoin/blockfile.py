@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+"Reader for the block files (blk*.dat) written by the reference client."
+
+__all__ = [
+    'BlockRecord',
+    'BlockFile',
+    'ScanRecord',
+    'BlockScanner',
+]
+
+import mmap
+import multiprocessing
+import os
+import time
+from collections import deque
+from struct import unpack_from
+
+from recordtype import recordtype
+
+# ===----------------------------------------------------------------------===
+
+BlockRecord = recordtype('BlockRecord', ['offset', 'header', 'transactions'])
+
+class BlockFile(object):
+    """A block file as written by the reference client, in which each block is
+    framed by the network magic and the block's length as a 4-byte little-
+    endian integer. Iterating over a BlockFile yields a `BlockRecord` for each
+    block, consisting of its offset, its header (a `Block`), and its
+    transactions (a list of `LazyTransaction`s).
+
+    The file is memory-mapped, never read: only the pages of the blocks being
+    visited are brought into memory, and the kernel is free to drop them again
+    once the scan has moved on, so files of any size can be scanned at disk
+    speed in constant memory. Transactions copy out their own serialization,
+    and remain valid after the BlockFile is closed.
+
+    Offsets are those of the block data itself, following the magic and
+    length, as recorded in the reference client's block index. Preallocated
+    space at the end of a file, which the reference client fills with zeros,
+    is ignored."""
+    def __init__(self, file_, magic=None):
+        if magic is None:
+            magic = CHAIN_PARAMETERS['bitcoin.org']
+        self.magic = bytes(getattr(magic, 'magic', magic))
+        if isinstance(file_, str):
+            file_ = open(file_, 'rb')
+            self._close_file = True
+        else:
+            self._close_file = False
+        self._file = file_
+        try:
+            self._map = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be mapped.
+            self._map = None
+        else:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                self._map.madvise(mmap.MADV_SEQUENTIAL)
+        self._view = memoryview(self._map if self._map is not None else b'')
+
+    @classmethod
+    def get_block_class(cls):
+        return getattr(cls, 'block_class', Block)
+
+    @classmethod
+    def get_transaction_class(cls):
+        return getattr(cls, 'transaction_class', LazyTransaction)
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Unmaps and, if it was opened by name, closes the file. The mapping
+        cannot be closed while any `BufferReader` or memoryview obtained
+        from `buffer` is still alive."""
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+        if self._close_file:
+            self._file.close()
+
+    @property
+    def buffer(self):
+        "A read-only `memoryview` of the entire file."
+        return self._view
+
+    @property
+    def size(self):
+        return len(self._view)
+
+    def frames(self, start=0, end=None):
+        """Yields the (offset, length) of each block whose framing begins in
+        the byte range [start, end) of the file. start must be the position
+        of a frame. Nothing but the 8-byte framing of each block is read."""
+        view, magic = self._view, self.magic
+        size = len(view)
+        if end is None or end > size:
+            end = size
+        pos = start
+        while pos < end and pos + 8 <= size:
+            frame_magic = bytes(view[pos:pos+4])
+            if frame_magic != magic:
+                if not any(frame_magic):
+                    break
+                raise ValueError(u"bad network magic %s at offset %d" % (
+                    frame_magic.hex(), pos))
+            length = unpack_from('<I', view, pos+4)[0]
+            offset = pos + 8
+            if offset + length > size:
+                raise EOFError(u"truncated block at offset %d" % offset)
+            yield offset, length
+            pos = offset + length
+
+    def read(self, offset, length=None):
+        """Deserializes the block at offset, returning a `BlockRecord`. The
+        length is read from the framing if not given."""
+        if length is None:
+            length = unpack_from('<I', self._view, offset-4)[0]
+        reader = BufferReader(self._view, offset, offset+length)
+        header = self.get_block_class().deserialize(reader)
+        transaction_class = self.get_transaction_class()
+        transactions = list(transaction_class.deserialize(reader)
+                            for _ in range(reader.read_compact_size()))
+        if reader.remaining:
+            raise ValueError(
+                u"block at offset %d is %d bytes longer than its contents" % (
+                    offset, reader.remaining))
+        return BlockRecord(offset, header, transactions)
+
+    def read_header(self, offset):
+        "Deserializes just the header of the block at offset."
+        return self.get_block_class().deserialize(
+            BufferReader(self._view, offset, offset+80))
+
+    def headers(self, start=0, end=None):
+        """Yields the (offset, header) of each block in the byte range
+        [start, end), without touching its transactions."""
+        for offset, length in self.frames(start, end):
+            yield offset, self.read_header(offset)
+
+    def records(self, start=0, end=None):
+        "Yields a `BlockRecord` for each block in the byte range [start, end)."
+        for offset, length in self.frames(start, end):
+            yield self.read(offset, length)
+
+    def __iter__(self):
+        return self.records()
+
+# ===----------------------------------------------------------------------===
+
+ScanRecord = recordtype('ScanRecord',
+    ['path', 'offset', 'hash', 'txids', 'values'])
+
+class BlockScanner(object):
+    """Scans a sequence of block files across a pool of worker processes,
+    yielding a `ScanRecord` for each block: its path and offset, the hash of
+    its header, the hashes of its transactions, and--if a function was
+    given--the result of calling function on each of its transactions
+    (`LazyTransaction`s). The function must be picklable, which is to say
+    defined at the top level of a module.
+
+    The files are split into chunks of about chunk_size bytes at block
+    boundaries, found by walking the 8-byte framing of each block, and the
+    chunks are handed out to the workers. At most window chunks (by default
+    twice the number of workers) are in flight or awaiting the consumer at
+    any one time, so memory use is bounded however far the workers get ahead.
+    With workers=0 the scan is performed in the calling process.
+
+    The reference client writes blocks as they arrive, which is not always
+    after their parents, and keeps blocks which are no longer in the best
+    chain. So if ordered is set (the default), the headers of the files are
+    first read into a `HeaderChain`, and the records are yielded in order of
+    height along its best chain, the first block of the files being taken as
+    the genesis block. Records which arrive ahead of their turn are held
+    until it comes, which takes memory in proportion to how far blocks are
+    out of order in the files. Blocks which are not in the best chain are
+    counted in `stale` and not yielded. Otherwise the records are yielded in
+    file order.
+
+    Once the scan has started, `blocks`, `transactions` and `elapsed` give
+    the progress so far, and `blocks_per_second` the rate."""
+    def __init__(self, paths, function=None, workers=None, chunk_size=1<<24,
+                 window=None, magic=None, ordered=True):
+        if isinstance(paths, str):
+            paths = [paths]
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if window is None:
+            window = 2 * max(workers, 1)
+        if chunk_size < 1 or window < 1:
+            raise ValueError(u"chunk_size and window must be positive")
+        if magic is None:
+            magic = CHAIN_PARAMETERS['bitcoin.org']
+        self.paths = list(paths)
+        self.function = function
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.window = window
+        self.magic = bytes(getattr(magic, 'magic', magic))
+        self.ordered = ordered
+        self.blocks = self.transactions = self.stale = 0
+        self.elapsed = 0.0
+
+    def chunks(self):
+        """Yields the (path, start, end) byte ranges into which the files are
+        split, each starting at a block boundary."""
+        for path in self.paths:
+            with BlockFile(path, magic=self.magic) as file_:
+                start = end = 0
+                for offset, length in file_.frames():
+                    if end - start >= self.chunk_size:
+                        yield path, start, end
+                        start = end
+                    end = offset + length
+                if end > start:
+                    yield path, start, end
+
+    def header_chain(self):
+        """Returns a `HeaderChain` of the headers of the blocks in the files,
+        read in file order, with those which precede their parent appended
+        once it has been. Headers whose parent is never found are left out."""
+        chain, orphans = HeaderChain(), {}
+        for path in self.paths:
+            with BlockFile(path, magic=self.magic) as file_:
+                view = file_.buffer
+                for offset, length in file_.frames():
+                    raw = bytes(view[offset:offset+80])
+                    if len(chain) and (
+                            int.from_bytes(raw[4:36], 'little') not in chain):
+                        orphans.setdefault(raw[4:36], []).append(raw)
+                        continue
+                    queue = [raw]
+                    while queue:
+                        index = chain.append(queue.pop())
+                        queue.extend(orphans.pop(
+                            chain.hash(index).to_bytes(32, 'little'), ()))
+        return chain
+
+    @property
+    def blocks_per_second(self):
+        return self.blocks / self.elapsed if self.elapsed else 0.0
+
+    def __iter__(self):
+        self.blocks = self.transactions = self.stale = 0
+        self.elapsed = 0.0
+        started = time.time()
+        records = self._records()
+        if self.ordered:
+            records = self._chain_order(records, self.header_chain())
+        for record in records:
+            self.blocks += 1
+            self.transactions += len(record.txids)
+            self.elapsed = time.time() - started
+            yield record
+
+    def _records(self):
+        "Yields the records of the files in file order."
+        tasks = ((path, start, end, self.magic, self.function)
+                 for path, start, end in self.chunks())
+        if self.workers:
+            pool = multiprocessing.Pool(self.workers)
+            results = self._imap(pool, tasks)
+        else:
+            pool = None
+            results = map(_scan_chunk, tasks)
+        try:
+            for path, blocks in results:
+                for offset, hash_, txids, values in blocks:
+                    yield ScanRecord(path, offset, hash_, txids, values)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            _close_scan_file()
+
+    def _chain_order(self, records, chain):
+        """Yields the records of the best chain of chain by height, holding
+        back those which arrive early."""
+        pending, height = {}, 0
+        for record in records:
+            if record.hash not in chain or (
+                    not chain.in_best_chain(chain.index(record.hash))):
+                self.stale += 1
+                continue
+            # A block written twice is yielded once.
+            record_height = chain.height(chain.index(record.hash))
+            if record_height >= height:
+                pending.setdefault(record_height, record)
+            while height in pending:
+                yield pending.pop(height)
+                height += 1
+
+    def _imap(self, pool, tasks):
+        "Like `pool.imap`, but with no more than window chunks outstanding."
+        pending = deque()
+        for task in tasks:
+            if len(pending) >= self.window:
+                yield pending.popleft().get()
+            pending.append(pool.apply_async(_scan_chunk, (task,)))
+        while pending:
+            yield pending.popleft().get()
+
+# The (path, magic, BlockFile) most recently opened by _scan_chunk, kept open
+# as consecutive chunks handed to a worker are usually from the same file.
+_scan_file = None
+
+def _close_scan_file():
+    global _scan_file
+    if _scan_file is not None:
+        _scan_file[2].close()
+        _scan_file = None
+
+def _scan_chunk(task):
+    "Runs in a worker process to scan the blocks within a byte range."
+    global _scan_file
+    path, start, end, magic, function = task
+    if _scan_file is None or _scan_file[:2] != (path, magic):
+        _close_scan_file()
+        _scan_file = (path, magic, BlockFile(path, magic=magic))
+    blocks = []
+    for offset, header, transactions in _scan_file[2].records(start, end):
+        values = None
+        if function is not None:
+            values = [function(tx) for tx in transactions]
+        blocks.append((offset, header.hash,
+                       transaction_hashes(transactions), values))
+    return path, blocks
+
+# ===----------------------------------------------------------------------===
+
+from .chain import HeaderChain
+from .core import Block, LazyTransaction, transaction_hashes
+from .defaults import CHAIN_PARAMETERS
+from .serialize import BufferReader
+from .tools import list
+
+# End of File
@@ -8,16 +8,18 @@ __all__ = [
     'Output',
     'Input',
     'Transaction',
+    'LazyTransaction',
+    'transaction_hashes',
     'Block',
     'ConnectedBlockInfo',
 ]
 
 import calendar
 import numbers
-from struct import pack, unpack
+from array import array
 from recordtype import recordtype
 
-from .mixins import HashableMixin, SerializableMixin
+from .mixins import HashableMixin, SerializableMixin, TrackedList, TrackedMixin
 
 # ===----------------------------------------------------------------------===
 
@@ -29,7 +31,11 @@ ChainParameters = recordtype('ChainParameters',
 
 # ===----------------------------------------------------------------------===
 
-class Output(SerializableMixin):
+class Output(TrackedMixin, SerializableMixin):
+    __slots__ = ('amount', 'contract', '_serialized', '_owner')
+    tracked_attributes = frozenset(__slots__[:2])
+    cache_slots = __slots__[2:]
+
     def __init__(self, amount=0, contract=None, *args, **kwargs):
         if contract is None:
             contract = self.get_script_class()()
@@ -41,18 +47,26 @@ class Output(SerializableMixin):
     def get_script_class(cls):
         return getattr(cls, 'script_class', Script)
 
-    def serialize(self):
-        parts = list()
-        parts.append(pack('<Q', self.amount))
-        script = self.contract.serialize()
-        parts.append(LittleCompactSize(len(script)).serialize())
-        parts.append(FlatData(script).serialize())
-        return b''.join(parts)
+    def _script(self):
+        script = self.contract
+        if not isinstance(script, bytes):
+            script = script.serialize()
+        return script
+    def serialize_into(self, buf):
+        buf = as_writer(buf)
+        buf.write_u64(self.amount)
+        script = self._script()
+        buf.write_compact_size(len(script))
+        buf.write(script)
+    def serialized_size(self):
+        len_ = len(self._script())
+        return 8 + _compact_size_length(len_) + len_
     @classmethod
     def deserialize(cls, file_):
+        file_ = as_reader(file_)
         initargs = {}
-        initargs['amount'] = unpack('<Q', file_.read(8))[0]
-        script_len = LittleCompactSize.deserialize(file_)
+        initargs['amount'] = file_.read_u64()
+        script_len = file_.read_compact_size()
         initargs['contract'] = cls.get_script_class().deserialize(file_, script_len)
         return cls(**initargs)
 
@@ -68,7 +82,12 @@ class Output(SerializableMixin):
 
 # ===----------------------------------------------------------------------===
 
-class Input(SerializableMixin):
+class Input(TrackedMixin, SerializableMixin):
+    __slots__ = ('hash', 'index', 'endorsement', 'sequence', '_serialized',
+                 '_owner')
+    tracked_attributes = frozenset(__slots__[:4])
+    cache_slots = __slots__[4:]
+
     def __init__(self, hash=0, index=0xffffffff, endorsement=None,
                  sequence=0xffffffff, *args, **kwargs):
         if endorsement is None:
@@ -83,29 +102,35 @@ class Input(SerializableMixin):
     def get_script_class(cls):
         return getattr(cls, 'script_class', Script)
 
-    def serialize(self):
-        parts = list()
-        parts.append(hash256.serialize(self.hash))
-        parts.append(pack('<I', self.index))
+    def _script(self):
         script = self.endorsement
-        if hasattr(script, 'serialize'):
+        if not isinstance(script, bytes) and hasattr(script, 'serialize'):
             script = script.serialize()
-        parts.append(LittleCompactSize(len(script)).serialize())
-        parts.append(FlatData(script).serialize())
-        parts.append(pack('<I', self.sequence))
-        return b''.join(parts)
+        return script
+    def serialize_into(self, buf):
+        buf = as_writer(buf)
+        buf.write(hash256.serialize(self.hash))
+        buf.write_u32(self.index)
+        script = self._script()
+        buf.write_compact_size(len(script))
+        buf.write(script)
+        buf.write_u32(self.sequence)
+    def serialized_size(self):
+        len_ = len(self._script())
+        return 40 + _compact_size_length(len_) + len_
     @classmethod
     def deserialize(cls, file_):
+        file_ = as_reader(file_)
         initargs = {}
         initargs['hash'] = hash256.deserialize(file_)
-        initargs['index'] = unpack('<I', file_.read(4))[0]
-        len_ = LittleCompactSize.deserialize(file_)
-        if not all((initargs['hash']  == 0,
-                    initargs['index'] == 0xffffffff)):
+        initargs['index'] = file_.read_u32()
+        len_ = file_.read_compact_size()
+        if all((initargs['hash']  == 0,
+                initargs['index'] == 0xffffffff)):
             initargs['coinbase'] = FlatData.deserialize(file_, len_)
         else:
             initargs['endorsement'] = cls.get_script_class().deserialize(file_, len_)
-        initargs['sequence'] = unpack('<I', file_.read(4))[0]
+        initargs['sequence'] = file_.read_u32()
         return cls(**initargs)
 
     @property
@@ -135,16 +160,21 @@ class Input(SerializableMixin):
 
 # ===----------------------------------------------------------------------===
 
-class Transaction(SerializableMixin, HashableMixin):
+class Transaction(TrackedMixin, SerializableMixin, HashableMixin):
+    __slots__ = ('version', 'inputs', 'outputs', 'lock_time', 'lock_height',
+                 '_hash', '_serialized')
+    tracked_attributes = frozenset(__slots__[:5])
+    cache_slots = __slots__[5:]
+
     def __init__(self, version=1, inputs=None, outputs=None, lock_time=0,
                  lock_height=0, *args, **kwargs):
         if inputs is None: inputs = ()
         if outputs is None: outputs = ()
         super(Transaction, self).__init__(*args, **kwargs)
         self.version = version
-        getattr(self, 'inputs_create', lambda:setattr(self, 'inputs', list()))()
+        getattr(self, 'inputs_create', lambda:setattr(self, 'inputs', TrackedList(self)))()
         self.inputs.extend(inputs)
-        getattr(self, 'outputs_create', lambda:setattr(self, 'outputs', list()))()
+        getattr(self, 'outputs_create', lambda:setattr(self, 'outputs', TrackedList(self)))()
         self.outputs.extend(outputs)
         self.lock_time = lock_time
         self.lock_height = lock_height
@@ -157,16 +187,33 @@ class Transaction(SerializableMixin, HashableMixin):
     def get_output_class(cls):
         return getattr(cls, 'output_class', Output)
 
-    def serialize(self):
+    def serialize_into(self, buf):
+        serialized = self._serialized
+        if serialized is not None:
+            as_writer(buf).write(serialized)
+            return
+        if self.version not in (1,2):
+            raise NotImplementedError()
+        buf = as_writer(buf)
+        buf.write_u32(self.version)
+        buf.write_compact_size(len(self.inputs))
+        for input in self.inputs:
+            input.serialize_into(buf)
+        buf.write_compact_size(len(self.outputs))
+        for output in self.outputs:
+            output.serialize_into(buf)
+        buf.write_u32(self.lock_time)
+        if self.version in (2,):
+            buf.write_u32(self.lock_height)
+    def serialized_size(self):
         if self.version not in (1,2):
             raise NotImplementedError()
-        result  = pack('<I', self.version)
-        result += serialize_iterator(self.inputs, lambda i:i.serialize())
-        result += serialize_iterator(self.outputs, lambda o:o.serialize())
-        result += pack('<I', self.lock_time)
-        if not (self.verssion == 1 and len(self.inputs) == 1 and self.inputs[0].is_coinbase()):
-            result += pack('<I', self.lock_height)
-        return result
+        size  = 8 + (self.version in (2,) and 4 or 0)
+        size += _compact_size_length(len(self.inputs))
+        size += sum(input.serialized_size() for input in self.inputs)
+        size += _compact_size_length(len(self.outputs))
+        size += sum(output.serialized_size() for output in self.outputs)
+        return size
     @classmethod
     def deserialize_input(cls, file_, *args, **kwargs):
         return cls.get_input_class().deserialize(file_, *args, **kwargs)
@@ -175,15 +222,17 @@ class Transaction(SerializableMixin, HashableMixin):
         return cls.get_output_class().deserialize(file_, *args, **kwargs)
     @classmethod
     def deserialize(cls, file_):
+        file_ = as_reader(file_)
         initargs = {}
-        initargs['version'] = unpack('<I', file_.read(4))[0]
+        initargs['version'] = file_.read_u32()
         if initargs['version'] not in (1,2):
             raise NotImplementedError()
-        initargs['inputs'] = list(deserialize_iterator(file_, lambda f:cls.deserialize_input(f)))
-        initargs['outputs'] = list(deserialize_iterator(file_, lambda f:cls.deserialize_output(f)))
-        initargs['lock_time'] = unpack('<I', file_.read(4))[0]
-        if not (self.verssion == 1 and len(self.inputs) == 1 and self.inputs[0].is_coinbase()):
-            initargs['lock_height'] = unpack('<I', file_.read(4))[0]
+        initargs['inputs'] = list(deserialize_iterator(file_, cls.deserialize_input))
+        initargs['outputs'] = list(deserialize_iterator(file_, cls.deserialize_output))
+        initargs['lock_time'] = file_.read_u32()
+        # Lock heights are added with transaction version=2.
+        if initargs['version'] in (2,):
+            initargs['lock_height'] = file_.read_u32()
         return cls(**initargs)
 
     @property
@@ -194,10 +243,12 @@ class Transaction(SerializableMixin, HashableMixin):
         return all((self.version     == other.version,
                     self.lock_time   == other.lock_time,
                     self.lock_height == other.lock_height,
-                    icmp(iter(self.inputs),  iter(other.inputs))  == 0,
-                    icmp(iter(self.outputs), iter(other.outputs)) == 0))
+                    len(self.inputs)  == len(other.inputs),
+                    len(self.outputs) == len(other.outputs),
+                    all(a == b for a,b in zip(self.inputs,  other.inputs)),
+                    all(a == b for a,b in zip(self.outputs, other.outputs))))
     def __repr__(self):
-        if self.verssion == 1 and len(self.inputs) == 1 and self.inputs[0].is_coinbase():
+        if self.version not in (2,):
             lock_height_str = ''
         else:
             lock_height_str = ', lock_height=%d' % self.lock_height
@@ -214,9 +265,181 @@ class Transaction(SerializableMixin, HashableMixin):
 
 # ===----------------------------------------------------------------------===
 
+class LazyTransaction(Transaction):
+    """A `Transaction` backed by its serialized bytes. A single scan decodes
+    the version and lock fields and records the offset of each input and
+    output, which are only deserialized when accessed. `serialize()` and
+    `hash` use the original bytes directly, so a scan which needs only the
+    txid or a few outputs of each transaction never allocates the rest.
+
+    Modifying a LazyTransaction, including any input or output of its
+    materialized `inputs` and `outputs` lists, materializes everything and
+    discards the original bytes, after which it behaves as an ordinary
+    Transaction. (Inputs and outputs returned by `input()` and `output()`
+    before the lists are materialized are detached copies.)"""
+    __slots__ = ('_raw', '_input_offsets', '_output_offsets', '_inputs',
+                 '_outputs')
+
+    def __init__(self, raw, *args, **kwargs):
+        layout = kwargs.pop('layout', None)
+        if layout is None:
+            reader = BufferReader(raw)
+            layout = self.scan(reader)
+            if reader.remaining:
+                raise ValueError(u"trailing data after serialized transaction")
+        # Transaction.__init__ is skipped, as it would create empty input and
+        # output lists.
+        self._raw = None
+        super(Transaction, self).__init__(*args, **kwargs)
+        (_, self.version, self._input_offsets, self._output_offsets,
+            self.lock_time, self.lock_height) = layout
+        self._inputs = self._outputs = None
+        self._raw = raw
+
+    @staticmethod
+    def scan(file_):
+        """Walks a serialized transaction without deserializing its inputs and
+        outputs, returning a tuple of its length, version, input offsets,
+        output offsets, lock time and lock height. Offsets are relative to the
+        start of the transaction."""
+        file_ = as_reader(file_)
+        start = file_.tell()
+        version = file_.read_u32()
+        if version not in (1,2):
+            raise NotImplementedError()
+        input_offsets = array('I')
+        for _ in range(file_.read_compact_size()):
+            input_offsets.append(file_.tell() - start)
+            file_.skip(36)
+            file_.skip(file_.read_compact_size() + 4)
+        output_offsets = array('I')
+        for _ in range(file_.read_compact_size()):
+            output_offsets.append(file_.tell() - start)
+            file_.skip(8)
+            file_.skip(file_.read_compact_size())
+        lock_time = file_.read_u32()
+        lock_height = 0
+        if version in (2,):
+            lock_height = file_.read_u32()
+        return (file_.tell() - start, version, input_offsets, output_offsets,
+                lock_time, lock_height)
+
+    @classmethod
+    def deserialize(cls, file_):
+        """Scans a transaction and copies its bytes out of file_ (which must
+        be seekable), without deserializing any inputs or outputs."""
+        file_ = as_reader(file_)
+        start = file_.tell()
+        layout = cls.scan(file_)
+        file_.seek(start)
+        raw = bytes(file_.read_slice(layout[0]))
+        return cls(raw, layout=layout)
+
+    def invalidate(self):
+        if self._raw is not None:
+            # The original bytes no longer describe this transaction, so
+            # everything is materialized before they are dropped.
+            self.inputs, self.outputs
+            self._raw = None
+        super(LazyTransaction, self).invalidate()
+
+    def serialize(self):
+        if self._raw is None:
+            return super(LazyTransaction, self).serialize()
+        return self._raw
+    def serialize_into(self, buf):
+        if self._raw is None:
+            return super(LazyTransaction, self).serialize_into(buf)
+        as_writer(buf).write(self._raw)
+    def serialized_size(self):
+        if self._raw is None:
+            return super(LazyTransaction, self).serialized_size()
+        return len(self._raw)
+
+    @property
+    def input_count(self):
+        if self._inputs is not None:
+            return len(self._inputs)
+        return len(self._input_offsets)
+
+    @property
+    def output_count(self):
+        if self._outputs is not None:
+            return len(self._outputs)
+        return len(self._output_offsets)
+
+    def input(self, index):
+        """Returns the input at index, deserializing only that input if the
+        `inputs` list has not yet been materialized."""
+        if self._inputs is not None:
+            return self._inputs[index]
+        return self.deserialize_input(
+            BufferReader(self._raw, self._input_offsets[index]))
+
+    def output(self, index):
+        """Returns the output at index, deserializing only that output if the
+        `outputs` list has not yet been materialized."""
+        if self._outputs is not None:
+            return self._outputs[index]
+        return self.deserialize_output(
+            BufferReader(self._raw, self._output_offsets[index]))
+
+    @property
+    def inputs(self):
+        if self._inputs is None:
+            reader = BufferReader(self._raw)
+            inputs = list()
+            for offset in self._input_offsets:
+                reader.seek(offset)
+                inputs.append(self.deserialize_input(reader))
+            self._inputs = TrackedList(self, inputs)
+        return self._inputs
+
+    @property
+    def outputs(self):
+        if self._outputs is None:
+            reader = BufferReader(self._raw)
+            outputs = list()
+            for offset in self._output_offsets:
+                reader.seek(offset)
+                outputs.append(self.deserialize_output(reader))
+            self._outputs = TrackedList(self, outputs)
+        return self._outputs
+
+    @property
+    def is_coinbase(self):
+        if self._raw is None:
+            return super(LazyTransaction, self).is_coinbase
+        if len(self._input_offsets) != 1:
+            return False
+        offset = self._input_offsets[0]
+        return self._raw[offset:offset+36] == _COINBASE_OUTPOINT
+
+_COINBASE_OUTPOINT = b'\x00'*32 + b'\xff'*4
+
+def transaction_hashes(transactions, workers=None):
+    """Returns the hashes of transactions, such as those of a block, in order.
+    Hashes not already cached are computed together with `hash256.many()`
+    (which see for workers), and cached."""
+    transactions = list(transactions)
+    missing = [tx for tx in transactions if getattr(tx, '_hash', None) is None]
+    if missing:
+        hashes = hash256.many([tx.serialize() for tx in missing], workers,
+                              intdigest=True)
+        for tx, hash_ in zip(missing, hashes):
+            tx.hash__setter(hash_)
+    return [tx.hash for tx in transactions]
+
+# ===----------------------------------------------------------------------===
+
 from .merkle import MerkleList
 
-class Block(SerializableMixin, HashableMixin):
+class Block(TrackedMixin, SerializableMixin, HashableMixin):
+    __slots__ = ('version', 'parent_hash', 'merkle_hash', 'time', 'bits',
+                 'nonce', '_hash', '_serialized')
+    tracked_attributes = frozenset(__slots__[:6])
+    cache_slots = __slots__[6:]
+
     def __init__(self, version=1, parent_hash=0, merkle_hash=0,
                  time=0, bits=0x1d00ffff, nonce=0, *args, **kwargs):
         parent = kwargs.pop('parent', None)
@@ -244,33 +467,36 @@ class Block(SerializableMixin, HashableMixin):
         self.bits        = bits
         self.nonce       = nonce
 
-    def serialize(self):
+    def serialize_into(self, buf):
         if self.version not in (1,2):
             raise NotImplementedError()
-        result  = pack('<I', self.version)
-        result += hash256.serialize(self.parent_hash)
-        result += hash256.serialize(self.merkle_hash)
+        buf = as_writer(buf)
+        buf.write_u32(self.version)
+        buf.write(hash256.serialize(self.parent_hash))
+        buf.write(hash256.serialize(self.merkle_hash))
         if isinstance(self.time, numbers.Integral):
             time = self.time
         else:
             time = calendar.timegm(self.time.utctimetuple())
-        result += pack('<I', time)
-        result += pack('<I', self.bits)
-        result += pack('<I', self.nonce)
-        return result
+        buf.write_u32(time)
+        buf.write_u32(self.bits)
+        buf.write_u32(self.nonce)
+    def serialized_size(self):
+        return 80
     def __bytes__(self):
         return self.serialize()
     @classmethod
     def deserialize(cls, file_):
+        file_ = as_reader(file_)
         initargs = {}
-        initargs['version'] = unpack('<I', file_.read(4))[0]
+        initargs['version'] = file_.read_u32()
         if initargs['version'] not in (1,2):
             raise NotImplementedError()
         initargs['parent_hash'] = hash256.deserialize(file_)
         initargs['merkle_hash'] = hash256.deserialize(file_)
-        initargs['time'] = unpack('<I', file_.read(4))[0]
-        initargs['bits'] = unpack('<I', file_.read(4))[0]
-        initargs['nonce'] = unpack('<I', file_.read(4))[0]
+        initargs['time'] = file_.read_u32()
+        initargs['bits'] = file_.read_u32()
+        initargs['nonce'] = file_.read_u32()
         return cls(**initargs)
 
     def __eq__(self, other):
@@ -317,7 +543,9 @@ ConnectedBlockInfo = recordtype('ConnectedBlockInfo',
 from .hash import hash256
 from .numeric import mpq
 from .script import Script
-from .serialize import LittleCompactSize, FlatData, serialize_iterator, deserialize_iterator
-from .tools import BytesIO, icmp, list, target_from_compact, tuple
+from .serialize import (
+    BufferReader, FlatData, _compact_size_length, as_reader, as_writer,
+    deserialize_iterator)
+from .tools import BytesIO, list, target_from_compact, tuple
 
 # End of File
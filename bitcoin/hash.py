@@ -6,18 +6,24 @@
 __all__ = (
     'hash160',
     'hash256',
+    'hash160_bytes',
+    'hash256_bytes',
+    'hash256_int',
 )
 
 import hashlib
+import numbers
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 
 from copy import deepcopy
 from .serialize import LittleInteger
-from .tools import BytesIO, tuple
+from .tools import tuple
 
 class _HashAlgorithm(object):
     def intdigest(self):
         "Returns the accumulated input interpreted as a little-endian integer."
-        return LittleInteger.deserialize(BytesIO(self.digest()), self.digest_size)
+        return int.from_bytes(self.digest(), 'little')
 
 class _NopHashAlgorithm(_HashAlgorithm):
     """This class implements the special case of `_ChainedHashAlgorithm([])`,
@@ -89,8 +95,11 @@ class _ChainedHashAlgorithm(_HashAlgorithm):
     def copy(self):
         "Return a clone of this hash object."
         other = _ChainedHashAlgorithm(self._algorithms)
-        other._hobj = deepcopy(self._hobj)
-        other._fobj = deepcopy(self._fobj)
+        # hashlib objects cannot be deep-copied, but copy() themselves
+        # cheaply, internal state and all.
+        other._hobj = self._hobj.copy()
+        if self._fobj is not None:
+            other._fobj = self._fobj.copy()
         return other
 
     def _finalize(self):
@@ -156,10 +165,64 @@ class _HashAlgorithmInterface(tuple):
         return hobj
     __call__=new
 
+    def digest_of(self, string):
+        """Returns the digest of string, as `self.new(string).digest()` but
+        without the intermediate hash objects."""
+        for name in self:
+            string = _constructor(name)(string).digest()
+        return string
+
+    def intdigest_of(self, string):
+        """Returns the digest of string interpreted as a little-endian integer,
+        as `self.new(string).intdigest()`."""
+        return int.from_bytes(self.digest_of(string), 'little')
+
+    def many(self, strings, workers=None, intdigest=False):
+        """Returns a list of the digests of each of strings, in order, or of
+        their integer values if intdigest is set. With workers greater than
+        one, the strings are split into chunks hashed concurrently by that
+        many threads if they are large enough for hashlib to release the GIL
+        while hashing them, or processes otherwise. workers may instead be an
+        existing `concurrent.futures.Executor`, which is used as-is and the
+        strings split for as many workers as there are CPUs, or the 2-tuple
+        (executor, count) of one and the number of workers it has."""
+        if not isinstance(strings, (list, tuple)):
+            strings = [string for string in strings]
+        if isinstance(workers, Executor):
+            executor, count = workers, os.cpu_count() or 1
+        elif workers is None or isinstance(workers, numbers.Integral):
+            executor, count = None, workers or 1
+        else:
+            executor, count = workers
+        if count < 2 or len(strings) < 2 * count:
+            func = intdigest and self.intdigest_of or self.digest_of
+            return [func(string) for string in strings]
+
+        # A few chunks per worker, so that one slow chunk holds none up long.
+        size = -(-len(strings) // (4 * count))
+        large = sum(map(len, strings)) >= _GIL_RELEASE_SIZE * len(strings)
+        if not large:
+            # Memoryviews and such cannot be pickled for another process.
+            strings = [bytes(string) for string in strings]
+        chunks = [strings[idx:idx+size] for idx in range(0, len(strings), size)]
+        args = ([self] * len(chunks), chunks, [intdigest] * len(chunks))
+        if executor is not None:
+            results = executor.map(_digest_chunk, *args)
+        else:
+            executor_class = large and ThreadPoolExecutor or ProcessPoolExecutor
+            with executor_class(count) as executor:
+                results = list(executor.map(_digest_chunk, *args))
+        return [digest for chunk in results for digest in chunk]
+
     @property
     def digest_size(self):
         "Returns the size (in bytes) of the resulting digest."
-        return self.new().digest_size
+        # Cached, as serialize() and deserialize() need it for every hash and
+        # it can otherwise only be determined by instantiating the algorithm.
+        size = getattr(self, '_digest_size', None)
+        if size is None:
+            size = self._digest_size = self.new().digest_size
+        return size
 
     @property
     def block_size(self):
@@ -178,13 +241,66 @@ class _HashAlgorithmInterface(tuple):
     def deserialize(self, file_):
         return LittleInteger.deserialize(file_, self.digest_size)
 
+# hashlib's named constructors, or failing that hashlib.new(), looked up once
+# per algorithm rather than on every use.
+_constructors = {}
+
+def _constructor(name):
+    func = _constructors.get(name)
+    if func is None:
+        func = getattr(hashlib, name, None)
+        if func is None:
+            func = lambda string=b'', name=name: hashlib.new(name, string)
+        _constructors[name] = func
+    return func
+
+_sha256 = hashlib.sha256
+_ripemd160 = _constructor('ripemd160')
+
+# The hottest paths--transaction ids, merkle and authtree nodes, and base58
+# checksums--call these directly, rather than going through
+# `_ChainedHashAlgorithm`.
+
+def hash160_bytes(string):
+    "Returns `hash160(string).digest()`."
+    return _ripemd160(_sha256(string).digest()).digest()
+
+def hash256_bytes(string):
+    "Returns `hash256(string).digest()`."
+    return _sha256(_sha256(string).digest()).digest()
+
+def hash256_int(string):
+    "Returns `hash256(string).intdigest()`."
+    return int.from_bytes(_sha256(_sha256(string).digest()).digest(), 'little')
+
+# hashlib releases the GIL while hashing strings of at least this many bytes.
+_GIL_RELEASE_SIZE = 2048
+
+def _digest_chunk(algorithm, strings, intdigest):
+    "Hashes a chunk of strings for `_HashAlgorithmInterface.many()`."
+    func = intdigest and algorithm.intdigest_of or algorithm.digest_of
+    return [func(string) for string in strings]
+
+class _Hash160Interface(_HashAlgorithmInterface):
+    "`_HashAlgorithmInterface` of (sha256 . ripemd160), with a fast path."
+    def digest_of(self, string):
+        return hash160_bytes(string)
+
+class _Hash256Interface(_HashAlgorithmInterface):
+    "`_HashAlgorithmInterface` of (sha256 . sha256), with fast paths."
+    def digest_of(self, string):
+        return hash256_bytes(string)
+
+    def intdigest_of(self, string):
+        return hash256_int(string)
+
 # (sha256 . ripemd160) is used for Bitcoin addresses, as the 20-byte ripemd160
 # hash can save significant space.
-hash160 = _HashAlgorithmInterface(('sha256', 'ripemd160'))
+hash160 = _Hash160Interface(('sha256', 'ripemd160'))
 
 # (sha256 . sha256), “double-SHA256” is used as the proof-of-work function,
 # the Merkle-tree compressor, and to generate transaction hash values for
 # identification.
-hash256 = _HashAlgorithmInterface(('sha256', 'sha256'))
+hash256 = _Hash256Interface(('sha256', 'sha256'))
 
 # End of File
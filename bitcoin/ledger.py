@@ -13,7 +13,7 @@ from .authtree import MemoryPatriciaAuthTree
 from .core import Output
 from .hash import hash256
 from .mixins import SerializableMixin
-from .serialize import BigCompactSize, LittleInteger, VarInt
+from .serialize import BigCompactSize, LittleInteger, VarInt, as_reader
 from .tools import compress_amount, decompress_amount
 
 __all__ = (
@@ -183,6 +183,7 @@ z      - outputs[4]: 86ef97d5790061b01caab50f1b8e9c50a5057eb43c2d9563a4ee
     def deserialize(cls, file_):
         output_class = getattr(cls, 'get_output_class', lambda:
                        getattr(cls, 'output_class', Output))()
+        file_ = as_reader(file_)
         kwargs = {}
         kwargs['version'] = VarInt.deserialize(file_)
 
@@ -238,6 +239,7 @@ def _serialize_outpoint(self):
     return b''.join(parts)
 OutPoint.serialize = _serialize_outpoint
 def _deserialize_outpoint(cls, file_):
+    file_ = as_reader(file_)
     kwargs = dict()
     kwargs['hash'] = hash256.deserialize(file_)
     kwargs['index'] = BigCompactSize.deserialize(file_)
@@ -262,6 +264,7 @@ def _serialize_coin(self):
     return b''.join(parts)
 Coin.serialize = _serialize_coin
 def _deserialize_coin(cls, file_):
+    file_ = as_reader(file_)
     kwargs = dict()
     kwargs['version'] = VarInt.deserialize(file_)
     kwargs['amount'] = decompress_amount(VarInt.deserialize(file_))
@@ -299,6 +302,7 @@ def _serialize_contract_outpoint(self):
                      BigCompactSize(self.index).serialize()])
 ContractOutPoint.serialize = _serialize_contract_outpoint
 def _deserialize_contract_outpoint(cls, file_):
+    file_ = as_reader(file_)
     kwargs = dict()
     kwargs['contract'] = cls._pickler.load(file_)
     kwargs['hash'] = hash256.deserialize(file_)
@@ -322,6 +326,7 @@ def _serialize_contract_coin(self):
     return b''.join(parts)
 ContractCoin.serialize = _serialize_contract_coin
 def _deserialize_contract_coin(cls, file_):
+    file_ = as_reader(file_)
     kwargs = dict()
     kwargs['version'] = VarInt.deserialize(file_)
     kwargs['height'] = VarInt.deserialize(file_)
@@ -3,14 +3,26 @@
 # Distributed under the MIT/X11 software license, see the accompanying
 # file LICENSE or http://www.opensource.org/licenses/mit-license.php.
 
+import hashlib
 import numbers
+from concurrent.futures import ProcessPoolExecutor
 
-from .hash import hash256
+from .hash import hash256, hash256_int
 
 # ===----------------------------------------------------------------------===
 
 from .tools import list
 
+def _to_hash(h):
+    """Extracts and returns the hash value of a parameter. Note that if the
+    parameter is itself a Merkle tree or iterable, this results in a
+    recursive call to merkle()."""
+    if isinstance(h, numbers.Integral):
+        return h
+    if hasattr(h, 'hash'):
+        return h.hash
+    return merkle(h)
+
 def _merkle_hash256(*args):
     """The default transform provided to merkle(), which calculates the hash
     of its parameters, serializes and joins them together, then performs a
@@ -21,29 +33,22 @@ def _merkle_hash256(*args):
     # Merkle tree is defined to be zero).
     if not args:
         return 0
-    # This helper function extracts and returns the hash value of a parameter.
-    # Note that if the parameter is itself a Merkle tree or iterable, this
-    # results in a recursive call to merkle().
-    def _to_hash(h):
-        if isinstance(h, numbers.Integral):
-            return h
-        if hasattr(h, 'hash'):
-            return h.hash
-        return merkle(h)
     # As a special case, a tree of length 1 is simply ungrouped - that single
     # hash value is returned to the user as-is.
     if len(args) == 1:
         return _to_hash(args[0])
     # Otherwise we are given two parameters, the hash values of which we
     # serialize, concatenate, and return the hash of.
-    return hash256(b''.join(map(lambda h:hash256.serialize(h),
-                                map(_to_hash, args)))).intdigest()
+    return hash256_int(b''.join([_to_hash(h).to_bytes(32, 'little')
+                                 for h in args]))
 
-def merkle(hashes, func=_merkle_hash256):
+def merkle(hashes, func=_merkle_hash256, workers=None):
     """Convert an iterable of hashes or hashable objects into a binary tree,
     construct the interior values using a passed-in constructor or compression
     function, and return the root value of the tree. The default compressor is
-    the hash256 function, resulting in root-hash for the entire tree."""
+    the hash256 function, resulting in root-hash for the entire tree. With the
+    default compressor, workers is passed on to `hash256.many()` to hash each
+    level of the tree concurrently."""
     # We use append to duplicate the final item in the iterable of hashes, so
     # we need hashes to be a list-like object, regardless of what we were
     # passed.
@@ -56,6 +61,10 @@ def merkle(hashes, func=_merkle_hash256):
     # a single item as well, in which case the loop below is not entered.
     if len(hashes) == 1:
         return func(*hashes)
+    if func is _merkle_hash256:
+        if workers is not None:
+            return _merkle_many(list(map(_to_hash, hashes)), workers)
+        return merkle_root(hashes)
     # Build up successive layers of the binary hash tree, starting from the
     # bottom. We've reached the root node when the list has been reduced to
     # one element.
@@ -75,6 +84,255 @@ def merkle(hashes, func=_merkle_hash256):
     # Return the root node of the Merkle tree to the caller.
     return hashes[0]
 
+# The interior nodes of a Merkle tree are always the double-SHA256 of exactly
+# 64 bytes, so each level can be computed from the one below by a single call
+# to one of these backends, which hash each consecutive 64 bytes of a buffer.
+
+def _hash256_64_hashlib(buffer):
+    sha256 = hashlib.sha256
+    return b''.join([sha256(sha256(buffer[pos:pos+64]).digest()).digest()
+                     for pos in range(0, len(buffer), 64)])
+
+try:
+    from .sha256 import hash256_64 as _hash256_64_numpy
+except ImportError:
+    _hash256_64_numpy = None
+
+# The multi-lane NumPy kernel has not been measured to beat hashlib (see
+# bench/merkle.py), so it is used only if asked for by name.
+_BACKENDS = {
+    None:      _hash256_64_hashlib,
+    'hashlib': _hash256_64_hashlib,
+    'numpy':   _hash256_64_numpy,
+}
+
+def _backend(name):
+    func = _BACKENDS.get(name)
+    if func is None:
+        raise ValueError(u"unknown or unavailable backend %r" % (name,))
+    return func
+
+def _as_digests(digests):
+    count, remainder = divmod(len(digests), 32)
+    if remainder:
+        raise ValueError(u"buffer is not a whole number of 32-byte digests")
+    return bytes(digests), count
+
+def merkle_digest(digests, backend=None):
+    """Returns the root digest of the Merkle tree whose leaves are the
+    concatenated 32-byte digests (serialized hashes) in the buffer digests,
+    as merkle() would return it serialized. Each level of the tree is held
+    as one contiguous string of digests, the next level being formed by
+    hashing 64-byte slices of the last, so there are no intermediate
+    objects but the digests themselves, and no conversion to integers.
+    backend is 'hashlib' (the default) or 'numpy'."""
+    level, count = _as_digests(digests)
+    if not count:
+        return b'\x00' * 32
+    hash256_64 = _backend(backend)
+    while count > 1:
+        if count & 1:
+            level += level[-32:]
+        level = hash256_64(level)
+        count = len(level) // 32
+    return level
+
+def merkle_levels(digests, backend=None):
+    """Returns every level of the Merkle tree whose leaves are the 32-byte
+    digests in the buffer digests, from the leaves up to the root, each as
+    a string of concatenated digests (without the duplicate of the last
+    digest of an odd level). See merkle_digest() for backend."""
+    level, count = _as_digests(digests)
+    if not count:
+        return [b'\x00' * 32]
+    hash256_64, levels = _backend(backend), [level]
+    while count > 1:
+        if count & 1:
+            level += level[-32:]
+        level = hash256_64(level)
+        levels.append(level)
+        count = len(level) // 32
+    return levels
+
+def merkle_branch(levels, index):
+    """Returns the Merkle branch of the leaf at index of a tree computed by
+    merkle_levels(): the hashes of the sibling of the leaf and of each of its
+    ancestors below the root."""
+    if not 0 <= index < len(levels[0]) // 32:
+        raise IndexError(index)
+    branch = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if 32*sibling >= len(level):
+            sibling = index
+        branch.append(int.from_bytes(level[32*sibling:32*sibling+32], 'little'))
+        index >>= 1
+    return branch
+
+def merkle_branch_roots(hashes, indices, branches, backend=None):
+    """Returns the root implied by each leaf of hashes, at the corresponding
+    position of indices, and its Merkle branch of branches, as for checking
+    many inclusion proofs against one block at once. The branches must all
+    be of the same length. Each level is computed for every branch with one
+    call to the backend (see merkle_digest())."""
+    hash256_64 = _backend(backend)
+    hashes, indices = list(hashes), list(indices)
+    branches = list(branches)
+    if not len(hashes) == len(indices) == len(branches):
+        raise ValueError(u"hashes, indices and branches differ in number")
+    if not hashes:
+        return []
+    depth = len(branches[0])
+    if any(len(branch) != depth for branch in branches):
+        raise ValueError(u"branches are not all of the same length")
+    digests = [h.to_bytes(32, 'little') for h in hashes]
+    for level in range(depth):
+        pairs = []
+        for digest, index, branch in zip(digests, indices, branches):
+            sibling = branch[level].to_bytes(32, 'little')
+            if (index >> level) & 1:
+                pairs.append(sibling + digest)
+            else:
+                pairs.append(digest + sibling)
+        joined = hash256_64(b''.join(pairs))
+        digests = [joined[pos:pos+32] for pos in range(0, len(joined), 32)]
+    return [int.from_bytes(digest, 'little') for digest in digests]
+
+def merkle_root(hashes):
+    """Returns the root hash of the Merkle tree of hashes (or hashable
+    objects), as merkle() with the default compressor, computed with
+    merkle_digest()."""
+    hashes = list(hashes)
+    try:
+        # Plain integers, by far the common case, convert directly.
+        digests = b''.join([h.to_bytes(32, 'little') for h in hashes])
+    except AttributeError:
+        digests = b''.join([_to_hash(h).to_bytes(32, 'little') for h in hashes])
+    return int.from_bytes(merkle_digest(digests), 'little')
+
+def _merkle_many(hashes, workers):
+    """merkle() with the default compressor, one `hash256.many()` per level,
+    every level sharing the one executor."""
+    if isinstance(workers, numbers.Integral) and workers > 1:
+        # The 64-byte pairs are too small for hashlib to release the GIL, so
+        # are hashed in other processes, as `hash256.many()` would, but by a
+        # pool started once rather than for every level.
+        with ProcessPoolExecutor(workers) as executor:
+            return _merkle_many(hashes, (executor, workers))
+    while len(hashes) > 1:
+        hashes.append(hashes[-1])
+        pairs = [l.to_bytes(32, 'little') + r.to_bytes(32, 'little')
+                 for l,r in zip(*(iter(hashes),)*2)]
+        hashes = hash256.many(pairs, workers, intdigest=True)
+    return hashes[0]
+
+# ===----------------------------------------------------------------------===
+
+class MerkleAccumulator(object):
+    """Computes the Merkle root of a list of hashes which is appended to one
+    hash at a time, as when building a block template, without rebuilding
+    the tree on each addition. Only the frontier is kept: the root of each
+    complete subtree along the right edge of the tree, at most one for each
+    level, so that append() and root() are O(log n) in time and memory.
+
+    If cache is set, every complete subtree is kept instead (about 64 bytes
+    per hash), so that update() can replace any hash and rehash just the
+    path above it."""
+
+    def __init__(self, hashes=(), cache=False):
+        self._count = 0
+        self._frontier = []
+        self._levels = cache and [[]] or None
+        self.extend(hashes)
+
+    def __len__(self):
+        "x.__len__() <==> len(x)"
+        return self._count
+
+    @staticmethod
+    def _digest(hash_):
+        return _to_hash(hash_).to_bytes(32, 'little')
+
+    def append(self, hash_):
+        "Adds hash_ (or the hash of an object with a hash attribute) to the end."
+        digest, count, sha256 = self._digest(hash_), self._count, hashlib.sha256
+        frontier, levels = self._frontier, self._levels
+        if levels is not None:
+            levels[0].append(digest)
+        # Adding a leaf is incrementing a binary counter: each complete
+        # subtree of the frontier which the new one pairs with is carried
+        # into the next level up.
+        height = 0
+        while count & 1:
+            digest = sha256(sha256(frontier[height] + digest).digest()).digest()
+            frontier[height] = None
+            height += 1
+            count >>= 1
+            if levels is not None:
+                if len(levels) == height:
+                    levels.append([])
+                levels[height].append(digest)
+        if height == len(frontier):
+            frontier.append(digest)
+        else:
+            frontier[height] = digest
+        self._count += 1
+
+    def extend(self, hashes):
+        "Adds each of hashes to the end, in order."
+        for hash_ in hashes:
+            self.append(hash_)
+
+    def update(self, index, hash_):
+        """Replaces the hash at index, rehashing the complete subtrees above
+        it. Requires the tree to have been cached."""
+        levels = self._levels
+        if levels is None:
+            raise ValueError(u"update() requires a cached tree")
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        digest, sha256 = self._digest(hash_), hashlib.sha256
+        for height, level in enumerate(levels):
+            level[index] = digest
+            if index == len(level) - 1 and len(level) & 1:
+                self._frontier[height] = digest
+            # Stop once the parent is not a complete subtree, in which case it
+            # is computed by root() from the frontier.
+            if (index ^ 1) >= len(level):
+                break
+            digest = sha256(sha256(
+                level[index & ~1] + level[index | 1]).digest()).digest()
+            index >>= 1
+
+    def digest(self):
+        "Returns the Merkle root as merkle_digest() would, serialized."
+        sha256, root = hashlib.sha256, None
+        for height, digest in enumerate(self._frontier):
+            if digest is None:
+                continue
+            if root is None:
+                root, root_height = digest, height
+                continue
+            # The partial subtree to the right is completed up to the height
+            # of its left sibling by Bitcoin's rule of duplicating the last
+            # hash of an odd level.
+            while root_height < height:
+                root = sha256(sha256(root + root).digest()).digest()
+                root_height += 1
+            root = sha256(sha256(digest + root).digest()).digest()
+            root_height += 1
+        return root is None and b'\x00' * 32 or root
+
+    def root(self):
+        "Returns the Merkle root of the hashes so far, as merkle() would."
+        return int.from_bytes(self.digest(), 'little')
+
+    @property
+    def hash(self):
+        return self.root()
+
 # ===----------------------------------------------------------------------===
 
 from .mixins import HashableMixin, SerializableMixin
@@ -209,8 +467,8 @@ class MerkleNode(HashableMixin):
             return 0
         if right is None:
             return left
-        return hash256(b''.join([hash256.serialize(left),
-                                 hash256.serialize(right)])).intdigest()
+        return hash256_int(left.to_bytes(32, 'little') +
+                           right.to_bytes(32, 'little'))
 
     def __hash__(self):
         "x.__hash__() <==> hash(x)"
@@ -443,10 +701,318 @@ class MerkleList(SerializableMixin):
     def hash(self):
         return self._root.hash
 
-    def serialize(self):
-        raise NotImplementedError()
+    def __len__(self):
+        "x.__len__() <==> len(x)"
+        return len(self._root)
+
+    def __iter__(self):
+        "x.__iter__() <==> iter(x)"
+        return iter(self._root)
+
+    def proof(self, indices):
+        """Returns a MerkleProof of the inclusion of the hashes at each of
+        indices."""
+        return MerkleProof.from_hashes(list(self), indices)
+
+    # A MerkleList is serialized as the list of its hashes, as the hashes
+    # of the transactions of a block would be.
+    def serialize_into(self, buf):
+        buf = as_writer(buf)
+        buf.write_compact_size(len(self))
+        for hash_ in self:
+            buf.write(hash_.to_bytes(32, 'little'))
+    def serialized_size(self):
+        return _compact_size_length(len(self)) + 32*len(self)
+    @classmethod
+    def deserialize(cls, file_):
+        file_ = as_reader(file_)
+        return cls(hash256.deserialize(file_)
+                   for _ in range(file_.read_compact_size()))
+
+class FlatMerkleList(MerkleList):
+    """A MerkleList which stores its tree as one flat buffer of 32-byte
+    digests per level, as computed by merkle_levels(), rather than as a
+    graph of MerkleNode objects. The node at (level, index) is found by
+    arithmetic, and the whole tree takes about 64 bytes per hash.
+
+    Hashes may be pruned, which forgets that they are in the list (they are
+    no longer indexed, iterated or counted by len(), nor returned by node()),
+    while the tree itself, and so the root and the proofs of the other
+    hashes, is unchanged. The digests of pruned hashes are kept, being the
+    siblings in the proofs of their neighbours. Which hashes are pruned is
+    kept in a bitmap."""
+
+    def __init__(self, *args, **kwargs):
+        hashes = list(*args, **kwargs)
+        # MerkleList.__init__() would build the MerkleNode graph which this
+        # class replaces, and sets up no other state, so is not called.
+        SerializableMixin.__init__(self)
+        self._levels = merkle_levels(
+            b''.join(_to_hash(hash_).to_bytes(32, 'little') for hash_ in hashes))
+        self.size = len(hashes)
+        self._pruned = bytearray((self.size + 7) // 8)
+        self._length = self.size
+
+    @property
+    def hash(self):
+        return self.size and int.from_bytes(self._levels[-1], 'little') or 0
+
+    def node(self, level, index):
+        """Returns the hash of the node at index of level, level 0 being the
+        hashes of the list and the last level its root. Raises IndexError
+        for a pruned hash."""
+        digests = self._levels[level]
+        if not 0 <= 32*index < len(digests) or (
+                not level and self.is_pruned(index)):
+            raise IndexError(index)
+        return int.from_bytes(digests[32*index:32*index+32], 'little')
+
+    def is_pruned(self, index):
+        return bool(self._pruned[index >> 3] & (1 << (index & 7)))
+
+    def prune(self, indices):
+        "Prunes the hash at each of indices."
+        for index in indices:
+            index = self._index(index)
+            if not self.is_pruned(index):
+                self._pruned[index >> 3] |= 1 << (index & 7)
+                self._length -= 1
+
+    def _index(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return index
+
+    def __len__(self):
+        "x.__len__() <==> len(x)"
+        return self._length
+
+    def __getitem__(self, index):
+        "x.__getitem__(y) <==> x[y]"
+        index = self._index(index)
+        if self.is_pruned(index):
+            raise IndexError(index)
+        return self.node(0, index)
+
+    def iteritems(self):
+        "x.iteritems() -> an iterator over the (index, hash) pairs of x in order"
+        digests, pruned = self._levels[0], self._pruned
+        for index in range(self.size):
+            if not pruned[index >> 3] & (1 << (index & 7)):
+                yield (index, int.from_bytes(
+                    digests[32*index:32*index+32], 'little'))
+
+    def __iter__(self):
+        "x.__iter__() <==> iter(x)"
+        for index, hash_ in self.iteritems():
+            yield hash_
+
+    def proof(self, indices):
+        """Returns a MerkleProof of the inclusion of the hashes at each of
+        indices, which must not be pruned."""
+        if not self.size:
+            raise ValueError(u"cannot prove inclusion in an empty tree")
+        indices = [self._index(index) for index in indices]
+        for index in indices:
+            if self.is_pruned(index):
+                raise IndexError(index)
+        return MerkleProof.from_levels(self._levels, indices)
+
+    def serialize_into(self, buf):
+        if self._length != self.size:
+            raise ValueError(u"a pruned list cannot be serialized as a list")
+        super(FlatMerkleList, self).serialize_into(buf)
+
+# ===----------------------------------------------------------------------===
+
+# The partial Merkle tree of BIP 37 (the body of a `merkleblock` message)
+# proves the inclusion of any number of hashes in a tree of a given size. It
+# is the depth-first traversal of the tree from the root, recording a flag bit
+# for each node visited: set if a matched leaf is beneath it, in which case
+# its children are visited in turn, otherwise its hash is recorded instead.
+# The hash of each matched leaf is recorded too, in the same order.
+
+def _partial_width(size, height):
+    "The number of nodes at height of a Merkle tree of size leaves."
+    return (size + (1 << height) - 1) >> height
+
+def _partial_height(size):
+    "The height of the root of a Merkle tree of size leaves."
+    return (size - 1).bit_length()
+
+def _partial_flag_count(size, flags):
+    """The number of flags the depth-first traversal of a partial Merkle tree
+    of size leaves consumes, or len(flags) if they are too few."""
+    if not size:
+        return len(flags)
+    bits = iter(flags)
+    def traverse(height, pos):
+        if not next(bits) or not height:
+            return
+        traverse(height-1, 2*pos)
+        if 2*pos + 1 < _partial_width(size, height-1):
+            traverse(height-1, 2*pos + 1)
+    try:
+        traverse(_partial_height(size), 0)
+    except StopIteration:
+        return len(flags)
+    return len(flags) - sum(1 for _ in bits)
+
+class MerkleProof(SerializableMixin):
+    """A partial Merkle tree: proof of the inclusion of the hashes at some
+    indices of a Merkle tree of size hashes, as sent to SPV clients in the
+    `merkleblock` message. hashes is the list of hashes and flags the list of
+    booleans of its depth-first traversal. The padding bits of the last byte
+    of serialized flags are dropped on deserialization, so that a proof
+    compares equal to its own serialization read back."""
+
+    def __init__(self, size=0, hashes=(), flags=()):
+        super(MerkleProof, self).__init__()
+        self.size, self.hashes, self.flags = size, list(hashes), list(flags)
+
+    @classmethod
+    def from_hashes(cls, hashes, indices):
+        """Returns the proof of the inclusion of the hashes at each of indices
+        of the Merkle tree of hashes, built in a single traversal of the tree
+        so that the path nodes matched leaves have in common are included
+        only once."""
+        hashes = [_to_hash(hash_) for hash_ in hashes]
+        if not hashes:
+            raise ValueError(u"cannot prove inclusion in an empty tree")
+        return cls.from_levels(
+            merkle_levels(b''.join(h.to_bytes(32, 'little') for h in hashes)),
+            indices)
+
+    @classmethod
+    def from_levels(cls, levels, indices):
+        """As from_hashes(), but of the tree whose levels are given as by
+        merkle_levels(), which are not recomputed."""
+        size = len(levels[0]) // 32
+        if not size:
+            raise ValueError(u"cannot prove inclusion in an empty tree")
+        height = _partial_height(size)
+        matched = set()
+        for index in indices:
+            if not 0 <= index < size:
+                raise IndexError(index)
+            matched.add(index)
+        # The positions at each height with a matched leaf beneath them.
+        marked = [matched]
+        for _ in range(height):
+            marked.append(set(pos >> 1 for pos in marked[-1]))
+        proof_hashes, flags = [], []
+        def traverse(height, pos):
+            flag = pos in marked[height]
+            flags.append(flag)
+            if not height or not flag:
+                proof_hashes.append(int.from_bytes(
+                    levels[height][32*pos:32*pos+32], 'little'))
+                return
+            traverse(height-1, 2*pos)
+            if 2*pos + 1 < _partial_width(size, height-1):
+                traverse(height-1, 2*pos + 1)
+        traverse(height, 0)
+        return cls(size, proof_hashes, flags)
+
+    def extract(self):
+        """Returns the 2-tuple (root, matches) of the Merkle root the proof
+        commits to and the list of (index, hash) pairs of the hashes whose
+        inclusion it proves, in order of index. Raises ValueError if the proof
+        is malformed, including the duplicated-subtree ambiguity of
+        CVE-2012-2459."""
+        size, flags = self.size, self.flags
+        digests = [hash_.to_bytes(32, 'little') for hash_ in self.hashes]
+        if not size:
+            raise ValueError(u"partial Merkle tree of zero size")
+        if len(digests) > size:
+            raise ValueError(u"more hashes than leaves in partial Merkle tree")
+        if len(flags) < len(digests):
+            raise ValueError(u"fewer flag bits than hashes in partial Merkle tree")
+        sha256, matches = hashlib.sha256, []
+        bits, used = iter(flags), iter(digests)
+        def traverse(height, pos):
+            flag = next(bits)
+            if not height or not flag:
+                digest = next(used)
+                if flag:
+                    matches.append((pos, int.from_bytes(digest, 'little')))
+                return digest
+            left = traverse(height-1, 2*pos)
+            if 2*pos + 1 < _partial_width(size, height-1):
+                right = traverse(height-1, 2*pos + 1)
+                if right == left:
+                    raise ValueError(u"duplicate subtree in partial Merkle tree")
+            else:
+                right = left
+            return sha256(sha256(left + right).digest()).digest()
+        try:
+            root = traverse(_partial_height(size), 0)
+        except StopIteration:
+            raise ValueError(u"partial Merkle tree is truncated")
+        if next(used, None) is not None:
+            raise ValueError(u"unused hashes in partial Merkle tree")
+        # Only the padding of the last byte may remain of the flags.
+        if (len(flags) - sum(1 for _ in bits) + 7) // 8 != (len(flags) + 7) // 8:
+            raise ValueError(u"unused flag bits in partial Merkle tree")
+        return int.from_bytes(root, 'little'), matches
+
+    def verify(self, root):
+        """Returns the list of (index, hash) pairs of the hashes whose
+        inclusion the proof proves, as extract() does, provided the Merkle
+        root matches root. Raises ValueError otherwise."""
+        computed, matches = self.extract()
+        if computed != getattr(root, 'hash', root):
+            raise ValueError(u"partial Merkle tree does not match root")
+        return matches
+
+    @property
+    def hash(self):
+        return self.extract()[0]
+
+    def serialize_into(self, buf):
+        buf = as_writer(buf)
+        buf.write_u32(self.size)
+        buf.write_compact_size(len(self.hashes))
+        for hash_ in self.hashes:
+            buf.write(hash_.to_bytes(32, 'little'))
+        flags = bytearray((len(self.flags) + 7) // 8)
+        for idx, flag in enumerate(self.flags):
+            if flag:
+                flags[idx >> 3] |= 1 << (idx & 7)
+        buf.write_compact_size(len(flags))
+        buf.write(bytes(flags))
+    def serialized_size(self):
+        len_ = (len(self.flags) + 7) // 8
+        return (4 + _compact_size_length(len(self.hashes)) + 32*len(self.hashes)
+                  + _compact_size_length(len_) + len_)
     @classmethod
     def deserialize(cls, file_):
-        raise NotImplementedError()
+        file_ = as_reader(file_)
+        size = file_.read_u32()
+        hashes = [hash256.deserialize(file_)
+                  for _ in range(file_.read_compact_size())]
+        flags = file_.read_slice(file_.read_compact_size())
+        flags = [bool(flags[idx >> 3] & (1 << (idx & 7)))
+                 for idx in range(8 * len(flags))]
+        # Whole unused bytes are kept for extract() to reject.
+        return cls(size, hashes,
+            flags[:max(_partial_flag_count(size, flags), len(flags) - 7)])
+
+    def __eq__(self, other):
+        return all((self.size   == other.size,
+                    self.hashes == other.hashes,
+                    self.flags  == other.flags))
+
+    def __repr__(self):
+        return '%s(size=%d, hashes=[%s], flags=[%s])' % (
+            self.__class__.__name__, self.size,
+            ', '.join('0x%064x' % hash_ for hash_ in self.hashes),
+            ', '.join(str(flag) for flag in self.flags))
+
+# ===----------------------------------------------------------------------===
+
+from .serialize import _compact_size_length, as_reader, as_writer
 
 # End of File
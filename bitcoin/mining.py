@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+"""Searching for block headers which meet their proof-of-work target, as for
+generating regtest-style chains of blocks.
+
+The first 64 bytes of a serialized header--the version, the parent hash and
+most of the merkle root--fill exactly one SHA-256 block, which is the same
+for every nonce and timestamp tried. Its hash state (the midstate) is
+computed once, and each candidate costs only a `copy()` of it, the hash of
+the 16-byte tail, and the second SHA-256 of the digest."""
+
+__all__ = [
+    'midstate',
+    'grind',
+    'mine',
+]
+
+import hashlib
+from struct import Struct
+
+_u32 = Struct('<I')
+
+# ===----------------------------------------------------------------------===
+
+def _serialize(header):
+    raw = bytes(getattr(header, 'serialize', lambda:header)())
+    if len(raw) != 80:
+        raise ValueError(u"block header must be 80 bytes, not %d" % len(raw))
+    return raw
+
+def midstate(header):
+    """Returns a `hashlib` SHA-256 object which has consumed the first 64 bytes
+    of header, a `Block` or its 80-byte serialization. Copies of it can be
+    finished with any 16-byte tail (the end of the merkle root, time, bits
+    and nonce)."""
+    return hashlib.sha256(_serialize(header)[:64])
+
+def grind(header, target=None, nonces=None):
+    """Searches nonces (by default all 2**32 of them) for one with which the
+    hash of header, a `Block` or its 80-byte serialization, is no greater
+    than target (by default that encoded in its bits). Returns the first
+    such nonce, or None if there is none. The header is not modified."""
+    raw = _serialize(header)
+    if target is None:
+        target = target_from_compact(_u32.unpack_from(raw, 72)[0])
+    if nonces is None:
+        nonces = range(1<<32)
+    copy, tail = midstate(raw).copy, raw[64:76]
+    sha256, pack, from_bytes = hashlib.sha256, _u32.pack, int.from_bytes
+    for nonce in nonces:
+        hobj = copy()
+        hobj.update(tail + pack(nonce))
+        if from_bytes(sha256(hobj.digest()).digest(), 'little') <= target:
+            return nonce
+    return None
+
+def mine(block, transactions=None, target=None, nonces=None):
+    """Finds a proof-of-work for block, modifying it in place, and returns it.
+    Every nonce (of nonces, if given) is tried before the search moves on.
+    If transactions are given, it then increments an extra nonce, kept as 4
+    little-endian bytes appended to the original script of the coinbase (the
+    first transaction), and recomputes the merkle root. Otherwise it
+    increments the time."""
+    if target is None:
+        target = target_from_compact(block.bits)
+    if transactions is not None:
+        coinbase = transactions[0].inputs[0]
+        script, extranonce = coinbase.endorsement, 0
+    while True:
+        nonce = grind(block, target, nonces)
+        if nonce is not None:
+            block.nonce = nonce
+            return block
+        if transactions is not None:
+            extranonce += 1
+            coinbase.endorsement = script + _u32.pack(extranonce)
+            block.merkle_hash = merkle(tx.hash for tx in transactions)
+        else:
+            block.time += 1
+
+# ===----------------------------------------------------------------------===
+
+from .merkle import merkle
+from .tools import target_from_compact
+
+# End of File
@@ -6,27 +6,59 @@
 __all__ = [
     'SerializableMixin',
     'HashableMixin',
+    'TrackedMixin',
+    'TrackedList',
 ]
 
 # ===----------------------------------------------------------------------===
 
-from types import MethodType
+from .serialize import BufferWriter, as_writer
+from .tools import list
 
 class SerializableMixin(object):
+    # The mixins declare empty __slots__ so as not to force a __dict__ upon
+    # subclasses which use __slots__ themselves, which for objects as
+    # numerous as transaction inputs and outputs is a significant saving.
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         super(SerializableMixin, self).__init__()
-        self.deserialize = MethodType(self.deserialize, self)
 
     def __bytes__(self, *args, **kwargs):
         return self.serialize(*args, **kwargs)
 
+    # Subclasses implement either `serialize()`, or the pair of
+    # `serialize_into()` and `serialized_size()`. Each default is written in
+    # terms of the other, so that both interfaces are always available. The
+    # latter pair is preferred for large or nested structures, as a parent
+    # can then be serialized into a single buffer allocated to its exact size
+    # rather than concatenating the serializations of its children.
+
+    def serialize(self):
+        buf = BufferWriter(bytearray(self.serialized_size()))
+        self.serialize_into(buf)
+        return bytes(buf.buffer)
+
+    def serialize_into(self, buf):
+        """Writes the serialized representation to buf, which may be a
+        `BufferWriter`, a bytearray (which is appended to), or a file-like
+        object."""
+        as_writer(buf).write(self.serialize())
+
+    def serialized_size(self):
+        "The length in bytes of the serialized representation."
+        return len(self.serialize())
+
 # ===----------------------------------------------------------------------===
 
 class HashableMixin(object):
     """Provides a single property to the inheriting subclass, `hash`, as well
     as hooks to enable caching of the hash value using the storage backend of
     the object relational mapper. By default, the `_hash` attribute is used to
-    store cached hash values."""
+    store cached hash values, so subclasses which define __slots__ must
+    include `_hash`."""
+    __slots__ = ()
+
     from .hash import hash256 as compressor
 
     def hash__getter(self, *args, **kwargs):
@@ -44,7 +76,7 @@ class HashableMixin(object):
         # Hash doesn't exist or has been set to `None` (indicating a need to
         # recompute). So calculate the new hash value, and cache it for future
         # access:
-        value = compressor.new(self.__bytes__(*args, **kwargs)).intdigest()
+        value = compressor.intdigest_of(self.__bytes__(*args, **kwargs))
         self.hash__setter(value)
         # Return the newly computed hash to the caller.
         return value
@@ -68,4 +100,132 @@ class HashableMixin(object):
     def hash(self):
         self.hash__deleter()
 
+# ===----------------------------------------------------------------------===
+
+_setattr = object.__setattr__
+
+class TrackedMixin(object):
+    """Discards cached values derived from an object whenever one of its
+    `tracked_attributes` is assigned, so that repeated calls to `hash` and
+    `serialize()` on an unchanged object cost nothing, and a changed object
+    never reports a stale hash or serialization.
+
+    Objects which form part of a larger structure, such as the inputs and
+    outputs of a transaction, have their `_owner` set by the containing
+    `TrackedList`, and pass invalidation on to it. The cached hash is kept in
+    `_hash` (see `HashableMixin`) and the cached serialization in
+    `_serialized`. Subclasses which define __slots__ include whichever of
+    these and `_owner` they use, and list them in `cache_slots` so that they
+    are initialized on construction."""
+    __slots__ = ()
+
+    tracked_attributes = frozenset()
+    cache_slots = ()
+
+    # Defaults for subclasses without the corresponding slot.
+    _hash = _serialized = _owner = None
+
+    def __init__(self, *args, **kwargs):
+        super(TrackedMixin, self).__init__(*args, **kwargs)
+        # Probing an unset slot raises AttributeError internally, which would
+        # make invalidate() several times more expensive.
+        for attr in self.cache_slots:
+            _setattr(self, attr, None)
+
+    def __setattr__(self, name, value):
+        _setattr(self, name, value)
+        if name in self.tracked_attributes:
+            self.invalidate()
+
+    def invalidate(self):
+        """Clears the cached hash and serialization of this object and of
+        its owner, if it has one."""
+        if self._hash is not None:
+            _setattr(self, '_hash', None)
+        if self._serialized is not None:
+            _setattr(self, '_serialized', None)
+        owner = self._owner
+        if owner is not None:
+            owner.invalidate()
+
+    def serialize(self):
+        result = self._serialized
+        if result is None:
+            result = super(TrackedMixin, self).serialize()
+            _setattr(self, '_serialized', result)
+        return result
+
+class TrackedList(list):
+    """A list which makes its owner the `_owner` of every `TrackedMixin`
+    element added to it, and invalidates the owner whenever its contents
+    change. An element should belong to only one owner at a time."""
+    __slots__ = ('owner',)
+
+    def __init__(self, owner, iterable=()):
+        super(TrackedList, self).__init__(iterable)
+        self.owner = owner
+        for item in self:
+            self._attach(item)
+
+    def _attach(self, item):
+        if isinstance(item, TrackedMixin):
+            item._owner = self.owner
+        return item
+
+    def _changed(self):
+        self.owner.invalidate()
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = [self._attach(item) for item in value]
+        else:
+            self._attach(value)
+        super(TrackedList, self).__setitem__(index, value)
+        self._changed()
+
+    def __delitem__(self, index):
+        super(TrackedList, self).__delitem__(index)
+        self._changed()
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __imul__(self, n):
+        super(TrackedList, self).__imul__(n)
+        self._changed()
+        return self
+
+    def append(self, item):
+        super(TrackedList, self).append(self._attach(item))
+        self._changed()
+
+    def extend(self, iterable):
+        super(TrackedList, self).extend([self._attach(item) for item in iterable])
+        self._changed()
+
+    def insert(self, index, item):
+        super(TrackedList, self).insert(index, self._attach(item))
+        self._changed()
+
+    def pop(self, *args):
+        result = super(TrackedList, self).pop(*args)
+        self._changed()
+        return result
+
+    def remove(self, item):
+        super(TrackedList, self).remove(item)
+        self._changed()
+
+    def clear(self):
+        del self[:]
+
+    def reverse(self):
+        super(TrackedList, self).reverse()
+        self._changed()
+
+    def sort(self, *args, **kwargs):
+        super(TrackedList, self).sort(*args, **kwargs)
+        self._changed()
+
 # End of File
@@ -8,7 +8,7 @@ import six
 from struct import pack, unpack
 
 from .mixins import SerializableMixin
-from .serialize import LittleCompactSize, FlatData
+from .serialize import BufferReader, LittleCompactSize, FlatData, as_reader, as_writer
 from .tools import BytesIO
 
 # ===----------------------------------------------------------------------===
@@ -424,6 +424,8 @@ class MissingPushDataError(BaseScriptDecodeError):
     "End-of-script encountered while parsing multi-byte push code"
 
 class ScriptOp(SerializableMixin, six.binary_type):
+    __slots__ = ()
+
     def __new__(cls, opcode=None, data=None, *args, **kwargs):
         # If just data is specified, then we automatically fill-in the opcode
         # as required to push the data on the stack.
@@ -478,22 +480,30 @@ class ScriptOp(SerializableMixin, six.binary_type):
 
     def serialize(self):
         return b''.join((self,))
+    def serialize_into(self, buf):
+        as_writer(buf).write(self)
+    def serialized_size(self):
+        return len(self)
     @classmethod
     def deserialize(cls, file_):
+        file_ = as_reader(file_)
         opcode = file_.read(1)
         if not len(opcode):
             raise EmptyScriptError
         opcode = unpack('<B', opcode)[0]
 
-        datalen = 0
-        if opcode < OP_PUSHDATA1:
-            datalen = opcode
-        elif opcode == OP_PUSHDATA1:
-            datalen = unpack('<B', file_.read(1))[0]
-        elif opcode == OP_PUSHDATA2:
-            datalen = unpack('<H', file_.read(2))[0]
-        elif opcode == OP_PUSHDATA4:
-            datalen = unpack('<I', file_.read(4))[0]
+        try:
+            datalen = 0
+            if opcode < OP_PUSHDATA1:
+                datalen = opcode
+            elif opcode == OP_PUSHDATA1:
+                datalen = file_.read_u8()
+            elif opcode == OP_PUSHDATA2:
+                datalen = file_.read_u16()
+            elif opcode == OP_PUSHDATA4:
+                datalen = file_.read_u32()
+        except EOFError:
+            raise MissingPushDataError
         if datalen:
             data = file_.read(datalen)
         else:
@@ -585,15 +595,21 @@ class ScriptOp(SerializableMixin, six.binary_type):
 # ===----------------------------------------------------------------------===
 
 class Script(SerializableMixin, six.binary_type):
+    __slots__ = ()
+
     def __iter__(self):
         script_op_class = getattr(self, 'get_script_op_class', lambda:
                           getattr(self, 'script_op_class', ScriptOp))()
-        file_ = BytesIO(self)
-        while True:
+        file_ = BufferReader(self)
+        while file_.remaining:
             yield script_op_class.deserialize(file_)
 
     def serialize(self):
         return b''.join((self,))
+    def serialize_into(self, buf):
+        as_writer(buf).write(self)
+    def serialized_size(self):
+        return len(self)
     @classmethod
     def deserialize(cls, file_, len_):
         return cls(FlatData.deserialize(file_, len_))
@@ -671,9 +687,10 @@ class ScriptPickler(object):
 
     @staticmethod
     def _load(file_, protocol, version):
-        size = unpack("<B", file_.read(1))[0]
+        file_ = as_reader(file_)
+        size = file_.read_u8()
         if size == 0:
-            hash_ = file_.read(20)
+            hash_ = file_.read_slice(20)
             return b''.join([
                 six.int2byte(OP_DUP),
                 six.int2byte(OP_HASH160),
@@ -682,14 +699,14 @@ class ScriptPickler(object):
                 six.int2byte(OP_CHECKSIG),
             ])
         elif size == 1:
-            hash_ = file_.read(20)
+            hash_ = file_.read_slice(20)
             return b''.join([
                 six.int2byte(OP_HASH160),
                 six.int2byte(20), hash_,
                 six.int2byte(OP_EQUAL),
             ])
         elif size in (2, 3):
-            compressed_key = file_.read(32)
+            compressed_key = file_.read_slice(32)
             return b''.join([
                 six.int2byte(33),
                 six.int2byte(size),
@@ -706,11 +723,11 @@ class ScriptPickler(object):
                 six.int2byte(OP_CHECKSIG),
             ])
         elif size == 0xfd:
-            size = unpack("<H", file_.read(2))[0]
+            size = file_.read_u16()
         elif size == 0xfe:
-            size = unpack("<I", file_.read(4))[0]
+            size = file_.read_u32()
         elif size == 0xff:
-            size = unpack("<Q", file_.read(8))[0]
+            size = file_.read_u64()
         size = size - 6
         return FlatData.deserialize(file_, size)
 
@@ -6,7 +6,13 @@
 "Utility functions used in implementing the block chain serialization format."
 
 import six
-from struct import pack, unpack
+from array import array
+from struct import Struct, pack, unpack
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 __all__ = [
     'SER_NETWORK',
@@ -19,20 +25,422 @@ __all__ = [
     'BigNum',
     'VarInt',
     'FlatData',
+    'BufferReader',
+    'FileReader',
+    'as_reader',
+    'BufferWriter',
+    'FileWriter',
+    'as_writer',
     'serialize_iterator',
     'deserialize_iterator',
+    'deserialize_varints',
+    'deserialize_compact_sizes',
 ]
 
 SER_NETWORK = 1 << 0
 SER_DISK    = 1 << 1
 SER_HASH    = 1 << 2
 
+# Precompiled codecs for the fixed-width fields which make up most of the
+# serialization format. Struct instances skip the format-string parsing and
+# cache lookup that the module-level pack/unpack functions perform on every
+# call.
+_U8  = Struct('<B')
+_U16 = Struct('<H')
+_U32 = Struct('<I')
+_U64 = Struct('<Q')
+
+_LITTLE_CODECS = {1: _U8, 2: _U16, 4: _U32, 8: _U64}
+_BIG_CODECS = {1: Struct('>B'), 2: Struct('>H'), 4: Struct('>I'), 8: Struct('>Q')}
+
 def _force_read(file_, len_):
     data = file_.read(len_)
     if len(data) != len_:
         raise EOFError(u"unexpected end-of-file")
     return data
 
+# ===----------------------------------------------------------------------===
+
+class BufferReader(object):
+    """A cursor over a contiguous in-memory buffer: a bytes or bytearray
+    object, an mmap, or anything else exporting the buffer protocol.
+
+    Fixed-width fields are decoded in place with `Struct.unpack_from()`, and
+    `read_slice()` returns a `memoryview` into the underlying buffer rather
+    than a copy, so a single pass over a block (or an entire block file)
+    does not allocate a new bytes object for every 1-, 4- or 8-byte field.
+    Enough of the file API (`read`, `tell`, `seek`) is provided that a
+    BufferReader can be passed to any `deserialize()` method in place of a
+    file object."""
+    __slots__ = ('_view', '_pos', '_end')
+
+    def __init__(self, buffer, offset=0, end=None):
+        view = memoryview(buffer)
+        if view.ndim != 1 or view.itemsize != 1:
+            view = view.cast('B')
+        if end is None:
+            end = len(view)
+        if not (0 <= offset <= end <= len(view)):
+            raise ValueError(u"offset/end outside of buffer bounds")
+        self._view, self._pos, self._end = view, offset, end
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def release(self):
+        """Release the underlying buffer. An mmap can only be closed once the
+        reader and any slices returned by `read_slice()` have been
+        released."""
+        self._view.release()
+
+    @property
+    def buffer(self):
+        "The `memoryview` of the underlying buffer."
+        return self._view
+
+    @property
+    def remaining(self):
+        "The number of bytes between the cursor and the end of the buffer."
+        return self._end - self._pos
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self._end
+        if not (0 <= offset <= self._end):
+            raise ValueError(u"seek outside of buffer bounds")
+        self._pos = offset
+        return offset
+
+    def skip(self, len_):
+        "Advance the cursor by len_ bytes without reading them."
+        pos = self._pos + len_
+        if pos > self._end:
+            raise EOFError(u"unexpected end-of-file")
+        self._pos = pos
+
+    def read(self, len_=-1):
+        """Returns up to len_ bytes (or everything remaining if len_ is
+        negative) as a new bytes object, with the short-read semantics of a
+        file object."""
+        pos = self._pos
+        if len_ is None or len_ < 0:
+            end = self._end
+        else:
+            end = min(pos + len_, self._end)
+        self._pos = end
+        return self._view[pos:end].tobytes()
+
+    def read_slice(self, len_):
+        """Returns the next len_ bytes as a zero-copy `memoryview`, raising
+        EOFError if fewer than len_ bytes remain."""
+        pos = self._pos
+        end = pos + len_
+        if end > self._end:
+            raise EOFError(u"unexpected end-of-file")
+        self._pos = end
+        return self._view[pos:end]
+
+    def unpack(self, struct_):
+        "Decodes the next `struct_.size` bytes with a `struct.Struct`."
+        pos = self._pos
+        end = pos + struct_.size
+        if end > self._end:
+            raise EOFError(u"unexpected end-of-file")
+        self._pos = end
+        return struct_.unpack_from(self._view, pos)
+
+    def _unpack(self, struct_):
+        pos = self._pos
+        end = pos + struct_.size
+        if end > self._end:
+            raise EOFError(u"unexpected end-of-file")
+        self._pos = end
+        return struct_.unpack_from(self._view, pos)[0]
+
+    def read_u8(self):
+        return self._unpack(_U8)
+    def read_u16(self):
+        return self._unpack(_U16)
+    def read_u32(self):
+        return self._unpack(_U32)
+    def read_u64(self):
+        return self._unpack(_U64)
+
+    def read_compact_size(self):
+        "Decodes a little-endian CompactSize (see `LittleCompactSize`)."
+        result = self._unpack(_U8)
+        if result < 253:
+            return result
+        elif result == 253:
+            return self._unpack(_U16)
+        elif result == 254:
+            return self._unpack(_U32)
+        return self._unpack(_U64)
+
+    def read_varint(self):
+        "Decodes a base-128 `VarInt`."
+        view, pos, end = self._view, self._pos, self._end
+        result = 0
+        while True:
+            if pos >= end:
+                raise EOFError(u"unexpected end-of-file")
+            limb = view[pos]
+            pos += 1
+            result = (result << 7) | (limb & 0x7f)
+            if limb & 0x80:
+                result += 1
+            else:
+                break
+        self._pos = pos
+        return result
+
+    def read_varints(self, count=None):
+        """Decodes count consecutive VarInts (or all that remain, if count is
+        None) in a single batch. See `deserialize_varints()`."""
+        values, self._pos = _deserialize_varints(
+            self._view, self._pos, self._end, count)
+        return values
+
+    def read_compact_sizes(self, count=None):
+        """Decodes count consecutive CompactSizes (or all that remain, if
+        count is None) in a single batch. See `deserialize_compact_sizes()`."""
+        values, self._pos = _deserialize_compact_sizes(
+            self._view, self._pos, self._end, count)
+        return values
+
+class FileReader(object):
+    """Adapts a file-like object to the `BufferReader` interface, so that
+    `deserialize()` methods can be written once against the reader API and
+    still accept plain file objects. `read_slice()` necessarily returns a
+    copy, as a file has no underlying buffer to slice."""
+    __slots__ = ('_file',)
+
+    def __init__(self, file_):
+        self._file = file_
+
+    def tell(self):
+        return self._file.tell()
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def skip(self, len_):
+        _force_read(self._file, len_)
+
+    def read(self, len_=-1):
+        return self._file.read(len_)
+
+    def read_slice(self, len_):
+        return _force_read(self._file, len_)
+
+    def unpack(self, struct_):
+        "Decodes the next `struct_.size` bytes with a `struct.Struct`."
+        return struct_.unpack(_force_read(self._file, struct_.size))
+
+    def read_u8(self):
+        return _U8.unpack(_force_read(self._file, 1))[0]
+    def read_u16(self):
+        return _U16.unpack(_force_read(self._file, 2))[0]
+    def read_u32(self):
+        return _U32.unpack(_force_read(self._file, 4))[0]
+    def read_u64(self):
+        return _U64.unpack(_force_read(self._file, 8))[0]
+
+    def read_compact_size(self):
+        "Decodes a little-endian CompactSize (see `LittleCompactSize`)."
+        result = self.read_u8()
+        if result < 253:
+            return result
+        elif result == 253:
+            return self.read_u16()
+        elif result == 254:
+            return self.read_u32()
+        return self.read_u64()
+
+    def read_varint(self):
+        "Decodes a base-128 `VarInt`."
+        result = 0
+        while True:
+            limb = self.read_u8()
+            result = (result << 7) | (limb & 0x7f)
+            if limb & 0x80:
+                result += 1
+            else:
+                break
+        return result
+
+    def read_varints(self, count=None):
+        if count is None:
+            return deserialize_varints(self._file.read())[0]
+        return _as_column(array('Q', (self.read_varint() for _ in range(count))))
+
+    def read_compact_sizes(self, count=None):
+        if count is None:
+            return deserialize_compact_sizes(self._file.read())[0]
+        return _as_column(array('Q', (self.read_compact_size() for _ in range(count))))
+
+def as_reader(file_):
+    """Returns file_ if it already implements the reader interface, or a
+    `FileReader` wrapping it otherwise. Every `deserialize()` method calls
+    this on entry and passes the result on to nested deserializers, so a
+    file object is wrapped only once per top-level call."""
+    if isinstance(file_, (BufferReader, FileReader)):
+        return file_
+    return FileReader(file_)
+
+def _compact_size_length(n):
+    "The number of bytes in the CompactSize encoding of n."
+    if n < 253:
+        return 1
+    elif n <= 0xffff:
+        return 3
+    elif n <= 0xffffffff:
+        return 5
+    return 9
+
+def _varint_length(n):
+    "The number of bytes in the VarInt encoding of n."
+    len_ = 1
+    while n > 0x7f:
+        n = (n >> 7) - 1
+        len_ += 1
+    return len_
+
+class BufferWriter(object):
+    """The serialization counterpart to `BufferReader`: a cursor which writes
+    into a bytearray (or any other writable buffer) in place. When the
+    buffer is preallocated to the exact size reported by `serialized_size()`
+    an entire object graph is serialized without further allocation.
+    Writes past the end of a bytearray extend it.
+
+    A BufferWriter can be passed to any `serialize_into()` method, which
+    passes it on to the serializers of nested objects."""
+    __slots__ = ('_buf', '_pos')
+
+    def __init__(self, buffer=None, offset=0):
+        if buffer is None:
+            buffer = bytearray()
+        self._buf, self._pos = buffer, offset
+
+    @property
+    def buffer(self):
+        "The underlying buffer."
+        return self._buf
+
+    def getvalue(self):
+        "Returns everything written so far as a bytes object."
+        return bytes(self._buf[:self._pos])
+
+    def tell(self):
+        return self._pos
+
+    def write(self, data):
+        pos = self._pos
+        end = pos + len(data)
+        self._buf[pos:end] = data
+        self._pos = end
+        return len(data)
+
+    def pack(self, struct_, *values):
+        "Encodes values with a `struct.Struct` at the cursor."
+        buf, pos = self._buf, self._pos
+        end = pos + struct_.size
+        if end <= len(buf):
+            struct_.pack_into(buf, pos, *values)
+        else:
+            buf[pos:end] = struct_.pack(*values)
+        self._pos = end
+
+    def _pack(self, struct_, value):
+        buf, pos = self._buf, self._pos
+        end = pos + struct_.size
+        if end <= len(buf):
+            struct_.pack_into(buf, pos, value)
+        else:
+            buf[pos:end] = struct_.pack(value)
+        self._pos = end
+
+    def write_u8(self, value):
+        self._pack(_U8, value)
+    def write_u16(self, value):
+        self._pack(_U16, value)
+    def write_u32(self, value):
+        self._pack(_U32, value)
+    def write_u64(self, value):
+        self._pack(_U64, value)
+
+    def write_compact_size(self, value):
+        "Encodes a little-endian CompactSize (see `LittleCompactSize`)."
+        if value < 253:
+            self._pack(_U8, value)
+        elif value <= 0xffff:
+            self._pack(_U8, 253)
+            self._pack(_U16, value)
+        elif value <= 0xffffffff:
+            self._pack(_U8, 254)
+            self._pack(_U32, value)
+        else:
+            self._pack(_U8, 255)
+            self._pack(_U64, value)
+
+    def write_varint(self, value):
+        "Encodes a base-128 `VarInt`."
+        self.write(VarInt(value).serialize())
+
+class FileWriter(object):
+    """Adapts a file-like object to the `BufferWriter` interface, so that
+    `serialize_into()` methods can stream directly to a file or socket."""
+    __slots__ = ('_file',)
+
+    def __init__(self, file_):
+        self._file = file_
+
+    def tell(self):
+        return self._file.tell()
+
+    def write(self, data):
+        return self._file.write(data)
+
+    def pack(self, struct_, *values):
+        "Encodes values with a `struct.Struct` at the cursor."
+        self._file.write(struct_.pack(*values))
+
+    def write_u8(self, value):
+        self._file.write(_U8.pack(value))
+    def write_u16(self, value):
+        self._file.write(_U16.pack(value))
+    def write_u32(self, value):
+        self._file.write(_U32.pack(value))
+    def write_u64(self, value):
+        self._file.write(_U64.pack(value))
+
+    def write_compact_size(self, value):
+        "Encodes a little-endian CompactSize (see `LittleCompactSize`)."
+        self._file.write(LittleCompactSize(value).serialize())
+
+    def write_varint(self, value):
+        "Encodes a base-128 `VarInt`."
+        self._file.write(VarInt(value).serialize())
+
+def as_writer(buf):
+    """Returns buf if it already implements the writer interface. A bytearray
+    is wrapped in a `BufferWriter` which appends to it, and anything else is
+    assumed to be a file-like object and wrapped in a `FileWriter`. To write
+    from the start of a preallocated buffer, wrap it in a BufferWriter
+    explicitly."""
+    if isinstance(buf, (BufferWriter, FileWriter)):
+        return buf
+    if isinstance(buf, bytearray):
+        return BufferWriter(buf, len(buf))
+    return FileWriter(buf)
+
 class _BaseCompactSize(int):
     """\
     Compact size
@@ -43,24 +451,31 @@ class _BaseCompactSize(int):
     def serialize(self):
         if 0 <= self:
             if self < 253:
-                return chr(self)
+                return six.int2byte(self)
             elif self <= 0xffff:
-                return '\xfd' + pack(self.SHORT_FMT, self)
+                return b'\xfd' + pack(self.SHORT_FMT, self)
             elif self <= 0xffffffff:
-                return '\xfe' + pack(self.INT_FMT, self)
+                return b'\xfe' + pack(self.INT_FMT, self)
             elif self <= 0xffffffffffffffff:
-                return '\xff' + pack(self.LONG_FMT, self)
+                return b'\xff' + pack(self.LONG_FMT, self)
         raise ValueError(u"out of bounds: %d" % self)
 
+    def serialize_into(self, buf):
+        as_writer(buf).write(self.serialize())
+
+    def serialized_size(self):
+        return _compact_size_length(self)
+
     @classmethod
     def deserialize(cls, file_):
-        result = unpack("<B", _force_read(file_, 1))[0]
+        file_ = as_reader(file_)
+        result = file_.read_u8()
         if result == 253:
-            result = unpack(cls.SHORT_FMT, _force_read(file_, 2))[0]
+            result = unpack(cls.SHORT_FMT, file_.read_slice(2))[0]
         elif result == 254:
-            result = unpack(cls.INT_FMT, _force_read(file_, 4))[0]
+            result = unpack(cls.INT_FMT, file_.read_slice(4))[0]
         elif result == 255:
-            result = unpack(cls.LONG_FMT, _force_read(file_, 8))[0]
+            result = unpack(cls.LONG_FMT, file_.read_slice(8))[0]
         return cls(result)
 
 class BigCompactSize(_BaseCompactSize):
@@ -73,66 +488,45 @@ class LittleCompactSize(_BaseCompactSize):
     INT_FMT   = "<I"
     LONG_FMT  = "<Q"
 
+    @classmethod
+    def deserialize(cls, file_):
+        return cls(as_reader(file_).read_compact_size())
+
+def _serialize_integer(value, len_, byteorder):
+    if value < 0:
+        raise ValueError(u"received integer value is negative")
+    if len_ is None or len_ <= 0:
+        # No width specified: the shortest representation.
+        len_ = (value.bit_length() + 7) // 8
+    try:
+        return int.to_bytes(value, len_, byteorder)
+    except OverflowError:
+        raise ValueError(u"integer exceeds maximum representable value")
+
+def _deserialize_integer(file_, len_, byteorder, codecs):
+    file_ = as_reader(file_)
+    codec = codecs.get(len_)
+    if codec is not None:
+        return file_.unpack(codec)[0]
+    return int.from_bytes(file_.read_slice(len_), byteorder)
+
 class LittleInteger(int):
     "Little-endian serialized integer representation."
     def serialize(self, len_=None):
-        if self < 0:
-            raise ValueError(u"received integer value is negative")
-
-        result = []
-        while self:
-            result.append(pack("<Q", self & 0xffffffffffffffff))
-            self >>= 64
-        result = b''.join(result)
-        result = result.rstrip(b'\x00')
-
-        if len_ > 0:
-            result_len = len(result)
-            if result_len < len_:
-                result = result + b'\x00' * (len_ - result_len)
-            elif result_len > len_:
-                raise ValueError(u"integer exceeds maximum representable value")
-
-        return result
+        return _serialize_integer(self, len_, 'little')
 
     @classmethod
     def deserialize(cls, file_, len_):
-        result = 0
-        for idx in range(len_//8):
-            limb = unpack("<Q", _force_read(file_, 8))[0]
-            result += limb << (idx * 64)
-        if len_ & 4:
-            limb = unpack("<I", _force_read(file_, 4))[0]
-            result += limb << ((len_ & ~7) * 8)
-        if len_ & 2:
-            limb = unpack("<H", _force_read(file_, 2))[0]
-            result += limb << ((len_ & ~3) * 8)
-        if len_ & 1:
-            limb = unpack("<B", _force_read(file_, 1))[0]
-            result += limb << ((len_ & ~1) * 8)
-        return cls(result)
+        return cls(_deserialize_integer(file_, len_, 'little', _LITTLE_CODECS))
 
 class BigInteger(int):
     "Big-endian serialized integer representation."
-    def serialize(self, *args, **kwargs):
-        return LittleInteger(self).serialize(*args, **kwargs)[::-1]
+    def serialize(self, len_=None):
+        return _serialize_integer(self, len_, 'big')
 
     @classmethod
     def deserialize(cls, file_, len_):
-        result = 0
-        for idx in range(len_//8):
-            limb = unpack(">Q", _force_read(file_, 8))[0]
-            result = (result << 64) + limb
-        if len_ & 4:
-            limb = unpack(">I", _force_read(file_, 4))[0]
-            result = (result << 32) + limb
-        if len_ & 2:
-            limb = unpack(">H", _force_read(file_, 2))[0]
-            result = (result << 16) + limb
-        if len_ & 1:
-            limb = unpack(">B", _force_read(file_, 1))[0]
-            result = (result << 8) + limb
-        return cls(result)
+        return cls(_deserialize_integer(file_, len_, 'big', _BIG_CODECS))
 
 class BigNum(int):
     def serialize(self, *args, **kwargs):
@@ -154,10 +548,10 @@ class BigNum(int):
 
 class VarInt(int):
     def serialize(self):
-        if not self:
-            return six.int2byte(0)
+        if self < 0:
+            raise ValueError(u"out of bounds: %d" % self)
         parts = list()
-        while self:
+        while True:
             parts.append(six.int2byte((self&0x7f) | (parts and 0x80 or 0x00)))
             if self <= 0x7f:
                 break
@@ -165,18 +559,15 @@ class VarInt(int):
             self  -= 1
         return b''.join(reversed(parts))
 
+    def serialize_into(self, buf):
+        as_writer(buf).write_varint(self)
+
+    def serialized_size(self):
+        return _varint_length(self)
+
     @classmethod
     def deserialize(cls, file_):
-        result = 0
-        while True:
-            limb = unpack(">B", _force_read(file_, 1))[0]
-            result <<= 7
-            result  |= limb & 0x7f
-            if limb & 0x80:
-                result += 1
-            else:
-                break
-        return result
+        return as_reader(file_).read_varint()
 
 class FlatData(six.binary_type):
     "Wrapper for serializing arrays and POD."
@@ -185,18 +576,150 @@ class FlatData(six.binary_type):
 
     @classmethod
     def deserialize(cls, file_, len_):
-        return len_ and _force_read(file_, len_) or b''
+        if not len_:
+            return b''
+        return bytes(as_reader(file_).read_slice(len_))
 
 def serialize_iterator(iter_, serializer=lambda i:i.serialize(),
         prefix = lambda n:LittleCompactSize(n).serialize(), *args, **kwargs):
-    len_, result = 0, b''
-    for item in iter_:
-        result += serializer(item, *args, **kwargs); len_ += 1
-    return prefix(len_) + result
+    parts = [serializer(item, *args, **kwargs) for item in iter_]
+    parts.insert(0, prefix(len(parts)))
+    return b''.join(parts)
 
 def deserialize_iterator(file_, deserializer, prefix=LittleCompactSize.deserialize, *args, **kwargs):
+    file_ = as_reader(file_)
     for _ in range(prefix(file_)):
         yield deserializer(file_, *args, **kwargs)
-    raise StopIteration
+
+# ===----------------------------------------------------------------------===
+
+# Batch decoding of columns of VarInts and CompactSizes, such as the heights,
+# versions and compressed amounts of a UTXO snapshot. Values are returned as a
+# numpy.uint64 array if NumPy is installed, or an array.array('Q') otherwise;
+# either supports len(), indexing, iteration and the buffer protocol. Values
+# which do not fit in 64 bits raise OverflowError.
+
+# VarInts of up to 9 bytes always fit in 64 bits. A 10-byte VarInt fits only
+# if the value of its first 9 bytes is less than 2**57, and anything longer
+# never does.
+_VARINT_MAX_SAFE_LENGTH = 9
+_VARINT_MAX_LENGTH = _varint_length(0xffffffffffffffff)
+
+# Below this many values the fixed overhead of NumPy outweighs its benefit.
+_NUMPY_MIN_COUNT = 16
+
+def _as_column(values):
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.uint64)
+    return values
+
+def _as_view(buffer):
+    view = memoryview(buffer)
+    if view.ndim != 1 or view.itemsize != 1:
+        view = view.cast('B')
+    return view
+
+def _deserialize_varints_python(view, offset, end, count):
+    values = array('Q')
+    append = values.append
+    result, pending, pos = 0, False, offset
+    if count != 0:
+        for pos, limb in enumerate(view[offset:end], offset):
+            result = (result << 7) | (limb & 0x7f)
+            if limb & 0x80:
+                result += 1
+                pending = True
+                continue
+            append(result)
+            result, pending = 0, False
+            if len(values) == count:
+                break
+        else:
+            pos = end - 1
+        pos += 1
+    if pending or (count is not None and len(values) < count):
+        raise EOFError(u"unexpected end-of-file")
+    return values, pos
+
+def _deserialize_varints_numpy(view, offset, end, count):
+    if count is not None:
+        end = min(end, offset + count * _VARINT_MAX_LENGTH)
+    bytes_ = numpy.frombuffer(view, numpy.uint8, end - offset, offset)
+    # Every byte without the continuation bit set terminates a VarInt, so the
+    # boundaries of the entire run can be located in one vectorized pass.
+    ends = numpy.flatnonzero(bytes_ < 0x80)
+    if count is None:
+        if len(bytes_) and bytes_[-1] & 0x80:
+            raise EOFError(u"unexpected end-of-file")
+    elif len(ends) < count:
+        raise EOFError(u"unexpected end-of-file")
+    else:
+        ends = ends[:count]
+    starts = numpy.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts + 1
+    values = numpy.zeros(len(ends), dtype=numpy.uint64)
+    max_length = len(ends) and int(lengths.max())
+    if max_length > _VARINT_MAX_LENGTH:
+        raise OverflowError(u"VarInt exceeds 64 bits")
+    # Decode position k of every VarInt at least k+1 bytes long at once.
+    for k in range(max_length):
+        active = numpy.flatnonzero(lengths > k)
+        if k == _VARINT_MAX_SAFE_LENGTH and \
+                (values[active] >> (64 - 7)).any():
+            raise OverflowError(u"VarInt exceeds 64 bits")
+        limbs = bytes_[starts[active] + k].astype(numpy.uint64)
+        values[active] = ((values[active] << 7) | (limbs & 0x7f)) + (limbs >> 7)
+    return values, offset + (len(ends) and int(ends[-1]) + 1)
+
+def _deserialize_varints(view, offset, end, count):
+    if numpy is not None and (count is None or count >= _NUMPY_MIN_COUNT):
+        return _deserialize_varints_numpy(view, offset, end, count)
+    values, end = _deserialize_varints_python(view, offset, end, count)
+    return _as_column(values), end
+
+def deserialize_varints(buffer, offset=0, count=None):
+    """Decodes a run of count consecutive `VarInt`s from buffer (any object
+    supporting the buffer protocol), beginning at offset. If count is None
+    the run extends to the end of the buffer. Returns a tuple of the decoded
+    values and the offset just past the last one. Raises EOFError if the
+    buffer ends before count values have been read."""
+    view = _as_view(buffer)
+    return _deserialize_varints(view, offset, len(view), count)
+
+def _deserialize_compact_sizes(view, offset, end, count):
+    if count is None:
+        run = view[offset:end]
+    else:
+        run = view[offset:min(end, offset+count)]
+        if len(run) < count:
+            raise EOFError(u"unexpected end-of-file")
+    # Values below 253 are encoded as a single byte, so a run consisting only
+    # of such values can be converted directly. Otherwise the encoding is not
+    # self-synchronizing, and has to be decoded value by value.
+    if numpy is not None:
+        bytes_ = numpy.frombuffer(run, numpy.uint8)
+        if not len(bytes_) or bytes_.max() < 253:
+            return bytes_.astype(numpy.uint64), offset + len(bytes_)
+    elif not len(run) or max(run) < 253:
+        return array('Q', run), offset + len(run)
+    reader = BufferReader(view, offset, end)
+    values = array('Q')
+    append = values.append
+    if count is None:
+        while reader.remaining:
+            append(reader.read_compact_size())
+    else:
+        for _ in range(count):
+            append(reader.read_compact_size())
+    return _as_column(values), reader.tell()
+
+def deserialize_compact_sizes(buffer, offset=0, count=None):
+    """Decodes a run of count consecutive `LittleCompactSize`s from buffer,
+    beginning at offset, with the same conventions as
+    `deserialize_varints()`."""
+    view = _as_view(buffer)
+    return _deserialize_compact_sizes(view, offset, len(view), count)
 
 # End of File
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+"""A multi-lane SHA-256 implementation in NumPy, for the fixed-shape hashing
+of interior Merkle tree nodes: the double-SHA256 of exactly 64 bytes, being
+the serialized hashes of the two children. Many such hashes are computed at
+once, one per lane, each 32-bit word of the state and message schedule
+being held as an array with an element for every lane.
+
+Hashing 64 bytes takes two compressions, the second of which is of the
+constant padding block, whose message schedule is therefore precomputed;
+and hashing the resulting digest takes one more. Importing this module
+raises ImportError if NumPy is not installed."""
+
+__all__ = [
+    'hash256_64',
+    'self_test',
+]
+
+import hashlib
+import os
+
+import numpy
+
+# ===----------------------------------------------------------------------===
+
+_K = (
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1,
+    0x923f82a4, 0xab1c5ed5, 0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3,
+    0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174, 0xe49b69c1, 0xefbe4786,
+    0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147,
+    0x06ca6351, 0x14292967, 0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13,
+    0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85, 0xa2bfe8a1, 0xa81a664b,
+    0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a,
+    0x5b9cca4f, 0x682e6ff3, 0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208,
+    0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2)
+
+_H0 = (
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c,
+    0x1f83d9ab, 0x5be0cd19)
+
+_MASK = 0xffffffff
+
+def _rotr(x, n):
+    return ((x >> n) | (x << (32 - n))) & _MASK
+
+def _schedule(words):
+    "The 64-word message schedule of 16 words, as plain integers."
+    w = list(words)
+    for t in range(16, 64):
+        s0 = _rotr(w[t-15], 7) ^ _rotr(w[t-15], 18) ^ (w[t-15] >> 3)
+        s1 = _rotr(w[t-2], 17) ^ _rotr(w[t-2], 19) ^ (w[t-2] >> 10)
+        w.append((w[t-16] + s0 + w[t-7] + s1) & _MASK)
+    return w
+
+# The round constants added to the message schedule of the padding block
+# which follows a 64-byte message, and of a 32-byte message with its padding.
+_PAD64 = tuple(numpy.uint32((k + w) & _MASK)
+               for k, w in zip(_K, _schedule([0x80000000] + [0]*14 + [512])))
+_PAD32 = (0x80000000, 0, 0, 0, 0, 0, 0, 256)
+
+# Lanes per pass. Large enough to amortize NumPy's per-call overhead, small
+# enough for the working set of ~90 arrays to stay in cache.
+_LANES = 16384
+
+# ===----------------------------------------------------------------------===
+
+class _Kernel(object):
+    "Scratch space and the compression function for a number of lanes."
+    def __init__(self, lanes):
+        self.lanes = lanes
+        self._tmp = [numpy.empty(lanes, numpy.uint32) for _ in range(3)]
+
+    def _sigma(self, x, r1, r2, r3, out, shift=False):
+        """out = rotr(x, r1) ^ rotr(x, r2) ^ rotr(x, r3), or with a right shift
+        in place of the last rotation if shift is set."""
+        tmp = self._tmp[2]
+        numpy.right_shift(x, r1, out=out)
+        numpy.left_shift(x, 32 - r1, out=tmp); out |= tmp
+        numpy.right_shift(x, r2, out=tmp); out ^= tmp
+        numpy.left_shift(x, 32 - r2, out=tmp); out ^= tmp
+        numpy.right_shift(x, r3, out=tmp); out ^= tmp
+        if not shift:
+            numpy.left_shift(x, 32 - r3, out=tmp); out ^= tmp
+        return out
+
+    def schedule(self, words):
+        """The message schedule of 16 words (arrays or integers), with the
+        round constants added."""
+        lanes, tmp = self.lanes, self._tmp[0]
+        w = [numpy.full(lanes, word, numpy.uint32)
+             if not isinstance(word, numpy.ndarray) else word.copy()
+             for word in words]
+        for t in range(16, 64):
+            word = self._sigma(w[t-15], 7, 18, 3,
+                               numpy.empty(lanes, numpy.uint32), shift=True)
+            word += w[t-16]
+            word += w[t-7]
+            word += self._sigma(w[t-2], 17, 19, 10, tmp, shift=True)
+            w.append(word)
+        for t in range(64):
+            w[t] += numpy.uint32(_K[t])
+        return w
+
+    def compress(self, state, kw):
+        """Returns the state following the compression of a block, whose
+        message schedule with round constants added is kw."""
+        t0, t1 = self._tmp[:2]
+        a, b, c, d, e, f, g, h = [
+            numpy.full(self.lanes, x, numpy.uint32)
+            if not isinstance(x, numpy.ndarray) else x.copy() for x in state]
+        for t in range(64):
+            # h becomes T1 = h + Σ1(e) + Ch(e, f, g) + K[t] + W[t]
+            h += self._sigma(e, 6, 11, 25, t0)
+            numpy.bitwise_and(e, f, out=t0)
+            numpy.invert(e, out=t1); t1 &= g; t0 ^= t1
+            h += t0
+            h += kw[t]
+            d += h
+            # and then the new a, T1 + Σ0(a) + Maj(a, b, c)
+            h += self._sigma(a, 2, 13, 22, t0)
+            numpy.bitwise_and(a, b, out=t0)
+            numpy.bitwise_and(a, c, out=t1); t0 ^= t1
+            numpy.bitwise_and(b, c, out=t1); t0 ^= t1
+            h += t0
+            a, b, c, d, e, f, g, h = h, a, b, c, d, e, f, g
+        result = [a, b, c, d, e, f, g, h]
+        for x, y in zip(result, state):
+            x += y if isinstance(y, numpy.ndarray) else numpy.uint32(y)
+        return result
+
+    def hash256_64(self, words):
+        """The double-SHA256 of the 64-byte messages whose big-endian words
+        are the rows of words, as the 8 words of each digest."""
+        state = self.compress(_H0, self.schedule(words))
+        state = self.compress(state, _PAD64)
+        return self.compress(_H0, self.schedule(list(state) + list(_PAD32)))
+
+def hash256_64(buffer):
+    """Returns the concatenated double-SHA256 digests of each consecutive 64
+    bytes of buffer."""
+    view = memoryview(buffer)
+    if view.ndim != 1 or view.itemsize != 1:
+        view = view.cast('B')
+    count, remainder = divmod(len(view), 64)
+    if remainder:
+        raise ValueError(u"buffer is not a whole number of 64-byte messages")
+    parts = []
+    for start in range(0, count, _LANES):
+        lanes = min(_LANES, count - start)
+        words = numpy.frombuffer(view, '>u4', 16*lanes, 64*start)
+        words = words.reshape(lanes, 16).T.astype(numpy.uint32)
+        digest = _Kernel(lanes).hash256_64(list(words))
+        parts.append(numpy.stack(digest).T.astype('>u4').tobytes())
+    return b''.join(parts)
+
+def self_test(count=1000):
+    """Checks hash256_64() against hashlib on count random messages, raising
+    AssertionError on a mismatch."""
+    buffer = os.urandom(64 * count)
+    sha256 = hashlib.sha256
+    expected = b''.join([sha256(sha256(buffer[pos:pos+64]).digest()).digest()
+                         for pos in range(0, len(buffer), 64)])
+    if hash256_64(buffer) != expected:
+        raise AssertionError(u"vectorized SHA-256 does not match hashlib")
+
+# End of File
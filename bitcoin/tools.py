@@ -178,6 +178,124 @@ del bitstring
 
 # ===----------------------------------------------------------------------===
 
+class BitPrefix(object):
+    """An immutable string of bits, held as the integer value of its bits
+    (the first being the most significant) and its length. This is the key
+    and link-prefix type of the authenticated prefix trees, for which it
+    provides the handful of operations they need--comparison, slicing,
+    concatenation, prefix tests and the length of a common prefix--each
+    in a few integer operations rather than bit by bit as with Bits."""
+    __slots__ = ('_value', '_length')
+
+    def __init__(self, value=0, length=0):
+        if length < 0 or value < 0 or value >> length:
+            raise ValueError(u"%d does not fit in %d bits" % (value, length))
+        self._value, self._length = value, length
+
+    @classmethod
+    def from_bytes(cls, bytes_):
+        "The bits of a binary string, most significant first."
+        return cls(int.from_bytes(bytes_, 'big'), 8*len(bytes_))
+
+    @classmethod
+    def from_bits(cls, bits):
+        "The bits of an iterable of booleans, such as a Bits instance."
+        value, length = 0, 0
+        for bit in bits:
+            value = (value << 1) | bool(bit)
+            length += 1
+        return cls(value, length)
+
+    value  = property(lambda self:self._value)
+    length = property(lambda self:self._length)
+
+    def tobytes(self):
+        "The bits as a binary string, zero-padded to a whole number of bytes."
+        len_ = (self._length + 7) // 8
+        return (self._value << (8*len_ - self._length)).to_bytes(len_, 'big')
+    bytes = property(tobytes)
+
+    def __len__(self):
+        "x.__len__() <==> len(x)"
+        return self._length
+
+    def __iter__(self):
+        "x.__iter__() <==> iter(x)"
+        value, length = self._value, self._length
+        for idx in range(length-1, -1, -1):
+            yield bool((value >> idx) & 1)
+
+    def __getitem__(self, index):
+        "x.__getitem__(y) <==> x[y], for an index or a contiguous slice"
+        length = self._length
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            if step != 1:
+                raise ValueError(u"only contiguous slices are supported")
+            if stop <= start:
+                return self.__class__()
+            return self.__class__(
+                (self._value >> (length - stop)) & ((1 << (stop - start)) - 1),
+                stop - start)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError(index)
+        return bool((self._value >> (length - 1 - index)) & 1)
+
+    def __add__(self, other):
+        "x.__add__(y) <==> x+y"
+        if not isinstance(other, BitPrefix):
+            return NotImplemented
+        return self.__class__((self._value << other._length) | other._value,
+                              self._length + other._length)
+
+    def startswith(self, prefix):
+        "True if the leading bits of x are those of prefix."
+        shift = self._length - prefix._length
+        return shift >= 0 and self._value >> shift == prefix._value
+
+    def common_length(self, other):
+        "The length of the longest prefix x and other have in common."
+        len_ = min(self._length, other._length)
+        diff = ((self._value  >> (self._length  - len_)) ^
+                (other._value >> (other._length - len_)))
+        return len_ - diff.bit_length()
+
+    def _cmp(self, other):
+        len_ = min(self._length, other._length)
+        a = self._value  >> (self._length  - len_)
+        b = other._value >> (other._length - len_)
+        if a != b:
+            return a < b and -1 or 1
+        return cmp(self._length, other._length)
+
+    def _thunk_other(inner):
+        def outer(self, other):
+            if not isinstance(other, BitPrefix):
+                return NotImplemented
+            return inner(self, other)
+        return outer
+    __lt__ = _thunk_other(lambda self,other:self._cmp(other) <  0)
+    __le__ = _thunk_other(lambda self,other:self._cmp(other) <= 0)
+    __ge__ = _thunk_other(lambda self,other:self._cmp(other) >= 0)
+    __gt__ = _thunk_other(lambda self,other:self._cmp(other) >  0)
+    __eq__ = _thunk_other(lambda self,other:
+        self._length == other._length and self._value == other._value)
+    __ne__ = _thunk_other(lambda self,other:
+        self._length != other._length or self._value != other._value)
+    del _thunk_other
+
+    def __hash__(self):
+        "x.__hash__() <==> hash(x)"
+        return hash((self._value, self._length))
+
+    def __repr__(self):
+        return '%s(\'0b%s\')' % (self.__class__.__name__,
+            ''.join(bit and '1' or '0' for bit in self))
+
+# ===----------------------------------------------------------------------===
+
 def SteppedGeometric(initial, interval):
     def _func(height):
         return mpq(initial, 2**(height//interval));
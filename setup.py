@@ -12,7 +12,7 @@ README = open(os.path.join(here, 'README.md')).read()
 CHANGES = open(os.path.join(here, 'CHANGES.md')).read()
 requires = [x for x in filter(lambda r:'libs/' not in r,
     open(os.path.join(here, 'requirements.txt')).read().split())]
-packages = [x for x in filter(lambda p:not p.startswith('xunit'), find_packages())]
+packages = [x for x in filter(lambda p:not p.startswith(('xunit', 'bench')), find_packages())]
 
 from bitcoin import get_version
 version = get_version().replace(' ', '-')
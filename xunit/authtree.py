@@ -14,7 +14,7 @@ import unittest
 from scenariotest import ScenarioMeta, ScenarioTest
 
 from bitcoin.authtree import *
-from bitcoin.tools import Bits, BytesIO, icmp
+from bitcoin.tools import Bits, BitPrefix, BytesIO, icmp
 
 # ===----------------------------------------------------------------------===
 
@@ -70,6 +70,41 @@ class TestAuthTreeLink(unittest.TestCase):
             pn.link_class(b'abc', MemoryPatriciaAuthTree(value=b'')),
             pn.link_class(b'abc', MemoryPatriciaAuthTree(value=b'')))
 
+class TestComposableAuthTreeLink(unittest.TestCase):
+    "Test the link hash against its definition, with and without the memo."
+    def _reference(self, prefix, hash_):
+        from bitcoin.hash import hash256
+        digest = hash256.serialize(hash_)
+        for idx in range(len(prefix)-1, 0, -1):
+            digest = hash256.digest_of(
+                hash256.digest_of(prefix[idx] and b'\x04\x00' or b'\x01\x00') +
+                digest)
+        return int.from_bytes(digest, 'little')
+
+    def test_hash(self):
+        link_class = MemoryComposableAuthTree.link_class
+        for key in (b'', b'\x80', b'abc', b'\x00' * 33, b'\xff' * 33):
+            for length in range(1, 8 * len(key) + 1, 5):
+                prefix = BitPrefix.from_bytes(key)[:length]
+                node = MemoryComposableAuthTree(value=key)
+                expected = self._reference(prefix, node.hash)
+                self.assertEqual(link_class(prefix, node).hash, expected)
+                # Memoized
+                self.assertEqual(link_class(prefix, node).hash, expected)
+
+    def test_memo_size(self):
+        class link_class(MemoryComposableAuthTree.link_class):
+            memo_size = 16
+        node = MemoryComposableAuthTree(value=b'')
+        for idx in range(100):
+            link_class(BitPrefix(idx, 24), node).hash
+        self.assertEqual(len(link_class.get_memo()), 16)
+        self.assertTrue((BitPrefix(99, 23), node.hash) in link_class.get_memo())
+        # The memo of the subclass is its own.
+        memo = MemoryComposableAuthTree.link_class.get_memo()
+        self.assertIsNot(link_class.get_memo(), memo)
+        self.assertFalse((BitPrefix(99, 23), node.hash) in memo)
+
 # ===----------------------------------------------------------------------===
 
 class TestAuthTreeNode(object):
@@ -819,3 +854,333 @@ class TestPatriciaDictScenarios6(object):
             self.assertEqual(pt.hash, hash_)
             if kwargs:
                 self.assertNotEqual(pt.hash, pt2.hash)
+
+class TestUpdateDelete(unittest.TestCase):
+    "Test the links rebuilt by _update() and _delete()."
+    def test_hash_between_updates(self):
+        # Links whose prefix is shortened or extended by a later update must
+        # not keep the hash computed for their old prefix.
+        items = sorted(dict((six.int2byte(idx) * (idx % 5 + 1), six.int2byte(idx))
+                            for idx in range(0, 256, 3)).items())
+        for cls in (MemoryComposableAuthTree, MemoryPatriciaAuthTree):
+            pn = cls()
+            for key, value in items:
+                pn[key] = value
+                pn.hash
+            self.assertEqual(pn.hash, cls.from_sorted_items(items).hash)
+            for key, value in items[::2]:
+                del pn[key]
+                pn.hash
+            self.assertEqual(pn.hash, cls.from_sorted_items(items[1::2]).hash)
+
+# ===----------------------------------------------------------------------===
+
+def _scenario_items(scenario):
+    return sorted((key, value) for key, value in six.iteritems(scenario)
+                  if key not in ('composable', 'patricia'))
+
+class TestFromSortedItems(unittest.TestCase):
+    "Test bulk loading against the known hashes and against update()."
+    def test_scenarios(self):
+        for scenario in SCENARIOS:
+            items = _scenario_items(scenario)
+            pn = MemoryComposableAuthTree.from_sorted_items(items)
+            self.assertEqual(pn.hash, scenario['composable'])
+            self.assertEqual(pn.items(), items)
+            pn2 = MemoryPatriciaAuthTree.from_sorted_items(items)
+            self.assertEqual(pn2.hash, scenario['patricia'])
+            self.assertEqual(pn2.items(), items)
+
+    def test_update(self):
+        items = sorted(set((six.int2byte(idx % 7) * (idx % 5),
+                            six.int2byte(idx)) for idx in range(40)))
+        items = sorted(dict(items).items())
+        for cls in (MemoryComposableAuthTree, MemoryPatriciaAuthTree):
+            pn = cls()
+            pn.update(items)
+            pn2 = cls.from_sorted_items(iter(items))
+            self.assertEqual(pn2.items(), items)
+            self.assertEqual(pn2.serialize(), pn.serialize())
+            self.assertEqual(pn2.hash, pn.hash)
+            self.assertEqual((pn2.count, pn2.length, pn2.size),
+                             (pn.count, pn.length, pn.size))
+
+    def test_unsorted(self):
+        for items in ([(b'b', b''), (b'a', b'')],
+                      [(b'ab', b''), (b'a', b'')],
+                      [(b'a', b''), (b'a', b'')]):
+            self.assertRaises(ValueError,
+                MemoryPatriciaAuthTree.from_sorted_items, items)
+
+class TestBatch(unittest.TestCase):
+    "Test batched changes against the same changes made one at a time."
+    def _items(self, seed):
+        return sorted(dict((six.int2byte((idx * seed) % 11) * (idx % 4),
+                            six.int2byte(idx)) for idx in range(30)).items())
+
+    def test_apply(self):
+        for cls in (MemoryComposableAuthTree, MemoryPatriciaAuthTree):
+            for seed in (1, 3, 7):
+                items = self._items(seed)
+                changes = [(key, None) for key, value in items[::3]]
+                changes += [(key + b'\x00', b'\xff') for key, value in items[1::4]]
+                changes += [(b'\x0b', b'\x01'), (b'\x0b', b'\x02'), (b'\x0b', None)]
+                pn = cls.from_sorted_items(items)
+                for key, value in changes:
+                    if value is None:
+                        del pn[key]
+                    else:
+                        pn[key] = value
+                pn2 = cls.from_sorted_items(items)
+                pn2.apply(changes)
+                self.assertEqual(pn2.items(), pn.items())
+                self.assertEqual(pn2.serialize(), pn.serialize())
+                self.assertEqual(pn2.hash, pn.hash)
+                pn3 = cls.from_sorted_items(pn.items())
+                self.assertEqual(pn2.hash, pn3.hash)
+
+    def test_apply_after_hashing(self):
+        # Links split or squashed by apply() must not keep the hash computed
+        # for their old prefix.
+        items = sorted(dict((six.int2byte(idx) * (idx % 5 + 1), six.int2byte(idx))
+                            for idx in range(0, 256, 3)).items())
+        for cls in (MemoryComposableAuthTree, MemoryPatriciaAuthTree):
+            pn = cls.from_sorted_items(items)
+            pn.hash
+            pn.apply((key, None) for key, value in items[::2])
+            self.assertEqual(pn.hash, cls.from_sorted_items(items[1::2]).hash)
+            pn.hash
+            pn.apply(items[::2])
+            self.assertEqual(pn.hash, cls.from_sorted_items(items).hash)
+
+    def test_delete_all(self):
+        items = self._items(1)
+        pn = MemoryPatriciaAuthTree.from_sorted_items(items)
+        pn.apply(dict((key, None) for key, value in items))
+        self.assertEqual(pn.items(), [])
+        self.assertEqual(pn.hash, MemoryPatriciaAuthTree().hash)
+
+    def test_missing(self):
+        items = self._items(1)
+        pn = MemoryPatriciaAuthTree.from_sorted_items(items)
+        hash_ = pn.hash
+        for changes in ([(b'\x0b', b'\x01'), (b'\x0c', None)],
+                        [(items[0][0], None), (items[0][0], None)]):
+            self.assertRaises(KeyError, pn.apply, changes)
+            self.assertEqual(pn.hash, hash_)
+            self.assertEqual(pn.items(), items)
+
+    def test_batch(self):
+        pn = MemoryPatriciaAuthTree.from_sorted_items(self._items(1))
+        pn2 = MemoryPatriciaAuthTree.from_sorted_items(self._items(1))
+        with pn.batch() as batch:
+            batch[b'abc'] = b'\x01'
+            batch.update({b'abd': b'\x02', b'abe': b'\x03'})
+            del batch[b'abd']
+            batch.delete([b''])
+            self.assertEqual(pn.items(), pn2.items())
+        pn2.update([(b'abc', b'\x01'), (b'abe', b'\x03')])
+        del pn2[b'']
+        self.assertEqual(pn.items(), pn2.items())
+        self.assertEqual(pn.hash, pn2.hash)
+        try:
+            with pn.batch() as batch:
+                batch[b'xyz'] = b'\x01'
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertNotIn(b'xyz', pn)
+
+class TestSerializeRoundTrip(unittest.TestCase):
+    "Test that trees with prefixes of every compressed length round-trip."
+    def test_round_trip(self):
+        items = sorted(dict((six.int2byte(idx) * (idx % 5), six.int2byte(idx))
+                            for idx in range(0, 256, 7)).items())
+        for cls in (MemoryComposableAuthTree, MemoryPatriciaAuthTree):
+            pn = cls.from_sorted_items(items)
+            lengths, nodes = set(), [pn]
+            while nodes:
+                node = nodes.pop()
+                lengths.update(len(link.prefix) for link in node.children)
+                nodes.extend(link.node for link in node.children)
+            self.assertTrue(1 in lengths)
+            self.assertTrue(any(2 <= len_ <= 8 for len_ in lengths))
+            self.assertTrue(any(9 <= len_ for len_ in lengths))
+            pn2 = cls.deserialize(BytesIO(pn.serialize()))
+            self.assertEqual(pn2.items(), items)
+            self.assertEqual(pn2.serialize(), pn.serialize())
+            self.assertEqual(pn2.hash, pn.hash)
+
+class TestBitsKeys(unittest.TestCase):
+    "Test that keys given as Bits are prepared as their BitPrefix."
+    def test_bits_keys(self):
+        for cls in (MemoryComposableAuthTree, MemoryPatriciaAuthTree):
+            pn, pn2 = cls(), cls()
+            for key, value in ((b'abc', b'\x01'), (b'abd', b'\x02'), (b'b', b'\x03')):
+                pn[Bits(bytes=key)] = value
+                pn2[key] = value
+            self.assertEqual(pn.hash, pn2.hash)
+            self.assertEqual(pn._get_node_by_key(BitPrefix.from_bits(Bits(bytes=b'abd')))[0],
+                             pn2._get_node_by_key(BitPrefix.from_bytes(b'abd'))[0])
+            self.assertIn(Bits(bytes=b'abc'), pn)
+            self.assertNotIn(Bits(bytes=b'ab'), pn)
+            self.assertEqual(pn[Bits(bytes=b'abd')], b'\x02')
+            self.assertEqual(pn.get(Bits(bytes=b'ab'), b'\x00'), b'\x00')
+            self.assertEqual(pn.items(), pn2.items())
+            self.assertEqual(pn.reversed_keys(), [b'b', b'abd', b'abc'])
+            # Keys need not be whole bytes.
+            pn[Bits('0b011')] = b'\x04'
+            self.assertIn(Bits('0b011'), pn)
+            self.assertNotIn(Bits('0b0110'), pn)
+            del pn[Bits('0b011')]
+            del pn[Bits(bytes=b'abc')]
+            self.assertEqual(pn.items(), [(b'abd', b'\x02'), (b'b', b'\x03')])
+
+# ===----------------------------------------------------------------------===
+
+import os
+import shutil
+import tempfile
+
+class TestDiskAuthTree(unittest.TestCase):
+    "Test the disk-backed trees against their in-memory counterparts."
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'authtree.db')
+        self.items = sorted(dict((six.int2byte(idx) * (idx % 5 + 1), six.int2byte(idx))
+                                 for idx in range(0, 256, 3)).items())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_empty(self):
+        for disk, memory in ((DiskComposableAuthTree, MemoryComposableAuthTree),
+                             (DiskPatriciaAuthTree,   MemoryPatriciaAuthTree)):
+            pn = disk.open(self.filename + disk.__name__)
+            self.assertEqual(pn.items(), [])
+            self.assertEqual(pn.commit(), memory().hash)
+            pn.close()
+            pn = disk.open(self.filename + disk.__name__)
+            self.assertEqual(pn.hash, memory().hash)
+            pn.close()
+
+    def test_commit(self):
+        for disk, memory in ((DiskComposableAuthTree, MemoryComposableAuthTree),
+                             (DiskPatriciaAuthTree,   MemoryPatriciaAuthTree)):
+            filename = self.filename + disk.__name__
+            pn = disk.open(filename)
+            for key, value in self.items[:40]:
+                pn[key] = value
+            pn.flush()
+            for link in pn.children:
+                self.assertIsNone(link._node)
+                self.assertFalse(link.pruned)
+            pn.update(self.items[40:])
+            self.assertEqual(pn.commit(), memory.from_sorted_items(self.items).hash)
+            pn.close()
+            pn = disk.open(filename, cache_size=4)
+            self.assertEqual(pn.items(), self.items)
+            self.assertEqual(pn.length, len(self.items))
+            self.assertTrue(len(pn.store._cache) <= 4)
+            pn.close()
+
+    def test_uncommitted(self):
+        pn = DiskPatriciaAuthTree.open(self.filename)
+        pn.update(self.items)
+        hash_ = pn.commit()
+        del pn[self.items[0][0]]
+        pn[b'xyz'] = b'\x01'
+        pn.flush()
+        self.assertNotEqual(pn.hash, hash_)
+        pn.close()
+        pn = DiskPatriciaAuthTree.open(self.filename)
+        self.assertEqual(pn.hash, hash_)
+        self.assertEqual(pn.items(), self.items)
+        pn.close()
+
+    def test_length(self):
+        # Links to evicted stored nodes are split and squashed, so that the
+        # lengths of reloaded nodes are used.
+        items = [(b'\x00\x00' + six.int2byte(idx), b'\x01') for idx in range(16)]
+        pn = DiskPatriciaAuthTree.open(self.filename, cache_size=1)
+        pn.update(items)
+        pn.commit()
+        pn.close()
+        pn = DiskPatriciaAuthTree.open(self.filename, cache_size=1)
+        pn[b'\x00\x80'] = b'\x02'
+        self.assertEqual(len(pn), 17)
+        pn.commit()
+        pn.close()
+        pn = DiskPatriciaAuthTree.open(self.filename, cache_size=1)
+        self.assertEqual(len(pn), 17)
+        del pn[b'\x00\x80']
+        self.assertEqual(len(pn), 16)
+        pn.commit()
+        pn.close()
+        pn = DiskPatriciaAuthTree.open(self.filename, cache_size=1)
+        self.assertEqual(len(pn), 16)
+        self.assertEqual(pn.items(), items)
+        pn.close()
+
+    def test_followed(self):
+        # Nodes followed but not modified by an update are released to the
+        # store, and the new path is hashed without loading them again.
+        for disk, memory in ((DiskComposableAuthTree, MemoryComposableAuthTree),
+                             (DiskPatriciaAuthTree,   MemoryPatriciaAuthTree)):
+            filename = self.filename + disk.__name__
+            pn = disk.open(filename)
+            pn.update(self.items)
+            pn.commit()
+            pn.close()
+            pn = disk.open(filename, cache_size=1)
+            get, followed = pn.store.get, []
+            def _followed(hash_):
+                node = get(hash_)
+                followed.append(node)
+                return node
+            pn.store.get = _followed
+            # A replaced value, an edge split above an existing key and
+            # between two keys, and a new branch.
+            keys = (self.items[0][0], b'\x03\x03', b'\x09\x09\x08', b'xyz')
+            for key in keys:
+                pn[key] = b'\x02'
+            self.assertTrue(followed)
+            def _get(hash_):
+                raise AssertionError(u"node loaded to compute the hash")
+            pn.store.get = _get
+            held = []
+            def _walk(node):
+                for link in node.children:
+                    if link._node is not None:
+                        held.append(link._node)
+                        _walk(link._node)
+            _walk(pn)
+            self.assertFalse([node for node in held
+                              if any(node is other for other in followed)])
+            items = dict(self.items)
+            items.update((key, b'\x02') for key in keys)
+            self.assertEqual(pn.hash,
+                memory.from_sorted_items(sorted(items.items())).hash)
+            pn.store.get = get
+            self.assertEqual(pn.items(), sorted(items.items()))
+            pn.close()
+
+    def test_modify(self):
+        pn = DiskComposableAuthTree.open(self.filename, cache_size=8)
+        pn.update(self.items)
+        pn.commit()
+        pn.close()
+        pn = DiskComposableAuthTree.open(self.filename, cache_size=8)
+        pn2 = MemoryComposableAuthTree.from_sorted_items(self.items)
+        for tree in (pn, pn2):
+            tree.delete(key for key, value in self.items[::2])
+            tree[b'xyz'] = b'\x01'
+            tree.prune([self.items[1][0]])
+        self.assertEqual(pn.commit(), pn2.hash)
+        pn.close()
+        pn = DiskComposableAuthTree.open(self.filename)
+        self.assertEqual(pn.items(), pn2.items())
+        self.assertEqual(pn.length, pn2.length)
+        self.assertEqual(pn.count, pn2.count)
+        self.assertEqual(pn.serialize(), pn2.serialize())
+        pn.close()
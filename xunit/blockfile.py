@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+# Python standard library, unit-testing
+import os
+import tempfile
+import unittest
+
+from bitcoin.blockfile import *
+from bitcoin.core import LazyTransaction
+from bitcoin.merkle import merkle
+
+# ===----------------------------------------------------------------------===
+
+BLOCK_FILE = os.path.join(os.path.dirname(__file__), 'data', 'blk0001.dat')
+MAGIC = bytes.fromhex('fabfb5da')
+
+TESTNET3_GENESIS_HASH = \
+    0x000000000933ea01ad0ee984209779baaec3ced90fa3f408719526f8d77f4943
+
+class TestBlockFile(unittest.TestCase):
+    "Test reading the testnet sample block file."
+    def test_records(self):
+        blocks = transactions = 0
+        with BlockFile(BLOCK_FILE, magic=MAGIC) as file_:
+            for offset, header, txs in file_:
+                if not blocks:
+                    self.assertEqual(offset, 8)
+                    self.assertEqual(header.hash, TESTNET3_GENESIS_HASH)
+                self.assertTrue(all(isinstance(tx, LazyTransaction) for tx in txs))
+                self.assertEqual(merkle(tx.hash for tx in txs), header.merkle_hash)
+                blocks += 1
+                transactions += len(txs)
+        self.assertEqual(blocks, 733)
+        self.assertEqual(transactions, 1674)
+
+    def test_headers(self):
+        with BlockFile(BLOCK_FILE, magic=MAGIC) as file_:
+            headers = list(file_.headers())
+            self.assertEqual(len(headers), 733)
+            for (_, parent), (_, child) in zip(headers, headers[1:]):
+                self.assertEqual(child.parent_hash, parent.hash)
+            offset, header = headers[100]
+            self.assertEqual(file_.read(offset).header, header)
+            self.assertEqual(file_.read_header(offset), header)
+
+    def test_ranges(self):
+        with BlockFile(BLOCK_FILE, magic=MAGIC) as file_:
+            frames = list(file_.frames())
+            split = frames[300][0] - 8
+            self.assertEqual(list(file_.frames(0, split)), frames[:300])
+            self.assertEqual(list(file_.frames(split)), frames[300:])
+            self.assertEqual([r.offset for r in file_.records(split)],
+                             [offset for offset, _ in frames[300:]])
+
+    def test_transactions_outlive_file(self):
+        with BlockFile(BLOCK_FILE, magic=MAGIC) as file_:
+            record = next(iter(file_))
+        self.assertEqual(record.transactions[0].hash, record.header.merkle_hash)
+
+# ===----------------------------------------------------------------------===
+
+class TestBlockFileFraming(unittest.TestCase):
+    "Test the handling of padding, corruption and truncation."
+    def setUp(self):
+        with open(BLOCK_FILE, 'rb') as file_:
+            self.data = file_.read()
+        self.length = int.from_bytes(self.data[4:8], 'little')
+
+    def _frames(self, data, magic=MAGIC):
+        with tempfile.TemporaryFile() as file_:
+            file_.write(data)
+            file_.flush()
+            with BlockFile(file_, magic=magic) as blocks:
+                return list(blocks.frames())
+
+    def test_empty(self):
+        self.assertEqual(self._frames(b''), [])
+
+    def test_padding(self):
+        first = self.data[:8+self.length]
+        self.assertEqual(self._frames(first + b'\x00' * 1024), [(8, self.length)])
+
+    def test_bad_magic(self):
+        self.assertRaises(ValueError, self._frames, self.data[:16],
+                          magic=bytes.fromhex('f9beb4d9'))
+
+    def test_truncated(self):
+        self.assertRaises(EOFError, self._frames, self.data[:8+self.length-1])
+
+# ===----------------------------------------------------------------------===
+
+def output_value(tx):
+    return sum(output.amount for output in tx.outputs)
+
+class TestBlockScanner(unittest.TestCase):
+    "Test scanning the sample block file in parallel."
+    def setUp(self):
+        with BlockFile(BLOCK_FILE, magic=MAGIC) as file_:
+            self.expected = [
+                (offset, header.hash, [tx.hash for tx in txs],
+                 [output_value(tx) for tx in txs])
+                for offset, header, txs in file_]
+
+    def _scan(self, **kwargs):
+        scanner = BlockScanner(BLOCK_FILE, function=output_value,
+                               magic=MAGIC, **kwargs)
+        records = [(r.offset, r.hash, r.txids, r.values) for r in scanner]
+        self.assertEqual(scanner.blocks, 733)
+        self.assertEqual(scanner.transactions, 1674)
+        return scanner, records
+
+    def test_chunks(self):
+        scanner = BlockScanner(BLOCK_FILE, magic=MAGIC, chunk_size=1<<14)
+        chunks = list(scanner.chunks())
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(chunks[0][1], 0)
+        for (_, _, end), (_, start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, start)
+
+    def test_serial(self):
+        _, records = self._scan(workers=0, chunk_size=1<<14)
+        self.assertEqual(records, self.expected)
+
+    def test_parallel(self):
+        scanner, records = self._scan(workers=2, chunk_size=1<<14, window=2)
+        self.assertEqual(records, self.expected)
+        self.assertTrue(scanner.blocks_per_second > 0)
+
+    def test_chain_order(self):
+        # Blocks out of order across two files, one written twice, and a
+        # block forking from the best chain are yielded in chain order.
+        with BlockFile(BLOCK_FILE, magic=MAGIC) as file_:
+            blocks = [bytes(file_.buffer[offset:offset+length])
+                      for offset, length in file_.frames()]
+        stale = blocks[2][:76] + b'\xff\xff\xff\xff' + b'\x00'
+        first = blocks[:5] + blocks[6:21] + [blocks[5], stale] + blocks[40:100]
+        second = blocks[21:40] + blocks[100:] + [blocks[3]]
+        directory = tempfile.mkdtemp()
+        paths = [os.path.join(directory, name) for name in ('blk0.dat', 'blk1.dat')]
+        try:
+            for path, contents in zip(paths, (first, second)):
+                with open(path, 'wb') as file_:
+                    for block in contents:
+                        file_.write(MAGIC + len(block).to_bytes(4, 'little') + block)
+            expected = [hash_ for _, hash_, _, _ in self.expected]
+            for workers in (0, 2):
+                scanner = BlockScanner(paths, magic=MAGIC, workers=workers,
+                                       chunk_size=1<<12)
+                self.assertEqual([record.hash for record in scanner], expected)
+                self.assertEqual(scanner.stale, 1)
+            scanner = BlockScanner(paths, magic=MAGIC, workers=0, ordered=False)
+            self.assertEqual(len(list(scanner)), len(blocks) + 2)
+        finally:
+            for path in paths:
+                os.remove(path)
+            os.rmdir(directory)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, BlockScanner, BLOCK_FILE, chunk_size=0)
+        self.assertRaises(ValueError, BlockScanner, BLOCK_FILE, window=0)
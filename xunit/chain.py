@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+# Python standard library, unit-testing
+import os
+import unittest
+
+import bitcoin.chain
+from bitcoin.blockfile import BlockFile
+from bitcoin.chain import *
+from bitcoin.core import Block, ConnectedBlockInfo
+from bitcoin.tools import target_from_compact
+
+# ===----------------------------------------------------------------------===
+
+BLOCK_FILE = os.path.join(os.path.dirname(__file__), 'data', 'blk0001.dat')
+MAGIC = bytes.fromhex('fabfb5da')
+
+def load_headers():
+    with BlockFile(BLOCK_FILE, magic=MAGIC) as file_:
+        return [header for _, header in file_.headers()]
+
+class TestHeaderChain(unittest.TestCase):
+    "Test indexing the headers of the testnet sample block file."
+    def setUp(self):
+        self.headers = load_headers()
+        self.chain = HeaderChain(self.headers)
+
+    def test_lookup(self):
+        chain = self.chain
+        self.assertEqual(len(chain), 733)
+        self.assertEqual(chain.tip, 732)
+        self.assertEqual(chain.tip_height, 732)
+        for height in (0, 1, 100, 732):
+            header = self.headers[height]
+            index = chain.at_height(height)
+            self.assertEqual(index, height)
+            self.assertEqual(chain.index(header.hash), index)
+            self.assertEqual(chain.hash(index), header.hash)
+            self.assertEqual(chain.header(index), header)
+            self.assertEqual(chain.raw(index), header.serialize())
+        self.assertEqual(chain.header(-1), self.headers[-1])
+        self.assertFalse(0 in chain)
+        self.assertRaises(KeyError, chain.index, 0)
+        self.assertRaises(IndexError, chain.at_height, 733)
+        self.assertRaises(IndexError, chain.raw, 733)
+
+    def test_work(self):
+        chain, work = self.chain, 0
+        for height, header in enumerate(self.headers):
+            work += header.work
+            self.assertEqual(chain.aggregate_work(height), work)
+        self.assertEqual(chain.tip_work, work)
+        self.assertEqual(chain.info(0), ConnectedBlockInfo(None, 0, self.headers[0].work))
+        self.assertEqual(chain.info(5), ConnectedBlockInfo(4, 5, chain.aggregate_work(5)))
+
+    def test_duplicate(self):
+        self.assertEqual(self.chain.append(self.headers[10]), 10)
+        self.assertEqual(len(self.chain), 733)
+
+    def test_orphan(self):
+        chain = HeaderChain(self.headers[:1])
+        self.assertRaises(ValueError, chain.append, self.headers[2])
+        self.assertRaises(ValueError, chain.append, b'\x00' * 79)
+
+# ===----------------------------------------------------------------------===
+
+def branch(parent, count, bits, nonce=0):
+    "Returns count headers extending parent with the given difficulty."
+    headers = []
+    for idx in range(count):
+        parent = Block(parent_hash=parent.hash, bits=bits, nonce=nonce, time=idx)
+        headers.append(parent)
+    return headers
+
+class TestHeaderChainReorg(unittest.TestCase):
+    "Test best-tip selection between competing branches."
+    def test_reorg(self):
+        genesis = Block(bits=0x207fffff)
+        easy = branch(genesis, 10, 0x207fffff, nonce=1)
+        hard = branch(genesis, 4, 0x202aaaaa, nonce=2)
+        chain = HeaderChain([genesis] + easy)
+        self.assertEqual(chain.tip_height, 10)
+        chain.extend(hard[:1])
+        self.assertEqual(chain.tip_height, 10)
+        chain.extend(hard[1:])
+        self.assertEqual(chain.tip_height, 4)
+        self.assertEqual(chain.tip, chain.index(hard[-1].hash))
+        for height, header in enumerate(hard, 1):
+            self.assertEqual(chain.at_height(height), chain.index(header.hash))
+        self.assertFalse(chain.in_best_chain(chain.index(easy[0].hash)))
+        self.assertTrue(chain.in_best_chain(0))
+        # Extending the old branch past the new one reorganizes back.
+        chain.extend(branch(easy[-1], 1000, 0x207fffff, nonce=1))
+        self.assertEqual(chain.tip_height, 1010)
+        self.assertEqual(chain.at_height(1), chain.index(easy[0].hash))
+        self.assertEqual(len(chain), 1015)
+
+    def test_tie(self):
+        genesis = Block(bits=0x207fffff)
+        first = branch(genesis, 3, 0x207fffff, nonce=1)
+        second = branch(genesis, 3, 0x207fffff, nonce=2)
+        chain = HeaderChain([genesis] + first + second)
+        self.assertEqual(chain.tip, chain.index(first[-1].hash))
+
+# ===----------------------------------------------------------------------===
+
+class TestHeaderChainAncestors(unittest.TestCase):
+    "Test ancestor, last common ancestor and locator lookups."
+    def setUp(self):
+        genesis = Block(bits=0x207fffff)
+        self.trunk = [genesis] + branch(genesis, 600, 0x207fffff, nonce=1)
+        self.fork = branch(self.trunk[300], 200, 0x207fffff, nonce=2)
+        self.twig = branch(self.fork[50], 30, 0x207fffff, nonce=3)
+        self.chain = HeaderChain(self.trunk + self.fork + self.twig)
+
+    def _walk(self, index, height):
+        chain = self.chain
+        while chain.height(index) > height:
+            index = chain.parent(index)
+        return index
+
+    def test_ancestor(self):
+        chain = self.chain
+        for header in (self.trunk[-1], self.fork[-1], self.twig[-1], self.twig[0]):
+            index = chain.index(header.hash)
+            for height in range(chain.height(index) + 1):
+                self.assertEqual(chain.ancestor(index, height),
+                                 self._walk(index, height))
+            self.assertEqual(chain.ancestor(index, chain.height(index) + 1), None)
+
+    def test_last_common_ancestor(self):
+        chain = self.chain
+        index = lambda header: chain.index(header.hash)
+        for first, second, common in (
+                (self.trunk[-1], self.fork[-1], self.trunk[300]),
+                (self.fork[-1], self.twig[-1], self.fork[50]),
+                (self.twig[5], self.trunk[400], self.trunk[300]),
+                (self.fork[10], self.fork[100], self.fork[10]),
+                (self.trunk[0], self.twig[-1], self.trunk[0])):
+            self.assertEqual(chain.last_common_ancestor(index(first), index(second)),
+                             index(common))
+            self.assertEqual(chain.last_common_ancestor(index(second), index(first)),
+                             index(common))
+
+    def test_locator(self):
+        chain = self.chain
+        locator = chain.locator()
+        self.assertEqual(locator[:12], [h.hash for h in self.trunk[:-13:-1]])
+        self.assertEqual(locator[12], self.trunk[587].hash)
+        self.assertEqual(locator[13], self.trunk[583].hash)
+        self.assertEqual(locator[-1], self.trunk[0].hash)
+        tip = chain.index(self.twig[-1].hash)
+        twig = [chain.index(hash_) for hash_ in chain.locator(tip)]
+        self.assertEqual(twig[0], tip)
+        self.assertEqual(twig[-1], 0)
+        heights = [chain.height(index) for index in twig]
+        self.assertEqual(heights[:12], list(range(381, 369, -1)))
+        self.assertEqual(heights[12:14], [368, 364])
+        for index, height in zip(twig, heights):
+            self.assertEqual(chain.ancestor(tip, height), index)
+        self.assertEqual(HeaderChain().locator(), [])
+
+# ===----------------------------------------------------------------------===
+
+class TestCheckProofOfWork(unittest.TestCase):
+    "Test checking the proof-of-work of a batch of serialized headers."
+    def setUp(self):
+        self.headers = load_headers()
+        data = bytearray(b''.join(h.serialize() for h in self.headers))
+        # Spoil the nonce of every hundredth header and the bits of another.
+        for idx in range(0, len(self.headers), 100):
+            data[80*idx+76] ^= 0xff
+        data[80*5+72:80*5+76] = (0x1d80ffff).to_bytes(4, 'little')
+        self.data = bytes(data)
+        self.invalid = set(range(0, len(self.headers), 100)) | set([5])
+
+    def _check(self, backend):
+        numpy = bitcoin.chain.numpy
+        try:
+            bitcoin.chain.numpy = backend
+            mask, work = check_proof_of_work(self.data,
+                maximum_target=target_from_compact(0x1d00ffff))
+        finally:
+            bitcoin.chain.numpy = numpy
+        self.assertEqual([idx for idx, ok in enumerate(mask) if not ok],
+                         sorted(self.invalid))
+        self.assertEqual(work[1:5], [h.work for h in self.headers[1:5]])
+        self.assertEqual(work[5], 0)
+        self.assertEqual(len(work), len(self.headers))
+
+    def test_python(self):
+        self._check(None)
+
+    @unittest.skipIf(bitcoin.chain.numpy is None, "NumPy is not installed")
+    def test_numpy(self):
+        self._check(bitcoin.chain.numpy)
+
+    def test_maximum_target(self):
+        mask, work = check_proof_of_work(self.data[80:160],
+            maximum_target=target_from_compact(0x1c00ffff))
+        self.assertFalse(mask[0])
+        mask, work = check_proof_of_work(self.data[80:160])
+        self.assertTrue(mask[0])
+
+    def test_empty(self):
+        mask, work = check_proof_of_work(b'')
+        self.assertEqual((len(mask), work), (0, []))
+        self.assertRaises(ValueError, check_proof_of_work, b'\x00' * 81)
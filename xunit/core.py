@@ -4,6 +4,211 @@
 # file LICENSE or http://www.opensource.org/licenses/mit-license.php.
 
 # Python standard library, unit-testing
+import os
 import unittest
 
 from bitcoin.core import *
+from bitcoin.defaults import CHAIN_PARAMETERS
+from bitcoin.serialize import (
+    BufferReader, BufferWriter, LittleCompactSize, deserialize_iterator,
+    serialize_iterator)
+from bitcoin.tools import BytesIO
+
+# ===----------------------------------------------------------------------===
+
+GENESIS = CHAIN_PARAMETERS['bitcoin.org'].genesis
+
+class TestBlockDeserialization(unittest.TestCase):
+    "Test deserialization of the genesis block from readers and file objects."
+    def _deserialize(self, file_):
+        block = Block.deserialize(file_)
+        transactions = list(deserialize_iterator(file_, Transaction.deserialize))
+        return block, transactions
+
+    def test_genesis(self):
+        reader = BufferReader(GENESIS)
+        block, transactions = self._deserialize(reader)
+        self.assertEqual(reader.remaining, 0)
+        self.assertEqual(block.hash,
+            0x000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f)
+        self.assertEqual(block.merkle_hash,
+            0x4a5e1e4baab89f3a32518a88c31bc87f618f76673e2cc77ab2127b7afdeda33b)
+        self.assertEqual(len(transactions), 1)
+        self.assertTrue(transactions[0].is_coinbase)
+        self.assertEqual(len(transactions[0].outputs), 1)
+        self.assertEqual(transactions[0].outputs[0].amount, 50*100000000)
+
+    def test_reader_matches_file(self):
+        self.assertEqual(
+            self._deserialize(BufferReader(GENESIS)),
+            self._deserialize(BytesIO(GENESIS)))
+
+class TestBlockSerialization(unittest.TestCase):
+    "Test that serialize() and serialize_into() reproduce the genesis block."
+    def setUp(self):
+        reader = BufferReader(GENESIS)
+        self.block = Block.deserialize(reader)
+        self.transactions = list(deserialize_iterator(reader, Transaction.deserialize))
+
+    def test_serialize(self):
+        result = self.block.serialize() + serialize_iterator(self.transactions)
+        self.assertEqual(result, GENESIS)
+
+    def test_serialized_size(self):
+        self.assertEqual(self.block.serialized_size(), 80)
+        tx = self.transactions[0]
+        self.assertEqual(tx.serialized_size(), len(GENESIS) - 81)
+        self.assertEqual(tx.serialized_size(), len(tx.serialize()))
+
+    def test_serialize_into(self):
+        writer = BufferWriter(bytearray(len(GENESIS)))
+        self.block.serialize_into(writer)
+        writer.write_compact_size(len(self.transactions))
+        for tx in self.transactions:
+            tx.serialize_into(writer)
+        self.assertEqual(writer.tell(), len(GENESIS))
+        self.assertEqual(bytes(writer.buffer), GENESIS)
+        file_ = BytesIO()
+        self.transactions[0].serialize_into(file_)
+        self.assertEqual(file_.getvalue(), GENESIS[81:])
+
+class TestSlots(unittest.TestCase):
+    "Test that the core classes carry no per-instance __dict__."
+    def test_no_dict(self):
+        tx = Transaction(inputs=[Input()], outputs=[Output()])
+        for obj in (tx, tx.inputs[0], tx.outputs[0], tx.outputs[0].contract,
+                    Block(), LazyTransaction(GENESIS[81:])):
+            self.assertFalse(hasattr(obj, '__dict__'), type(obj).__name__)
+
+    def test_hash_cache(self):
+        block = Block.deserialize(BufferReader(GENESIS))
+        hash_ = block.hash
+        self.assertEqual(block._hash, hash_)
+        del block.hash
+        self.assertIs(block._hash, None)
+        self.assertEqual(block.hash, hash_)
+
+class TestTrackedAttributes(unittest.TestCase):
+    "Test that cached hashes and serializations are invalidated on change."
+    def setUp(self):
+        self.block = Block.deserialize(BufferReader(GENESIS[:80]))
+        self.tx = Transaction.deserialize(BufferReader(GENESIS[81:]))
+
+    def test_block(self):
+        hash_ = self.block.hash
+        self.assertIs(self.block.serialize(), self.block.serialize())
+        self.block.nonce += 1
+        self.assertIs(self.block._serialized, None)
+        self.assertNotEqual(self.block.hash, hash_)
+        self.block.nonce -= 1
+        self.assertEqual(self.block.hash, hash_)
+
+    def test_transaction(self):
+        hash_ = self.tx.hash
+        self.tx.lock_time = 1
+        self.assertIs(self.tx._hash, None)
+        self.assertNotEqual(self.tx.hash, hash_)
+        self.tx.lock_time = 0
+        self.assertEqual(self.tx.hash, hash_)
+
+    def test_output_propagation(self):
+        hash_, serialized = self.tx.hash, self.tx.serialize()
+        self.tx.outputs[0].amount = 1
+        self.assertIs(self.tx._hash, None)
+        self.assertIs(self.tx._serialized, None)
+        self.assertNotEqual(self.tx.serialize(), serialized)
+        self.tx.outputs[0].amount = 50*100000000
+        self.assertEqual(self.tx.hash, hash_)
+
+    def test_list_mutation(self):
+        hash_ = self.tx.hash
+        input = Input(hash=1, index=0)
+        self.tx.inputs.append(input)
+        self.assertNotEqual(self.tx.hash, hash_)
+        self.assertIs(input._owner, self.tx)
+        del self.tx.inputs[1]
+        self.assertEqual(self.tx.hash, hash_)
+        self.tx.outputs[0:1] = [Output(1)]
+        self.assertIs(self.tx.outputs[0]._owner, self.tx)
+        self.assertNotEqual(self.tx.hash, hash_)
+
+    def test_lazy_transaction(self):
+        lazy = LazyTransaction(GENESIS[81:])
+        self.assertEqual(lazy.hash, self.tx.hash)
+        lazy.outputs[0].amount = 1
+        self.tx.outputs[0].amount = 1
+        self.assertIs(lazy._raw, None)
+        self.assertEqual(lazy.serialize(), self.tx.serialize())
+        self.assertEqual(lazy.hash, self.tx.hash)
+        lazy = LazyTransaction(GENESIS[81:])
+        lazy.lock_time = 1
+        tx = Transaction.deserialize(BufferReader(GENESIS[81:]))
+        tx.lock_time = 1
+        self.assertEqual(lazy.input_count, 1)
+        self.assertEqual(lazy.hash, tx.hash)
+
+# ===----------------------------------------------------------------------===
+
+BLOCK_FILE = os.path.join(os.path.dirname(__file__), 'data', 'blk0001.dat')
+
+def _block_file_transactions(cls, limit=200):
+    "The first transactions of the testnet block file, as (raw, tx) pairs."
+    with open(BLOCK_FILE, 'rb') as file_:
+        data = file_.read()
+    reader, result = BufferReader(data), []
+    while reader.remaining and len(result) < limit:
+        reader.skip(8) # network magic and record length
+        Block.deserialize(reader)
+        for _ in range(reader.read_compact_size()):
+            start = reader.tell()
+            tx = cls.deserialize(reader)
+            result.append((data[start:reader.tell()], tx))
+    return result
+
+class TestLazyTransaction(unittest.TestCase):
+    "Test that LazyTransaction is indistinguishable from Transaction on read."
+    def test_genesis(self):
+        raw = GENESIS[81:]
+        lazy = LazyTransaction(raw)
+        tx = Transaction.deserialize(BytesIO(raw))
+        self.assertEqual(lazy.hash, tx.hash)
+        self.assertTrue(lazy.is_coinbase)
+        self.assertEqual(lazy.input_count, 1)
+        self.assertEqual(lazy.output_count, 1)
+        self.assertEqual(lazy.output(0), tx.outputs[0])
+        self.assertEqual(lazy, tx)
+        self.assertRaises(ValueError, LazyTransaction, raw + b'\x00')
+
+    def test_block_file(self):
+        pairs = _block_file_transactions(LazyTransaction)
+        self.assertEqual(len(pairs), 200)
+        for raw, lazy in pairs:
+            tx = Transaction.deserialize(BufferReader(raw))
+            self.assertIs(lazy.serialize(), lazy._raw)
+            self.assertEqual(lazy.serialize(), raw)
+            self.assertEqual(lazy.serialized_size(), len(raw))
+            self.assertEqual(lazy.hash, tx.hash)
+            self.assertEqual(lazy.is_coinbase, tx.is_coinbase)
+            self.assertEqual(lazy.lock_time, tx.lock_time)
+            self.assertEqual(lazy.input(lazy.input_count-1), tx.inputs[-1])
+            self.assertEqual(lazy.output(lazy.output_count-1), tx.outputs[-1])
+            self.assertEqual(lazy, tx)
+
+    def test_file_object(self):
+        raw = GENESIS[81:]
+        file_ = BytesIO(raw + b'\x01')
+        lazy = LazyTransaction.deserialize(file_)
+        self.assertEqual(lazy.serialize(), raw)
+        self.assertEqual(file_.read(), b'\x01')
+
+class TestTransactionHashes(unittest.TestCase):
+    "Test computing and caching the hashes of many transactions at once."
+    def test_block_file(self):
+        pairs = _block_file_transactions(LazyTransaction)
+        expected = [Transaction.deserialize(BufferReader(raw)).hash
+                    for raw, _ in pairs]
+        transactions = [tx for _, tx in pairs]
+        self.assertEqual(transactions[0].hash, expected[0])
+        self.assertEqual(transaction_hashes(transactions, workers=2), expected)
+        self.assertEqual([tx._hash for tx in transactions], expected)
+        self.assertEqual(transaction_hashes([]), [])
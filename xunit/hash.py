@@ -8,6 +8,7 @@ import six
 
 # Python standard library, unit-testing
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 # Scenario unit-testing
 from scenariotest import ScenarioMeta, ScenarioTest
@@ -53,3 +54,82 @@ class TestHash256(unittest.TestCase):
         scenarios = HASH256
         def __test__(self, data, hash_):
             self.assertEqual(hash256(data).intdigest(), hash_)
+
+class TestHashCopy(unittest.TestCase):
+    "Test that copies of a hash object continue independently."
+    def test_copy(self):
+        hobj = hash256(b'a')
+        other = hobj.copy()
+        other.update(b'bc')
+        self.assertEqual(hobj.intdigest(), hash256(b'a').intdigest())
+        self.assertEqual(other.intdigest(), HASH256[1]['hash_'])
+        # Copying a finalized object copies its digest too.
+        again = hobj.copy()
+        self.assertEqual(again.digest(), hobj.digest())
+        again.update(b'bc')
+        self.assertEqual(again.intdigest(), HASH256[1]['hash_'])
+
+class TestDirectHashFunctions(unittest.TestCase):
+    "Test the direct hash functions against the chained hash objects."
+    def test_hash160(self):
+        for scenario in HASH160:
+            data = scenario['data']
+            self.assertEqual(hash160_bytes(data), hash160(data).digest())
+            self.assertEqual(hash160.digest_of(data), hash160(data).digest())
+            self.assertEqual(hash160.intdigest_of(data), scenario['hash_'])
+
+    def test_hash256(self):
+        for scenario in HASH256:
+            data = scenario['data']
+            self.assertEqual(hash256_bytes(data), hash256(data).digest())
+            self.assertEqual(hash256_int(data), scenario['hash_'])
+            self.assertEqual(hash256.intdigest_of(data), scenario['hash_'])
+            self.assertEqual(hash256.intdigest_of(bytearray(data)), scenario['hash_'])
+
+class TestHashInterface(unittest.TestCase):
+    "Test that every hash interface has digest_of() and intdigest_of()."
+    def test_generic(self):
+        from bitcoin.hash import _HashAlgorithmInterface
+        for names in (('sha256',), ('sha256', 'sha256'), ('sha256', 'ripemd160')):
+            algorithm = _HashAlgorithmInterface(names)
+            for data in (b'', b'abc', b'\x00' * 100):
+                digest = algorithm(data).digest()
+                self.assertEqual(algorithm.digest_of(data), digest)
+                self.assertEqual(algorithm.intdigest_of(data),
+                                 int.from_bytes(digest, 'little'))
+
+    def test_pickle(self):
+        import pickle
+        for algorithm in (hash160, hash256):
+            other = pickle.loads(pickle.dumps(algorithm))
+            self.assertIs(other.__class__, algorithm.__class__)
+            self.assertEqual(other.digest_of(b'abc'), algorithm.digest_of(b'abc'))
+
+class TestHashMany(unittest.TestCase):
+    "Test hashing many strings at once, serially and concurrently."
+    def _check(self, algorithm, strings):
+        expected = [algorithm(string).digest() for string in strings]
+        for workers in (None, 1, 3):
+            self.assertEqual(algorithm.many(strings, workers), expected)
+            self.assertEqual(algorithm.many(iter(strings), workers, intdigest=True),
+                             [int.from_bytes(d, 'little') for d in expected])
+
+    def test_small(self):
+        # Hashed by a process pool.
+        self._check(hash256, [bytes([idx]) * idx for idx in range(100)])
+        self._check(hash160, [memoryview(bytes([idx]) * idx) for idx in range(100)])
+
+    def test_large(self):
+        # Hashed by a thread pool.
+        self._check(hash256, [bytes([idx]) * 4096 for idx in range(20)])
+
+    def test_executor(self):
+        strings = [bytes([idx]) * idx for idx in range(100)]
+        with ThreadPoolExecutor(2) as executor:
+            self.assertEqual(hash256.many(strings, executor),
+                             [hash256_bytes(string) for string in strings])
+            self.assertEqual(hash256.many(strings, (executor, 2)),
+                             [hash256_bytes(string) for string in strings])
+
+    def test_empty(self):
+        self.assertEqual(hash256.many([], 4), [])
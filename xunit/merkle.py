@@ -8,12 +8,15 @@ from six.moves import xrange
 # Python standard library, unit-testing
 import unittest
 
+from concurrent.futures import ThreadPoolExecutor
+
 # Scenario unit-testing
 from scenariotest import ScenarioMeta, ScenarioTest
 
 # Python bitcoin, iterator compare
-from bitcoin.tools import icmp
+from bitcoin.tools import BytesIO, icmp
 
+from bitcoin.hash import hash256_int
 from bitcoin.merkle import *
 
 # ===----------------------------------------------------------------------===
@@ -413,3 +416,256 @@ class TestMerkleList(unittest.TestCase):
         scenarios = MERKLE
         def __test__(self, list_, root):
             self.assertEqual(MerkleList(list_).hash, root)
+
+# ===----------------------------------------------------------------------===
+
+class TestMerkleWorkers(unittest.TestCase):
+    "Test that hashing levels concurrently gives the same roots."
+    def test_merkle(self):
+        for scenario in MERKLE + NESTED_MERKLE:
+            for workers in (1, 2):
+                self.assertEqual(merkle(scenario['list_'], workers=workers),
+                                 scenario['root'])
+
+    def test_large(self):
+        hashes = [hash256_int(bytes([idx % 256, idx // 256])) for idx in range(1001)]
+        self.assertEqual(merkle(hashes, workers=3), merkle(hashes))
+
+    def test_executor(self):
+        hashes = [hash256_int(bytes([idx % 256, idx // 256])) for idx in range(1001)]
+        with ThreadPoolExecutor(2) as executor:
+            self.assertEqual(merkle(hashes, workers=executor), merkle(hashes))
+            self.assertEqual(merkle(hashes[:77], workers=executor),
+                             merkle(hashes[:77]))
+
+class TestMerkleDigest(unittest.TestCase):
+    "Test the flat-buffer Merkle root computation."
+    def test_merkle_root(self):
+        for scenario in MERKLE + NESTED_MERKLE:
+            self.assertEqual(merkle_root(scenario['list_']), scenario['root'])
+        for scenario in MERKLE:
+            self.assertEqual(MerkleList(scenario['list_']).hash, scenario['root'])
+
+    def test_merkle_digest(self):
+        for count in range(1, 20):
+            hashes = [hash256_int(bytes([idx])) for idx in range(count)]
+            digests = b''.join(h.to_bytes(32, 'little') for h in hashes)
+            root = merkle_digest(bytearray(digests))
+            self.assertEqual(int.from_bytes(root, 'little'),
+                             merkle(hashes, workers=1))
+            self.assertEqual(MerkleList(hashes).hash, merkle_root(hashes))
+        self.assertEqual(merkle_digest(b''), b'\x00' * 32)
+        self.assertRaises(ValueError, merkle_digest, b'\x00' * 33)
+
+class TestMerkleAccumulator(unittest.TestCase):
+    "Test incremental root computation against merkle()."
+    def test_append(self):
+        for cache in (False, True):
+            hashes, accumulator = [], MerkleAccumulator(cache=cache)
+            self.assertEqual(accumulator.root(), 0)
+            for idx in range(40):
+                hashes.append(hash256_int(bytes([idx])))
+                accumulator.append(hashes[-1])
+                self.assertEqual(len(accumulator), len(hashes))
+                self.assertEqual(accumulator.root(), merkle(hashes))
+                self.assertEqual(accumulator.hash, merkle_root(hashes))
+
+    def test_scenarios(self):
+        for scenario in MERKLE:
+            accumulator = MerkleAccumulator(scenario['list_'])
+            self.assertEqual(accumulator.root(), scenario['root'])
+
+    def test_update(self):
+        hashes = [hash256_int(bytes([idx])) for idx in range(13)]
+        accumulator = MerkleAccumulator(hashes, cache=True)
+        for idx in list(range(13)) + [-1]:
+            hashes[idx] = hash256_int(bytes([idx % 256, 1]))
+            accumulator.update(idx, hashes[idx])
+            self.assertEqual(accumulator.root(), merkle(hashes))
+        accumulator.append(hashes[0])
+        self.assertEqual(accumulator.root(), merkle(hashes + hashes[:1]))
+        self.assertRaises(IndexError, accumulator.update, 14, 0)
+        self.assertRaises(ValueError, MerkleAccumulator(hashes).update, 0, 0)
+
+class TestMerkleProof(unittest.TestCase):
+    "Test BIP 37 partial Merkle tree extraction, serialization and checking."
+    def test_serialize(self):
+        hashes = [hash256_int(bytes([idx])) for idx in range(3)]
+        proof = MerkleList(hashes).proof([1])
+        self.assertEqual(proof.size, 3)
+        self.assertEqual(proof.flags, [True, True, False, True, False])
+        self.assertEqual(proof.hashes,
+                         [hashes[0], hashes[1], merkle(hashes[2:] * 2)])
+        serialized = proof.serialize()
+        self.assertEqual(serialized,
+            b'\x03\x00\x00\x00' + b'\x03' +
+            b''.join(h.to_bytes(32, 'little') for h in proof.hashes) +
+            b'\x01\x0b')
+        self.assertEqual(proof.serialized_size(), len(serialized))
+        other = MerkleProof.deserialize(BytesIO(serialized))
+        self.assertEqual(other.flags, proof.flags)
+        self.assertEqual(other, proof)
+        self.assertEqual(other.verify(merkle(hashes)), [(1, hashes[1])])
+
+    def test_from_hashes(self):
+        for count in (1, 2, 3, 5, 8, 13, 40):
+            hashes = [hash256_int(bytes([idx])) for idx in range(count)]
+            root = merkle(hashes)
+            for indices in ([], [0], [count-1], list(range(0, count, 3)),
+                            list(range(count))):
+                proof = MerkleProof.from_hashes(hashes, indices)
+                matches = [(idx, hashes[idx]) for idx in sorted(set(indices))]
+                self.assertEqual(proof.hash, root)
+                self.assertEqual(proof.verify(root), matches)
+                other = MerkleProof.deserialize(BytesIO(proof.serialize()))
+                self.assertEqual(other, proof)
+                self.assertEqual(other.extract(), (root, matches))
+        self.assertRaises(IndexError, MerkleProof.from_hashes, hashes, [count])
+        self.assertRaises(ValueError, MerkleProof.from_hashes, [], [])
+
+    def test_invalid(self):
+        hashes = [hash256_int(bytes([idx])) for idx in range(5)]
+        proof = MerkleProof.from_hashes(hashes, [2])
+        self.assertRaises(ValueError, proof.verify, merkle(hashes[:4]))
+        for size, hashes_, flags in [
+                (0, [], []),
+                (proof.size, proof.hashes[:-1], proof.flags),
+                (proof.size, proof.hashes + [0], proof.flags),
+                (proof.size, proof.hashes, proof.flags[:-1]),
+                (proof.size, proof.hashes, proof.flags + [False]*8)]:
+            self.assertRaises(ValueError, MerkleProof(size, hashes_, flags).extract)
+        # A whole byte of unused flags survives deserialization.
+        padded = MerkleProof(proof.size, proof.hashes, proof.flags + [False]*8)
+        self.assertRaises(ValueError,
+            MerkleProof.deserialize(BytesIO(padded.serialize())).extract)
+        # CVE-2012-2459: duplicating the last hash yields the same root, but
+        # the proof must be rejected.
+        duplicated = MerkleProof.from_hashes(hashes + hashes[4:], [4, 5])
+        self.assertEqual(duplicated.size, 6)
+        self.assertRaises(ValueError, duplicated.extract)
+
+class TestMerkleListSerialize(unittest.TestCase):
+    "Test the serialization of a MerkleList as its list of hashes."
+    def test_serialize(self):
+        for count in (0, 1, 2, 7):
+            hashes = [hash256_int(bytes([idx])) for idx in range(count)]
+            list_ = MerkleList(hashes)
+            serialized = list_.serialize()
+            self.assertEqual(len(serialized), 1 + 32*count)
+            self.assertEqual(list_.serialized_size(), len(serialized))
+            other = MerkleList.deserialize(BytesIO(serialized))
+            self.assertEqual(list(other), hashes)
+            self.assertEqual(other.hash, merkle(hashes))
+
+class TestFlatMerkleList(unittest.TestCase):
+    "Test the array-backed MerkleList against the MerkleNode tree."
+    def test_scenarios(self):
+        for scenario in MERKLE:
+            list_ = FlatMerkleList(scenario['list_'])
+            self.assertEqual(list_.hash, scenario['root'])
+            self.assertEqual(list(list_), list(MerkleList(scenario['list_'])))
+
+    def test_access(self):
+        for count in (1, 2, 3, 6, 13):
+            hashes = [hash256_int(bytes([idx])) for idx in range(count)]
+            list_ = FlatMerkleList(hashes)
+            self.assertEqual(len(list_), count)
+            self.assertEqual([list_[idx] for idx in range(count)], hashes)
+            self.assertEqual(list_[-1], hashes[-1])
+            self.assertEqual(list_.node(len(list_._levels)-1, 0), merkle(hashes))
+            self.assertEqual(list(list_.iteritems()), list(enumerate(hashes)))
+            self.assertRaises(IndexError, list_.__getitem__, count)
+            self.assertEqual(list_.proof([count-1]).serialize(),
+                             MerkleList(hashes).proof([count-1]).serialize())
+
+    def test_prune(self):
+        hashes = [hash256_int(bytes([idx])) for idx in range(11)]
+        list_ = FlatMerkleList(hashes)
+        list_.prune([0, 3, 3, -1])
+        self.assertEqual(len(list_), 8)
+        self.assertEqual(list_.size, 11)
+        self.assertTrue(list_.is_pruned(10))
+        self.assertEqual(list(list_), [h for idx, h in enumerate(hashes)
+                                       if idx not in (0, 3, 10)])
+        self.assertEqual(list_.hash, merkle(hashes))
+        self.assertRaises(IndexError, list_.__getitem__, 3)
+        self.assertRaises(IndexError, list_.node, 0, 3)
+        self.assertEqual(list_.node(0, 4), hashes[4])
+        self.assertRaises(IndexError, list_.proof, [0])
+        # The pruned hash 3 is still the sibling in the proof of hash 2.
+        self.assertEqual(list_.proof([2]).verify(merkle(hashes)), [(2, hashes[2])])
+        self.assertEqual(list_.proof([1, 2]).verify(merkle(hashes)),
+                         [(1, hashes[1]), (2, hashes[2])])
+        self.assertRaises(ValueError, list_.serialize)
+
+    def test_serialize(self):
+        hashes = [hash256_int(bytes([idx])) for idx in range(5)]
+        serialized = FlatMerkleList(hashes).serialize()
+        self.assertEqual(serialized, MerkleList(hashes).serialize())
+        other = FlatMerkleList.deserialize(BytesIO(serialized))
+        self.assertEqual(list(other), hashes)
+        self.assertEqual(FlatMerkleList().hash, 0)
+
+    def test_empty(self):
+        list_ = FlatMerkleList([])
+        self.assertEqual(len(list_), 0)
+        self.assertEqual(list(list_), [])
+        self.assertRaises(ValueError, list_.proof, [])
+        self.assertRaises(ValueError, MerkleList([]).proof, [])
+
+try:
+    from bitcoin import sha256 as _sha256
+except ImportError:
+    _sha256 = None
+
+class TestMerkleBackends(unittest.TestCase):
+    "Test level and branch computation with each pair-hashing backend."
+    backends = [None, 'hashlib'] + (_sha256 is not None and ['numpy'] or [])
+
+    def test_merkle_digest(self):
+        for backend in self.backends:
+            for scenario in MERKLE:
+                hashes = scenario['list_']
+                digests = b''.join(h.to_bytes(32, 'little') for h in hashes)
+                root = merkle_digest(digests, backend=backend)
+                self.assertEqual(int.from_bytes(root, 'little'), scenario['root'])
+
+    def test_merkle_levels(self):
+        for backend in self.backends:
+            for count in range(1, 12):
+                hashes = [hash256_int(bytes([idx])) for idx in range(count)]
+                digests = b''.join(h.to_bytes(32, 'little') for h in hashes)
+                levels = merkle_levels(digests, backend=backend)
+                self.assertEqual(levels[0], digests)
+                self.assertEqual(len(levels[-1]), 32)
+                self.assertEqual(int.from_bytes(levels[-1], 'little'), merkle(hashes))
+                indices = list(range(count))
+                branches = [merkle_branch(levels, idx) for idx in indices]
+                self.assertEqual(
+                    merkle_branch_roots(hashes, indices, branches, backend=backend),
+                    [merkle(hashes)] * count)
+
+    def test_merkle_branch(self):
+        hashes = [hash256_int(bytes([idx])) for idx in range(3)]
+        digests = b''.join(h.to_bytes(32, 'little') for h in hashes)
+        levels = merkle_levels(digests)
+        self.assertEqual(merkle_branch(levels, 0), [hashes[1], merkle(hashes[2:] * 2)])
+        self.assertEqual(merkle_branch(levels, 2), [hashes[2], merkle(hashes[:2])])
+        self.assertRaises(IndexError, merkle_branch, levels, 3)
+        self.assertEqual(merkle_branch_roots([], [], []), [])
+        self.assertRaises(ValueError, merkle_branch_roots,
+                          hashes[:2], [0, 2], [[0], [0, 0]])
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, merkle_digest, b'\x00' * 64, backend='md5')
+
+@unittest.skipIf(_sha256 is None, "NumPy is not installed")
+class TestSHA256Kernel(unittest.TestCase):
+    "Test the multi-lane SHA-256 kernel against hashlib."
+    def test_self_test(self):
+        for count in (1, 3, 100):
+            _sha256.self_test(count)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, _sha256.hash256_64, b'\x00' * 65)
+        self.assertEqual(_sha256.hash256_64(b''), b'')
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2012-2014 by its contributors. See AUTHORS for details.
+# Distributed under the MIT/X11 software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+
+# Python standard library, unit-testing
+import hashlib
+import unittest
+
+from bitcoin.core import Block, Input, Output, Transaction
+from bitcoin.defaults import CHAIN_PARAMETERS
+from bitcoin.hash import hash256
+from bitcoin.merkle import merkle
+from bitcoin.mining import *
+from bitcoin.serialize import BufferReader
+
+# ===----------------------------------------------------------------------===
+
+GENESIS = CHAIN_PARAMETERS['bitcoin.org'].genesis
+GENESIS_NONCE = 2083236893
+
+class TestGrind(unittest.TestCase):
+    "Test searching for nonces from the midstate."
+    def setUp(self):
+        self.block = Block.deserialize(BufferReader(GENESIS[:80]))
+
+    def test_midstate(self):
+        hobj = midstate(self.block)
+        hobj.update(GENESIS[64:80])
+        self.assertEqual(hashlib.sha256(hobj.digest()).digest(),
+                         hash256(GENESIS[:80]).digest())
+
+    def test_genesis(self):
+        nonces = range(GENESIS_NONCE - 1000, GENESIS_NONCE + 1000)
+        self.assertEqual(grind(self.block, nonces=nonces), GENESIS_NONCE)
+        self.assertEqual(grind(GENESIS[:80], nonces=nonces), GENESIS_NONCE)
+        self.assertEqual(grind(self.block, nonces=range(GENESIS_NONCE)[:1000]), None)
+        self.assertEqual(self.block.nonce, GENESIS_NONCE)
+
+# ===----------------------------------------------------------------------===
+
+class TestMine(unittest.TestCase):
+    "Test generating blocks that meet their target."
+    def _check(self, block, target):
+        self.assertTrue(block.hash <= target)
+
+    def test_regtest(self):
+        parent = Block(bits=0x207fffff)
+        for _ in range(20):
+            block = mine(Block(parent_hash=parent.hash, bits=0x207fffff))
+            self._check(block, 1 << 255)
+            parent = block
+
+    def test_time(self):
+        block = mine(Block(bits=0x207fffff), target=1 << 252, nonces=range(2))
+        self._check(block, 1 << 252)
+        self.assertTrue(block.nonce < 2)
+
+    def test_extranonce(self):
+        coinbase = Transaction(
+            inputs=[Input(coinbase=b'\x01\x02')],
+            outputs=[Output(amount=50*100000000)])
+        transactions = [coinbase]
+        block = Block(bits=0x207fffff, merkle_hash=merkle([coinbase.hash]))
+        mine(block, transactions, target=1 << 250, nonces=range(2))
+        self._check(block, 1 << 250)
+        self.assertEqual(block.time, 0)
+        self.assertEqual(block.merkle_hash, coinbase.hash)
+        script = coinbase.inputs[0].endorsement
+        self.assertEqual(script[:2], b'\x01\x02')
+        self.assertEqual(len(script), 6)
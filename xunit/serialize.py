@@ -9,10 +9,13 @@ import six
 # Python standard library, unit-testing
 import unittest
 
+from struct import Struct
+
 # Scenario unit-testing
 from scenariotest import ScenarioMeta, ScenarioTest
 
 # Python patterns, base encoding
+import bitcoin.serialize
 from bitcoin.serialize import *
 
 from bitcoin.defaults import CHAIN_PARAMETERS, CLIENT_VERSION
@@ -360,3 +363,236 @@ class TestInvalidListSerialization(unittest.TestCase):
         def __test__(self, invalid, deserializer):
             file_ = BytesIO(invalid)
             self.assertRaises(EOFError, lambda f,d:list(deserialize_iterator(f,d)), file_, deserializer)
+
+# ===----------------------------------------------------------------------===
+
+class TestBufferReader(unittest.TestCase):
+    "Test the zero-copy BufferReader against the equivalent file-based reads."
+    def test_fixed_width(self):
+        reader = BufferReader(bytes.fromhex('01' '0201' '04030201' '0807060504030201'))
+        self.assertEqual(reader.read_u8(), 0x01)
+        self.assertEqual(reader.read_u16(), 0x0102)
+        self.assertEqual(reader.read_u32(), 0x01020304)
+        self.assertEqual(reader.read_u64(), 0x0102030405060708)
+        self.assertEqual(reader.remaining, 0)
+        self.assertRaises(EOFError, reader.read_u8)
+
+    def test_compact_size(self):
+        for size, string in ((0, '00'), (252, 'fc'), (253, 'fdfd00'),
+                             (2**16, 'fe00000100'),
+                             (2**64-1, 'ffffffffffffffffff')):
+            string = bytes.fromhex(string)
+            reader = BufferReader(string)
+            self.assertEqual(reader.read_compact_size(), size)
+            self.assertEqual(reader.remaining, 0)
+            self.assertEqual(LittleCompactSize.deserialize(BufferReader(string)), size)
+        self.assertEqual(BigCompactSize.deserialize(
+            BufferReader(bytes.fromhex('fe00010000'))), 2**16)
+
+    def test_varint(self):
+        for n, string in ((0, '00'), (0x7f, '7f'), (0x80, '8000'),
+                          (0x407f, 'ff7f'), (0x4080, '808000')):
+            string = bytes.fromhex(string)
+            reader = BufferReader(string + b'\xff')
+            self.assertEqual(reader.read_varint(), n)
+            self.assertEqual(reader.tell(), len(string))
+            self.assertEqual(VarInt.deserialize(BytesIO(string)), n)
+        self.assertRaises(EOFError, BufferReader(b'\x80').read_varint)
+
+    def test_read_slice(self):
+        buffer = bytearray(b'abcdef')
+        reader = BufferReader(buffer, offset=1)
+        slice_ = reader.read_slice(3)
+        self.assertIsInstance(slice_, memoryview)
+        self.assertEqual(slice_, b'bcd')
+        buffer[2] = ord(b'X')
+        self.assertEqual(slice_, b'bXd')
+        self.assertRaises(EOFError, reader.read_slice, 3)
+        self.assertEqual(reader.read(3), b'ef')
+        self.assertEqual(reader.read(3), b'')
+
+    def test_seek(self):
+        reader = BufferReader(b'\x00' * 8)
+        self.assertEqual(reader.seek(2), 2)
+        reader.skip(3)
+        self.assertEqual(reader.tell(), 5)
+        self.assertEqual(reader.seek(-1, 2), 7)
+        self.assertRaises(EOFError, reader.skip, 2)
+        self.assertRaises(ValueError, reader.seek, 9)
+
+    def test_integers(self):
+        for len_ in (1, 2, 3, 4, 7, 8, 20, 32):
+            string = bytes(range(1, len_+1))
+            self.assertEqual(
+                LittleInteger.deserialize(BufferReader(string), len_),
+                LittleInteger.deserialize(BytesIO(string), len_))
+            self.assertEqual(
+                BigInteger.deserialize(BufferReader(string), len_),
+                BigInteger.deserialize(BytesIO(string), len_))
+            self.assertRaises(EOFError,
+                LittleInteger.deserialize, BufferReader(string[1:]), len_)
+
+    def test_as_reader(self):
+        reader = BufferReader(b'')
+        self.assertIs(as_reader(reader), reader)
+        file_ = as_reader(BytesIO(b'\x01\x02'))
+        self.assertIsInstance(file_, FileReader)
+        self.assertIs(as_reader(file_), file_)
+        self.assertEqual(file_.read_u16(), 0x0201)
+        self.assertRaises(EOFError, file_.read_u8)
+
+class TestBufferWriter(unittest.TestCase):
+    "Test BufferWriter and FileWriter against the reference serializers."
+    def _writers(self):
+        return (BufferWriter(), FileWriter(BytesIO()))
+
+    def _getvalue(self, writer):
+        if isinstance(writer, BufferWriter):
+            return writer.getvalue()
+        return writer._file.getvalue()
+
+    def test_fixed_width(self):
+        for writer in self._writers():
+            writer.write_u8(0x01)
+            writer.write_u16(0x0102)
+            writer.write_u32(0x01020304)
+            writer.write_u64(0x0102030405060708)
+            self.assertEqual(writer.tell(), 15)
+            self.assertEqual(self._getvalue(writer),
+                bytes.fromhex('01' '0201' '04030201' '0807060504030201'))
+
+    def test_compact_size(self):
+        for size, string in ((0, '00'), (252, 'fc'), (253, 'fdfd00'),
+                             (2**16, 'fe00000100'),
+                             (2**64-1, 'ffffffffffffffffff')):
+            string = bytes.fromhex(string)
+            self.assertEqual(LittleCompactSize(size).serialize(), string)
+            self.assertEqual(LittleCompactSize(size).serialized_size(), len(string))
+            for writer in self._writers():
+                writer.write_compact_size(size)
+                self.assertEqual(self._getvalue(writer), string)
+
+    def test_varint(self):
+        for n, string in ((0, '00'), (0x7f, '7f'), (0x80, '8000'),
+                          (0x407f, 'ff7f'), (0x4080, '808000')):
+            string = bytes.fromhex(string)
+            self.assertEqual(VarInt(n).serialize(), string)
+            self.assertEqual(VarInt(n).serialized_size(), len(string))
+            for writer in self._writers():
+                writer.write_varint(n)
+                self.assertEqual(self._getvalue(writer), string)
+        self.assertRaises(ValueError, VarInt(-1).serialize)
+
+    def test_preallocated(self):
+        buffer = bytearray(6)
+        writer = BufferWriter(buffer, offset=1)
+        writer.write_u32(0x04030201)
+        writer.write(b'\x05')
+        self.assertEqual(buffer, bytearray(b'\x00\x01\x02\x03\x04\x05'))
+        writer.write_u16(0x0706)
+        self.assertEqual(buffer, bytearray(b'\x00\x01\x02\x03\x04\x05\x06\x07'))
+
+    def test_as_writer(self):
+        writer = BufferWriter()
+        self.assertIs(as_writer(writer), writer)
+        buffer = bytearray(b'\x01')
+        as_writer(buffer).write_u16(0x0302)
+        self.assertEqual(buffer, bytearray(b'\x01\x02\x03'))
+        file_ = BytesIO()
+        writer = as_writer(file_)
+        self.assertIsInstance(writer, FileWriter)
+        self.assertIs(as_writer(writer), writer)
+        writer.write_u8(0x01)
+        self.assertEqual(file_.getvalue(), b'\x01')
+
+class TestIntegerCodecs(unittest.TestCase):
+    "Test the fixed-width fast paths of LittleInteger and BigInteger."
+    def test_round_trip(self):
+        for len_ in (1, 2, 3, 4, 8, 20, 32):
+            for value in (0, 1, 0x80, (1 << 8*len_) - 1):
+                little = LittleInteger(value).serialize(len_)
+                big = BigInteger(value).serialize(len_)
+                self.assertEqual(len(little), len_)
+                self.assertEqual(little[::-1], big)
+                self.assertEqual(LittleInteger.deserialize(BufferReader(little), len_), value)
+                self.assertEqual(BigInteger.deserialize(BufferReader(big), len_), value)
+                self.assertEqual(LittleInteger.deserialize(BytesIO(little), len_), value)
+                self.assertEqual(BigInteger.deserialize(BytesIO(big), len_), value)
+            self.assertRaises(ValueError, LittleInteger(1 << 8*len_).serialize, len_)
+            self.assertRaises(ValueError, BigInteger(1 << 8*len_).serialize, len_)
+
+    def test_minimal_length(self):
+        self.assertEqual(LittleInteger(0).serialize(), b'')
+        self.assertEqual(LittleInteger(0x0100).serialize(), b'\x00\x01')
+        self.assertEqual(BigInteger(0x0100).serialize(), b'\x01\x00')
+
+    def test_struct_codecs(self):
+        writer = BufferWriter()
+        writer.pack(Struct('<IH'), 1, 2)
+        self.assertEqual(writer.getvalue(), b'\x01\x00\x00\x00\x02\x00')
+        self.assertEqual(BufferReader(writer.getvalue()).unpack(Struct('<IH')), (1, 2))
+        self.assertEqual(as_reader(BytesIO(writer.getvalue())).unpack(Struct('<IH')), (1, 2))
+
+class TestBatchDecoding(unittest.TestCase):
+    "Test batch VarInt/CompactSize decoding, with and without NumPy."
+    VALUES = [0, 1, 0x7f, 0x80, 0x407f, 0x4080, 252, 253, 0xffff, 0x10000,
+              2**32-1, 2**32, 2**57, 2**63, 2**64-1] * 3
+
+    def _backends(self):
+        numpy = bitcoin.serialize.numpy
+        try:
+            for backend in set([numpy, None]):
+                bitcoin.serialize.numpy = backend
+                yield backend
+        finally:
+            bitcoin.serialize.numpy = numpy
+
+    def test_varints(self):
+        data = b'\xaa' + b''.join(VarInt(v).serialize() for v in self.VALUES)
+        for backend in self._backends():
+            values, end = deserialize_varints(data, 1)
+            self.assertEqual(list(map(int, values)), self.VALUES)
+            self.assertEqual(end, len(data))
+            for count in (0, 1, 5, len(self.VALUES)):
+                reader = BufferReader(data, 1)
+                for _ in range(count):
+                    reader.read_varint()
+                values, end = deserialize_varints(data, 1, count)
+                self.assertEqual(list(map(int, values)), self.VALUES[:count])
+                self.assertEqual(end, reader.tell())
+            reader = BufferReader(data, 1)
+            self.assertEqual(list(map(int, reader.read_varints(20))), self.VALUES[:20])
+            self.assertEqual(list(map(int, reader.read_varints())), self.VALUES[20:])
+            self.assertEqual(reader.remaining, 0)
+
+    def test_varints_invalid(self):
+        for backend in self._backends():
+            self.assertRaises(EOFError, deserialize_varints, b'\x00\x80')
+            self.assertRaises(EOFError, deserialize_varints, b'\x00' * 20, 0, 21)
+            for value in (2**64, 2**70):
+                self.assertRaises(OverflowError, deserialize_varints,
+                                  VarInt(value).serialize() * 20)
+
+    def test_compact_sizes(self):
+        data = b''.join(LittleCompactSize(v).serialize() for v in self.VALUES)
+        small = bytes(range(253))
+        for backend in self._backends():
+            values, end = deserialize_compact_sizes(data)
+            self.assertEqual(list(map(int, values)), self.VALUES)
+            self.assertEqual(end, len(data))
+            values, end = deserialize_compact_sizes(small, 3, 200)
+            self.assertEqual(list(map(int, values)), list(range(3, 203)))
+            self.assertEqual(end, 203)
+            reader = BufferReader(data)
+            self.assertEqual(list(map(int, reader.read_compact_sizes(7))), self.VALUES[:7])
+            self.assertEqual(list(map(int, as_reader(BytesIO(data)).read_compact_sizes())), self.VALUES)
+            self.assertRaises(EOFError, deserialize_compact_sizes, small, 200, 100)
+            self.assertRaises(EOFError, deserialize_compact_sizes, b'\xfd\x00')
+            # A reader bounded short of the buffer's end stops at its own.
+            reader = BufferReader(b'\x01\x02\x03\x04\x05', 0, 2)
+            self.assertRaises(EOFError, reader.read_compact_sizes, 4)
+            reader = BufferReader(b'\x01\x02\x03\x04\x05', 1, 3)
+            self.assertEqual(list(map(int, reader.read_compact_sizes(2))), [2, 3])
+            self.assertEqual(reader.tell(), 3)
+            reader = BufferReader(b'\x01\x02\x03\x04\x05', 0, 2)
+            self.assertRaises(EOFError, reader.read_varints, 4)
@@ -83,3 +83,56 @@ class Test_icmp(unittest.TestCase):
         scenarios = SCENARIOS
         def __test__(self, i1, i2, check):
             self.assertTrue(check(icmp(i1, i2)))
+
+# ===----------------------------------------------------------------------===
+
+BIT_STRINGS = ['', '0', '1', '00', '01', '010', '0100', '1', '10000001',
+               '011010011001011010', '1' * 70, '1' * 69 + '0']
+
+class TestBitPrefix(unittest.TestCase):
+    "Test BitPrefix against lists of bits and Bits."
+    def _prefix(self, string):
+        return BitPrefix.from_bits(char == '1' for char in string)
+
+    def test_init(self):
+        self.assertEqual(self._prefix('0101'), BitPrefix(5, 4))
+        self.assertEqual(BitPrefix.from_bytes(b'\x81\x00'),
+                         BitPrefix(0x8100, 16))
+        self.assertEqual(BitPrefix.from_bits(Bits('0b0110')), BitPrefix(6, 4))
+        self.assertEqual(len(BitPrefix()), 0)
+        self.assertFalse(BitPrefix())
+        self.assertRaises(ValueError, BitPrefix, 4, 2)
+        self.assertRaises(ValueError, BitPrefix, -1, 2)
+
+    def test_sequence(self):
+        for string in BIT_STRINGS:
+            bits, prefix = [char == '1' for char in string], self._prefix(string)
+            self.assertEqual(list(prefix), bits)
+            self.assertEqual(prefix.tobytes(), Bits(bits).tobytes())
+            for idx in range(-len(bits), len(bits)):
+                self.assertEqual(prefix[idx], bits[idx])
+            for start in range(len(bits) + 1):
+                for stop in range(len(bits) + 1):
+                    self.assertEqual(list(prefix[start:stop]), bits[start:stop])
+            self.assertRaises(IndexError, prefix.__getitem__, len(bits))
+            self.assertRaises(ValueError, prefix.__getitem__, slice(None, None, -1))
+
+    def test_relations(self):
+        for a in BIT_STRINGS:
+            for b in BIT_STRINGS:
+                pa, pb = self._prefix(a), self._prefix(b)
+                la, lb = [c == '1' for c in a], [c == '1' for c in b]
+                self.assertEqual(pa < pb, la < lb)
+                self.assertEqual(pa <= pb, la <= lb)
+                self.assertEqual(pa == pb, la == lb)
+                self.assertEqual(pa != pb, la != lb)
+                self.assertEqual(pa >= pb, la >= lb)
+                self.assertEqual(pa > pb, la > lb)
+                self.assertEqual(list(pa + pb), la + lb)
+                self.assertEqual(pa.startswith(pb), a.startswith(b))
+                common = 0
+                while common < min(len(a), len(b)) and a[common] == b[common]:
+                    common += 1
+                self.assertEqual(pa.common_length(pb), common)
+                if pa == pb:
+                    self.assertEqual(hash(pa), hash(pb))